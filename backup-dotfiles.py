@@ -1,141 +1,521 @@
 #!/usr/bin/env python3
 
+import argparse
 import os
-import subprocess
-import shutil
+import stat
 import sys
 from datetime import datetime
 from pathlib import Path
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "scripts"))
 
-from detect_env import EnvironmentDetector
+from brewfile import BrewInventory
+from detect_env import get_environment
+from backup_archive import CODECS
+from journal import Journal, rollback_links
+from git_ops import GitError, GitRepo
+from linker import Linker
+from manifest import load_manifest, packages_for
+from parallel import print_summary, run_packages
+from planner import Plan
+from retention import Policy, apply_retention, format_report, parse_size, plan_retention
+from runner import CommandError, run
+from snapshot_store import SnapshotStore
+from tracing import session, span
+from watcher import make_watcher, run_debounced
 
 DOTFILES_DIR = os.path.expanduser("~/.dotfiles")
 BREWFILE_PATH = os.path.join(DOTFILES_DIR, "brew/Brewfile")
 BACKUP_DIR = os.path.expanduser("~/dotfiles-backup")
+BREW_DUMP_TIMEOUT = 300
 
-PACKAGES = {
-    "bash": {"files": [".bashrc"], "target": "~"},
-    "zsh": {"files": [".zshrc"], "target": "~"},
-    "tmux": {"files": [".tmux.conf"], "target": "~"},
-    "wezterm": {"files": [".wezterm.lua"], "target": "~"},
-    "brew": {"files": ["Brewfile"], "target": "~"},
-    "starship": {"files": ["starship.toml"], "target": "~/.config"},
-    "neovim": {"files": [".config/nvim"], "target": "~", "is_dir": True},
-    "opencode": {"files": [".config/opencode"], "target": "~", "is_dir": True},
-    "fish": {"files": [".config/fish"], "target": "~", "is_dir": True},
-    "ghostty": {"files": ["Library/Application Support"], "target": "~", "is_dir": True},
-    "vscodium": {"files": ["Library/Application Support"], "target": "~", "is_dir": True},
-    "nushell": {"files": [".config/nushell"], "target": "~", "is_dir": True},
-}
-
-def run_command(command, verbose=True):
-    """Run a shell command and return its output."""
-    try:
-        result = subprocess.run(command, shell=True, check=True, text=True, capture_output=True)
-        if verbose and result.stdout:
-            print(result.stdout.strip())
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"Error running command: {command}\n{e}")
+def update_brewfile(force=False):
+    """Re-dump the Brewfile, unless nothing was installed or removed since the last dump."""
+    print("[INFO] Updating Brewfile...")
+    inventory = BrewInventory()
+    if not force and not brewfile_changed(inventory):
+        print("[INFO] Brewfile is current (no installs or removals since the last dump).")
         return None
+    result = run(["brew", "bundle", "dump", "--force", f"--file={BREWFILE_PATH}"], timeout=BREW_DUMP_TIMEOUT)
+    if not result.ok:
+        print(f"[WARN] {CommandError(result)}")
+        return result
+    inventory.record_dump(BREWFILE_PATH)
+    print(f"[INFO] Brewfile updated in {result.duration:.1f}s.")
+    return result
 
-def update_brewfile():
-    """Update the Brewfile with current Homebrew packages."""
-    print("[INFO] Updating Brewfile...")
-    run_command(f"brew bundle dump --force --file={BREWFILE_PATH}", verbose=False)
-    print("[INFO] Brewfile updated.")
+def brewfile_changed(inventory):
+    try:
+        return inventory.needs_dump(BREWFILE_PATH)
+    except CommandError:
+        return True
+
+def get_platform_specific_packages(env):
+    """Return packages relevant to the current platform, per packages.toml."""
+    return packages_for(env)
 
-def get_platform_specific_packages(detector):
-    """Return packages relevant to the current platform."""
-    os_type = detector.detect_os()
+def package_roots(package):
+    """Yield (target_dir, file, lstat) for a package's files that exist and aren't links yet."""
+    config = load_manifest().packages[package]
+    target_dir = os.path.expanduser(config.target)
+    for file in config.files:
+        try:
+            st = os.lstat(os.path.join(target_dir, file))
+        except FileNotFoundError:
+            continue
+        if stat.S_ISLNK(st.st_mode):
+            continue
+        yield target_dir, file, st
+
+def backup_package(store, package):
+    """Store one package's non-symlinked targets; returns (entries, bytes, roots)."""
+    entries = []
+    bytes_written = 0
+    roots = []
     
-    if os_type == "darwin":
-        return ["bash", "zsh", "tmux", "wezterm", "brew", "starship", "neovim", "opencode", "fish", "ghostty", "vscodium"]
-    elif os_type == "linux":
-        return ["bash", "zsh", "tmux", "starship", "neovim", "opencode", "fish", "nushell"]
-    else:
-        return list(PACKAGES.keys())
-
-def backup_existing_files(detector):
-    """Backup existing files that will be replaced by symlinks."""
+    for target_dir, file, st in package_roots(package):
+        target_path = os.path.join(target_dir, file)
+        roots.append(target_path)
+        package_entries, written = store.collect(package, target_dir, file, st)
+        if written:
+            print(f"[INFO] Backed up {target_path} ({written} new bytes)")
+        entries.extend(package_entries)
+        bytes_written += written
+    
+    return entries, bytes_written, roots
+
+def backup_to_archive(store, packages, snapshot_name, distro, codec=None):
+    """Write a self-contained snapshot as one compressed archive, a frame per package."""
+    sources = [(package, target_dir, file, st) for package in packages for target_dir, file, st in package_roots(package)]
+    if not sources:
+        print("[INFO] Nothing to back up.")
+        return None
+    entries, archive = store.archive(snapshot_name, sources, codec)
+    store.write_snapshot(snapshot_name, entries, {"distro": distro, "archive": archive})
+    size = os.path.getsize(os.path.join(store.archives_dir, archive["file"]))
+    print(f"[INFO] Snapshot {snapshot_name}: {len(entries)} entries in {archive['file']} ({size} bytes).")
+    return snapshot_name
+
+def backup_existing_files(env, jobs=1, packages=None, archive=None):
+    """Backup existing files that will be replaced by symlinks.
+
+    With packages, only those are rescanned; every other package's entries
+    are carried forward from the latest snapshot, unless that snapshot is
+    an archive, in which case every package is rescanned. With archive (a codec
+    name or "auto"), every package is streamed into one compressed archive.
+    """
     print("[INFO] Backing up existing files...")
-    os.makedirs(BACKUP_DIR, exist_ok=True)
+    store = SnapshotStore(BACKUP_DIR)
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_subdir = os.path.join(BACKUP_DIR, f"backup_{timestamp}_{detector.detect_distro()}")
-    os.makedirs(backup_subdir, exist_ok=True)
+    distro = env.distro
+    snapshot_name = f"backup_{timestamp}_{distro}"
     
-    packages_to_backup = get_platform_specific_packages(detector)
+    manifest = load_manifest()
+    packages_to_backup = get_platform_specific_packages(env)
+    if archive:
+        codec = None if archive == "auto" else archive
+        return backup_to_archive(store, packages_to_backup, snapshot_name, distro, codec)
+    carried = []
+    if packages is not None:
+        selected = [p for p in packages_to_backup if p in packages]
+        carried = store.carried_entries(selected)
+        if carried is None:
+            print("[INFO] Latest snapshot is an archive; backing up every package.")
+            carried = []
+        else:
+            packages_to_backup = selected
+    target_roots = {
+        package: [os.path.join(os.path.expanduser(manifest.packages[package].target), f)
+                  for f in manifest.packages[package].files]
+        for package in packages_to_backup
+    }
+    results = run_packages(packages_to_backup, lambda p: backup_package(store, p), target_roots, jobs, "backup")
     
-    for package in packages_to_backup:
-        if package not in PACKAGES:
+    entries = []
+    bytes_written = 0
+    roots = []
+    for result in results:
+        if not result.ok:
+            print(f"[WARN] Failed to backup {result.package}: {result.error}")
             continue
-            
-        config = PACKAGES[package]
-        target_dir = os.path.expanduser(config["target"])
-        for file in config["files"]:
-            target_path = os.path.join(target_dir, file)
-            backup_path = os.path.join(backup_subdir, package, file)
-            
-            if os.path.exists(target_path) and not os.path.islink(target_path):
-                os.makedirs(os.path.dirname(backup_path), exist_ok=True)
-                print(f"[INFO] Backing up {target_path} to {backup_path}")
-                try:
-                    if os.path.isfile(target_path):
-                        shutil.copy2(target_path, backup_path)
-                    else:
-                        shutil.copytree(target_path, backup_path)
-                except Exception as e:
-                    print(f"[WARN] Failed to backup {target_path}: {e}")
-
-def create_symlinks_with_stow(detector):
-    """Create symlinks using GNU stow."""
-    print("[INFO] Creating symlinks with stow...")
-    
-    packages_to_stow = get_platform_specific_packages(detector)
-    
-    for package in packages_to_stow:
-        target_dir = PACKAGES.get(package, {}).get("target", "~")
-        target_dir_expanded = os.path.expanduser(target_dir)
-        command = f"cd {DOTFILES_DIR} && stow -t {target_dir_expanded} {package} --adopt"
-        print(f"[INFO] Running: stow -t {target_dir_expanded} {package}")
-        try:
-            run_command(command, verbose=False)
-        except Exception as e:
-            print(f"[WARN] Stow failed for {package}: {e}")
+        package_entries, written, package_roots = result.value
+        entries.extend(package_entries)
+        bytes_written += written
+        roots.extend(package_roots)
+    if jobs > 1:
+        print_summary("Backup", results)
+    
+    seen = {os.path.join(e["target_dir"], e["path"]) for e in entries}
+    store.save_index(roots, seen)
+    entries = carried + entries
+    
+    if not entries:
+        print("[INFO] Nothing to back up.")
+        return None
+    
+    unchanged = store.same_as_latest(entries)
+    if unchanged:
+        print(f"[INFO] No changes since snapshot {unchanged}.")
+        return unchanged
+    
+    store.write_snapshot(snapshot_name, entries, {"distro": distro})
+    print(f"[INFO] Snapshot {snapshot_name}: {len(entries)} entries, {bytes_written} new bytes stored.")
+    return snapshot_name
+
+def list_snapshots():
+    """Print the snapshots in the backup store."""
+    snapshots = SnapshotStore(BACKUP_DIR).list_snapshots()
+    if not snapshots:
+        print("[INFO] No snapshots found.")
+        return
+    for snap in snapshots:
+        packages = ", ".join(snap["packages"])
+        archive = f"  {snap['archive']}" if snap["archive"] else ""
+        print(f"{snap['name']}  {snap['created']}  {snap['files']} files  {snap['size']} bytes  [{packages}]{archive}")
 
-def commit_changes(detector):
+def apply_policy(policy, dry_run=False):
+    """Apply a retention policy to the backup store, or just report it."""
+    store = SnapshotStore(BACKUP_DIR)
+    plan = plan_retention(store, policy)
+    if not dry_run:
+        apply_retention(store, plan)
+    print(format_report(plan, dry_run))
+    return plan
+
+def restore_snapshot(name, dest=None, packages=None):
+    """Restore files from a snapshot, either in place or under dest."""
+    store = SnapshotStore(BACKUP_DIR)
+    if name not in store.snapshot_names():
+        print(f"[ERROR] Snapshot not found: {name}")
+        return False
+    try:
+        count = store.restore(name, dest=dest, packages=packages)
+    except ValueError as e:
+        print(f"[ERROR] Cannot restore {name}: {e}")
+        return False
+    location = dest if dest else "original locations"
+    print(f"[INFO] Restored {count} entries from {name} to {location}.")
+    return True
+
+def plan_symlinks(env):
+    """Plan links for every platform package in one pass."""
+    targets = load_manifest().targets()
+    linker = Linker(DOTFILES_DIR, adopt=True)
+    linker.plan(
+        (package, os.path.expanduser(targets[package]))
+        for package in get_platform_specific_packages(env)
+    )
+    return linker
+
+def apply_symlinks(linker, jobs=1):
+    """Apply a planned linker, reporting conflicts, errors and adoptions."""
+    for conflict in linker.conflicts:
+        print(f"[WARN] Stow conflict in {conflict.package}: {conflict.path} ({conflict.reason})")
+    
+    linker.journal = Journal.start()
+    try:
+        results = linker.apply_parallel(jobs)
+    finally:
+        linker.journal.close()
+    for action, error in linker.errors:
+        print(f"[WARN] Stow failed for {action.package}: {error}")
+    done = [action for result in results if result.ok for action in result.value]
+    for path in linker.adopted(done):
+        print(f"[INFO] Adopted {path}")
+    if jobs > 1:
+        print_summary("Stow", results)
+    print(f"[INFO] Linker applied {len(done)} actions.")
+    return linker
+
+def create_symlinks_with_stow(env, jobs=1):
+    """Create symlinks with the in-process stow-compatible linker."""
+    print("[INFO] Creating symlinks...")
+    return apply_symlinks(plan_symlinks(env), jobs)
+
+def repo_paths(env):
+    """Repo paths a run can change: the platform's package dirs."""
+    return [p for p in get_platform_specific_packages(env) if os.path.isdir(os.path.join(DOTFILES_DIR, p))]
+
+def commit_changes(env):
     """Commit changes to the dotfiles repository."""
     print("[INFO] Committing changes to Git...")
     
-    status = run_command(f"cd {DOTFILES_DIR} && git status --porcelain", verbose=False)
-    if not status:
-        print("[INFO] No changes to commit.")
-        return
-        
-    os_type = detector.detect_os()
-    distro = detector.detect_distro()
+    distro = env.distro
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     message = f"Update dotfiles ({distro}): {timestamp}"
     
-    run_command(f"cd {DOTFILES_DIR} && git add . && git commit -m '{message}'", verbose=False)
-    print("[INFO] Changes committed.")
+    try:
+        changed = GitRepo(DOTFILES_DIR).commit_paths(repo_paths(env), message)
+    except GitError as e:
+        print(f"[WARN] {e}")
+        return
+    if not changed:
+        print("[INFO] No changes to commit.")
+        return
+    print(f"[INFO] Changes committed ({len(changed)} files).")
 
-def main():
-    """Main function to update dotfiles."""
-    detector = EnvironmentDetector()
-    os_type, distro, hostname = detector.detect()
+def git_status(env):
+    """Return changed paths under the platform's package dirs."""
+    try:
+        return GitRepo(DOTFILES_DIR).status(repo_paths(env))
+    except GitError:
+        return []
+
+def watch_targets(env):
+    """Map what --watch observes to packages.
+
+    Returns (tracked, repo_dirs, watches). tracked maps every manifest
+    path of the platform's packages to its package, whether it exists
+    yet or not. repo_dirs are the package directories in the repo, where
+    edits through existing symlinks land. watches lists the (directory,
+    recursive) pairs to watch: the nearest existing parent of each
+    tracked path, each tracked path that is a real directory, and each
+    repo package directory.
+    """
+    manifest = load_manifest()
+    tracked = {}
+    repo_dirs = {}
+    watches = {}
+    for package in get_platform_specific_packages(env):
+        config = manifest.packages[package]
+        target_dir = os.path.expanduser(config.target)
+        for file in config.files:
+            path = os.path.join(target_dir, file)
+            tracked[path] = package
+            watches.setdefault(existing_parent(path), False)
+            if os.path.isdir(path) and not os.path.islink(path):
+                watches[path] = True
+        repo_dir = os.path.join(DOTFILES_DIR, package)
+        if os.path.isdir(repo_dir):
+            repo_dirs[repo_dir] = package
+            watches[repo_dir] = True
+    return tracked, repo_dirs, sorted(watches.items())
+
+def existing_parent(path):
+    """The closest ancestor of path that is a directory."""
+    parent = os.path.dirname(path)
+    while not os.path.isdir(parent) and os.path.dirname(parent) != parent:
+        parent = os.path.dirname(parent)
+    return parent
+
+def owner(path, owners):
+    """The package of the owners entry that is path or contains it, if any."""
+    for root, package in owners.items():
+        if path == root or path.startswith(root + os.sep):
+            return package
+    return None
+
+def changed_packages(paths, tracked):
+    """Packages whose tracked paths are in paths, inside them, or below them.
+
+    A path above tracked paths is a directory that was created or moved
+    (or the watcher overflowed), so every package beneath it is rescanned.
+    """
+    packages = set()
+    for path in paths:
+        package = owner(path, tracked)
+        if package:
+            packages.add(package)
+        else:
+            packages.update(p for root, p in tracked.items() if root.startswith(path + os.sep))
+    return packages
+
+def relevant(path, tracked, repo_dirs):
+    """Whether an event at path can affect a package; neighbours such as shell history can't."""
+    return bool(owner(path, repo_dirs) or changed_packages([path], tracked))
+
+def watch(env, jobs=1, debounce=2.0, commit_after=None):
+    """Back up changed packages as their files change, until interrupted.
+
+    Events are debounced, and each batch rescans only the packages it
+    touched (the stat index makes unchanged files free). Events for
+    untracked neighbours are dropped before debouncing. The watch set is
+    recomputed after every batch, so directories and packages created
+    since the start are picked up. With commit_after, changes in the
+    repo's package directories are committed once that many seconds pass
+    without further events.
+    """
+    tracked, repo_dirs, watches = watch_targets(env)
+    watcher = make_watcher()
+    watched = set()
+    
+    def add_watches(watches):
+        for path, recursive in watches:
+            if (path, recursive) not in watched:
+                watcher.watch(path, recursive)
+                watched.add((path, recursive))
+    
+    add_watches(watches)
+    print(f"[INFO] Watching {len(tracked)} tracked paths and {len(repo_dirs)} package dirs "
+          f"({type(watcher).__name__}). Press Ctrl-C to stop.")
+    repo_changed = []
+    
+    def on_change(paths):
+        packages = changed_packages(paths, tracked)
+        if packages:
+            print(f"[INFO] Changed: {', '.join(sorted(packages))}")
+            backup_existing_files(env, jobs, packages)
+        if any(owner(p, repo_dirs) for p in paths):
+            repo_changed.append(True)
+        new_tracked, new_repo_dirs, watches = watch_targets(env)
+        tracked.clear()
+        tracked.update(new_tracked)
+        repo_dirs.clear()
+        repo_dirs.update(new_repo_dirs)
+        add_watches(watches)
     
-    print(f"[INFO] Starting dotfiles update for {distro} on {hostname}...")
+    def on_quiet():
+        if repo_changed:
+            repo_changed.clear()
+            commit_changes(env)
     
+    try:
+        run_debounced(watcher, on_change, debounce, commit_after, on_quiet if commit_after else None,
+                      accept=lambda path: relevant(path, tracked, repo_dirs))
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopped watching.")
+    finally:
+        watcher.close()
+
+def build_plan(env, jobs=1, archive=None):
+    """Build the full action graph for an update run without changing anything."""
+    plan = Plan()
+    os_type = env.os
+    
+    brew_steps = []
     if os_type == "darwin":
-        update_brewfile()
+        if brewfile_changed(BrewInventory()):
+            brew_steps.append(plan.add("brew", "dump", BREWFILE_PATH, "brew", "brew bundle dump --force"))
+        else:
+            plan.add("brew", "dump", BREWFILE_PATH, "brew", "no installs or removals since the last dump", True)
+        plan.on_apply("brew", lambda steps: update_brewfile(force=True))
+    
+    store = SnapshotStore(BACKUP_DIR)
+    latest = store.latest_snapshot()
+    previous = {}
+    manifest = store.load_snapshot(latest) if latest else {}
+    if not manifest.get("archive"):
+        for entry in manifest.get("entries", []):
+            previous.setdefault(entry["package"], {})[entry["path"]] = entry
+    
+    backup_steps = {}
+    for package in get_platform_specific_packages(env):
+        for target_dir, file, st in package_roots(package):
+            target_path = os.path.join(target_dir, file)
+            if archive:
+                step = plan.add("backup", "archive", target_path, package)
+                backup_steps.setdefault(package, []).append(step.id)
+                continue
+            prefix = file + os.sep
+            known = {
+                path: entry for path, entry in previous.get(package, {}).items()
+                if path == file or path.startswith(prefix)
+            }
+            satisfied = store.is_unchanged(target_dir, file, known, st)
+            detail = f"unchanged since {latest}" if satisfied else ""
+            step = plan.add("backup", "snapshot", target_path, package, detail, satisfied)
+            backup_steps.setdefault(package, []).append(step.id)
+    plan.on_apply(
+        "backup",
+        lambda steps: backup_existing_files(env, jobs, {s.package for s in steps}, archive),
+    )
+    
+    linker = plan_symlinks(env)
+    adopt_steps = []
+    for action in linker.satisfied:
+        plan.add("link", "link", action.path, action.package, satisfied=True)
+    for action in linker.actions:
+        detail = os.path.relpath(action.source, DOTFILES_DIR) if action.source else ""
+        step = plan.add("link", action.op, action.path, action.package, detail,
+                        depends_on=backup_steps.get(action.package, []))
+        if action.op == "adopt":
+            adopt_steps.append(step.id)
+    for conflict in linker.conflicts:
+        plan.add("link", "conflict", conflict.path, conflict.package, conflict.reason)
+    plan.on_apply("link", lambda steps: apply_symlinks(linker, jobs))
+    
+    satisfied = not brew_steps and not adopt_steps and not git_status(env)
+    plan.add("git", "commit", DOTFILES_DIR, detail="" if not satisfied else "working tree clean",
+             satisfied=satisfied, depends_on=[s.id for s in brew_steps] + adopt_steps)
+    plan.on_apply("git", lambda steps: commit_changes(env))
+    return plan
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Back up and sync dotfiles.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N", help="process up to N independent packages concurrently")
+    parser.add_argument("--plan", action="store_true", help="print the action graph without changing anything")
+    parser.add_argument("--apply", action="store_true", help="print the action graph, then execute it")
+    parser.add_argument("--json", action="store_true", help="print the --plan graph as JSON")
+    parser.add_argument("--archive", nargs="?", const="auto", choices=["auto", *CODECS], metavar="CODEC",
+                        help="write the snapshot as one compressed archive (zstd if available, else xz)")
+    parser.add_argument("--list-snapshots", action="store_true", help="list backup snapshots and exit")
+    parser.add_argument("--keep-last", "--prune", type=int, default=0, metavar="N", help="retention: keep the N newest snapshots")
+    parser.add_argument("--keep-hourly", type=int, default=0, metavar="N", help="retention: keep the newest snapshot of each of the last N hours")
+    parser.add_argument("--keep-daily", type=int, default=0, metavar="N", help="retention: keep the newest snapshot of each of the last N days")
+    parser.add_argument("--keep-weekly", type=int, default=0, metavar="N", help="retention: keep the newest snapshot of each of the last N weeks")
+    parser.add_argument("--max-size", type=parse_size, metavar="SIZE", help="retention: drop the oldest snapshots until the store fits in SIZE (e.g. 500M)")
+    parser.add_argument("--dry-run", action="store_true", help="report what a retention policy would delete")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and back up packages as their files change")
+    parser.add_argument("--debounce", type=float, default=2.0, metavar="SECONDS",
+                        help="--watch: wait this long after the last change before backing up")
+    parser.add_argument("--commit-after", type=float, metavar="SECONDS",
+                        help="--watch: commit repo changes after SECONDS without further changes")
+    parser.add_argument("--rollback", nargs="?", const="latest", metavar="RUN",
+                        help="undo the links (and adoptions) made by RUN, default the latest run, from its journal, and exit")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="time each phase, print a summary and write the spans to FILE "
+                             "(JSON lines if FILE ends in .jsonl, else Chrome trace format)")
+    parser.add_argument("--restore-snapshot", metavar="NAME", help="restore files from a snapshot and exit")
+    parser.add_argument("--restore-to", metavar="DIR", help="restore into DIR/<package>/ instead of the original paths")
+    parser.add_argument("--package", action="append", dest="packages", metavar="PKG", help="limit a restore to PKG (repeatable)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main function to update dotfiles."""
+    args = parse_args(argv)
+    with session(args.trace):
+        update(args)
+
+def update(args):
+    """Run whatever args select: a maintenance command or a full update."""
+    if args.list_snapshots:
+        list_snapshots()
+        return
+    policy = Policy(args.keep_last, args.keep_hourly, args.keep_daily, args.keep_weekly, args.max_size)
+    if policy != Policy() or args.dry_run:
+        apply_policy(policy, args.dry_run)
+        return
+    if args.rollback:
+        if not rollback_links(None if args.rollback == "latest" else args.rollback):
+            sys.exit(1)
+        return
+    if args.restore_snapshot:
+        if not restore_snapshot(args.restore_snapshot, args.restore_to, args.packages):
+            sys.exit(1)
+        return
+    
+    with span("detect"):
+        env = get_environment(debug=os.environ.get("DOTFILES_DEBUG", "0") == "1")
+    
+    if args.watch:
+        watch(env, args.jobs, args.debounce, args.commit_after)
+        return
+    
+    if args.plan:
+        with span("plan"):
+            plan = build_plan(env, args.jobs, args.archive)
+        print(plan.to_json() if args.json else plan.format())
+        return
+    
+    print(f"[INFO] Starting dotfiles update for {env.distro} on {env.hostname}...")
     
-    backup_existing_files(detector)
-    create_symlinks_with_stow(detector)
-    commit_changes(detector)
+    with span("plan"):
+        plan = build_plan(env, args.jobs, args.archive)
+    if args.apply:
+        print(plan.format())
+    plan.apply(concurrent=True)
     
     print("[INFO] Dotfiles update complete.")
     print("[INFO] To push changes to GitHub, run: cd ~/.dotfiles && git push")
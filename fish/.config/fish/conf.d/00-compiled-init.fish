@@ -0,0 +1,40 @@
+#!/usr/bin/env fish
+
+# Fast path: source the per-host init built by scripts/compile_fish_init.py
+# while nothing it was built from has changed. The other conf.d files and
+# config.fish skip themselves once __dotfiles_compiled is set.
+#
+# Opt-in (set -Ux DOTFILES_COMPILED_INIT 1) until its startup time has been
+# measured against the normal path with scripts/bench_shell_startup.py.
+
+if not set -q __dotfiles_compiled; and set -q DOTFILES_COMPILED_INIT; and builtin -q path
+    set -l cache_home $HOME/.cache
+    if set -q XDG_CACHE_HOME; and test -n "$XDG_CACHE_HOME"
+        set cache_home $XDG_CACHE_HOME
+    end
+    set -l init $cache_home/dotfiles/fish/init-$hostname.fish
+
+    # Line 1 of the key file is the key, the rest are extra paths to stat.
+    set -l stamp
+    if test -f $init.key
+        while read -l line
+            set -a stamp $line
+        end <$init.key
+    end
+
+    if set -q stamp[1]; and test -f $init
+        set -l expected $stamp[1]
+        set -e stamp[1]
+        set -l sources $__fish_config_dir/config.fish $__fish_config_dir/conf.d/*.fish /etc/os-release $stamp
+        set -l key (string join ' ' -- $PATH (path mtime -- $sources $PATH))
+        if test "$key" = "$expected"
+            set -g __dotfiles_compiled 1
+            source $init
+        end
+    end
+
+    if not set -q __dotfiles_compiled; and status is-interactive
+        # config.fish rebuilds the init in the background for the next shell
+        set -g __dotfiles_startup_path $PATH
+    end
+end
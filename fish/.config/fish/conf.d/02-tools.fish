@@ -1,26 +1,29 @@
 #!/usr/bin/env fish
 
-if command -v starship > /dev/null
-    source ~/.dotfiles/scripts/load-starship-config.fish
-    starship init fish | source
-end
+# Skipped when conf.d/00-compiled-init.fish loaded the precompiled init.
+if not set -q __dotfiles_compiled
+    if command -v starship > /dev/null
+        source ~/.dotfiles/scripts/load-starship-config.fish
+        starship init fish | source
+    end
 
-if command -v zoxide > /dev/null
-    zoxide init --cmd cd fish | source
-end
+    if command -v zoxide > /dev/null
+        zoxide init --cmd cd fish | source
+    end
 
-if command -v tmuxifier > /dev/null
-    tmuxifier init - fish | source
-end
+    if command -v tmuxifier > /dev/null
+        tmuxifier init - fish | source
+    end
 
-if command -v thefuck > /dev/null
-    thefuck --alias | source
-end
+    if command -v thefuck > /dev/null
+        thefuck --alias | source
+    end
 
-if command -v kubectl > /dev/null
-    kubectl completion fish | source
-end
+    if command -v kubectl > /dev/null
+        kubectl completion fish | source
+    end
 
-if test -d /Users/danielramirez/.lmstudio/bin
-    set -gx PATH $PATH /Users/danielramirez/.lmstudio/bin
+    if test -d /Users/danielramirez/.lmstudio/bin
+        set -gx PATH $PATH /Users/danielramirez/.lmstudio/bin
+    end
 end
@@ -84,6 +84,14 @@ function bplate --description "Create a new project from boilerplate templates"
 
     set -l license_file "$licenses_dir/$license"
 
+    # Python renderer: one pass per file instead of eight `string replace` passes
+    set -l renderer "$HOME/.dotfiles/scripts/template_render.py"
+    set -l render_args --name "$project_name" --author "$author" --license "$license" --license-file "$license_file"
+    set -l use_renderer false
+    if test -f "$renderer" && command -sq python3
+        set use_renderer true
+    end
+
     # Validation
     if not test -d "$template_path"
         echo "[ERROR] Template '$template_type' not found at $template_path" >&2
@@ -124,6 +132,12 @@ function bplate --description "Create a new project from boilerplate templates"
         echo "[DRY-RUN] License: $license"
         echo "[DRY-RUN]"
         echo "[DRY-RUN] Files that would be created:"
+        if test "$use_renderer" = "true"
+            for rel_path in (python3 "$renderer" $render_args --list "$template_path" "$project_name")
+                echo "[DRY-RUN]   $project_name/$rel_path"
+            end
+            return 0
+        end
         /usr/bin/find "$template_path" -type f -not -path "*/.git/*" 2>/dev/null | while read -l file
             set -l rel_path (string replace "$template_path/" "" "$file")
             echo "[DRY-RUN]   $project_name/$rel_path"
@@ -147,49 +161,58 @@ function bplate --description "Create a new project from boilerplate templates"
     end
 
     # Copy template files with substitution
-    echo "[INFO] Copying template files..."
-    /usr/bin/find "$template_path" -type f -not -path "*/.git/*" 2>/dev/null | while read -l source_file
-        # Get relative path
-        set -l rel_path (string replace "$template_path/" "" "$source_file")
-        set -l rel_path (string replace -a "{PROJECT_NAME_KEBAB}" "$project_kebab" "$rel_path")
-
-        # Skip .gitkeep files
-        if false && string match -q "*.gitkeep" "$rel_path"
-            continue
+    if test "$use_renderer" = "true"
+        echo "[INFO] Rendering template files..."
+        python3 "$renderer" $render_args "$template_path" .
+        or begin
+            echo "[ERROR] Failed to render template files" >&2
+            return 1
         end
+    else
+        echo "[INFO] Copying template files..."
+        /usr/bin/find "$template_path" -type f -not -path "*/.git/*" 2>/dev/null | while read -l source_file
+            # Get relative path
+            set -l rel_path (string replace "$template_path/" "" "$source_file")
+            set -l rel_path (string replace -a "{PROJECT_NAME_KEBAB}" "$project_kebab" "$rel_path")
 
-        # Create directory if needed
-        set -l target_dir (dirname "$rel_path")
-        if test "$target_dir" != "."
-            mkdir -p "$target_dir"
-        end
+            # Skip .gitkeep files
+            if false && string match -q "*.gitkeep" "$rel_path"
+                continue
+            end
 
-        # Read source file
-        set -l content (cat "$source_file")
-
-        # Perform substitutions
-        set -l content (string replace -a "{PROJECT_NAME}" "$project_name" "$content")
-        set -l content (string replace -a "{PROJECT_NAME_KEBAB}" "$project_kebab" "$content")
-        set -l content (string replace -a "{AUTHOR}" "$author" "$content")
-        set -l content (string replace -a "{LICENSE_TYPE}" "$license" "$content")
-        set -l content (string replace -a "{YEAR}" "$year" "$content")
-        set -l content (string replace -a "{MONTH}" "$month" "$content")
-        set -l content (string replace -a "{DAY}" "$day" "$content")
-        set -l content (string replace -a "{TODAY}" "$today" "$content")
-
-        # Write to target
-        echo -n "$content" > "$rel_path"
-    end
+            # Create directory if needed
+            set -l target_dir (dirname "$rel_path")
+            if test "$target_dir" != "."
+                mkdir -p "$target_dir"
+            end
 
-    # Copy and substitute LICENSE file from central location
-    echo "[INFO] Setting up LICENSE file..."
-    set -l license_content (cat "$license_file")
-    set -l license_content (string replace -a "{AUTHOR}" "$author" "$license_content")
-    set -l license_content (string replace -a "{YEAR}" "$year" "$license_content")
-    echo -n "$license_content" > LICENSE
-    or begin
-        echo "[ERROR] Failed to create LICENSE file" >&2
-        return 1
+            # Read source file
+            set -l content (cat "$source_file")
+
+            # Perform substitutions
+            set -l content (string replace -a "{PROJECT_NAME}" "$project_name" "$content")
+            set -l content (string replace -a "{PROJECT_NAME_KEBAB}" "$project_kebab" "$content")
+            set -l content (string replace -a "{AUTHOR}" "$author" "$content")
+            set -l content (string replace -a "{LICENSE_TYPE}" "$license" "$content")
+            set -l content (string replace -a "{YEAR}" "$year" "$content")
+            set -l content (string replace -a "{MONTH}" "$month" "$content")
+            set -l content (string replace -a "{DAY}" "$day" "$content")
+            set -l content (string replace -a "{TODAY}" "$today" "$content")
+
+            # Write to target
+            echo -n "$content" > "$rel_path"
+        end
+
+        # Copy and substitute LICENSE file from central location
+        echo "[INFO] Setting up LICENSE file..."
+        set -l license_content (cat "$license_file")
+        set -l license_content (string replace -a "{AUTHOR}" "$author" "$license_content")
+        set -l license_content (string replace -a "{YEAR}" "$year" "$license_content")
+        echo -n "$license_content" > LICENSE
+        or begin
+            echo "[ERROR] Failed to create LICENSE file" >&2
+            return 1
+        end
     end
 
     # Copy opencode.json from ~/.config/opencode/opencode.json if it exists
@@ -1,120 +1,342 @@
 #!/usr/bin/env python3
 
+import argparse
 import os
+import shutil
 import sys
-import subprocess
+import time
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "scripts"))
 
-from detect_env import EnvironmentDetector
+from brewfile import BrewInventory, apply_diff, diff_inventory, format_diff, read_brewfile
+from detect_env import get_environment
+from fleet import provision, read_targets
+from git_ops import GitError, GitRepo, clone
+from journal import Journal, rollback_links
+from linker import Linker
+from manifest import load_manifest, packages_for
+from parallel import print_summary
+from planner import Plan
+from runner import CommandError, echo, run
+from tracing import session, span
+from verify_links import format_report, manifest_packages, to_json, verify
 
 DOTFILES_REPO = "https://github.com/danialrami/dotfiles"
 DOTFILES_DIR = os.path.expanduser("~/.dotfiles")
 BREWFILE_PATH = os.path.join(DOTFILES_DIR, "brew/Brewfile")
+HOMEBREW_INSTALL_URL = "https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh"
+BREW_BUNDLE_TIMEOUT = 3600
+BREW_MODES = ("diff", "cleanup", "full")
 
-STOW_PACKAGES = {
-    "bash": "~",
-    "zsh": "~",
-    "tmux": "~",
-    "wezterm": "~",
-    "brew": "~",
-    "starship": "~/.config",
-    "neovim": "~/.config",
-    "opencode": "~/.config",
-    "fish": "~/.config",
-    "ghostty": "~",
-    "vscodium": "~",
-    "nushell": "~/.config",
-}
-
-def run_command(command):
-    """Run a shell command and return its output."""
+CLONE_MODES = ("full", "shallow", "blobless", "sparse")
+# Needed by every host besides its packages: shell init sources these.
+SPARSE_SHARED = ["scripts", "shared"]
+
+def format_bytes(size):
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024 or unit == "MiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def sparse_paths(env):
+    """Directories a sparse checkout keeps for this host."""
+    return sorted(set(get_platform_packages(env)) | set(SPARSE_SHARED))
+
+def prepare_cache(cache, offline=False):
+    """Create or refresh a bare mirror used as the clone source; returns its URL.
+
+    With offline, an existing cache is used as-is and nothing touches the network.
+    """
+    if not os.path.isdir(cache):
+        if offline:
+            raise GitError(f"cache {cache} does not exist")
+        print(f"[INFO] Creating repository cache at {cache}...")
+        clone(DOTFILES_REPO, cache, bare=True)
+    elif not offline:
+        GitRepo(cache).run("fetch", "-q", "--prune", "origin", "+refs/heads/*:refs/heads/*")
+    mirror = GitRepo(cache)
+    mirror.run("config", "uploadpack.allowFilter", "true")
+    mirror.run("config", "uploadpack.allowAnySHA1InWant", "true")
+    return "file://" + os.path.abspath(cache)
+
+def clone_dotfiles(env, mode="full", cache=None, offline=False):
+    """Clone the dotfiles repository, or fetch only the current branch if present.
+
+    mode is one of CLONE_MODES: shallow keeps only the tip commit, blobless
+    defers file contents until checkout, sparse is blobless limited to this
+    host's packages. Returns (seconds, bytes fetched), or None on failure.
+    """
+    start = time.perf_counter()
     try:
-        result = subprocess.run(command, shell=True, check=True, text=True, capture_output=True)
-        if result.stdout:
-            print(result.stdout.strip())
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"Error running command: {command}\n{e}")
+        source = prepare_cache(cache, offline) if cache else DOTFILES_REPO
+        if not os.path.exists(DOTFILES_DIR):
+            print(f"[INFO] Cloning dotfiles repository ({mode})...")
+            before = 0
+            repo = clone(
+                source,
+                DOTFILES_DIR,
+                depth=1 if mode == "shallow" else None,
+                blob_filter="blob:none" if mode in ("blobless", "sparse") else None,
+                sparse=mode == "sparse",
+            )
+            if mode == "sparse":
+                repo.sparse_checkout(sparse_paths(env))
+            if cache and not offline:
+                repo.run("remote", "set-url", "origin", DOTFILES_REPO)
+        else:
+            print("[INFO] Dotfiles repository already exists. Fetching latest changes...")
+            repo = GitRepo(DOTFILES_DIR)
+            before = repo.object_bytes()
+            repo.update(source if cache else "origin")
+            if repo.is_sparse():
+                repo.sparse_checkout(sparse_paths(env))
+        fetched = max(0, repo.object_bytes() - before)
+    except GitError as e:
+        print(f"[WARN] {e}")
         return None
-
-def clone_dotfiles():
-    """Clone the dotfiles repository."""
-    if not os.path.exists(DOTFILES_DIR):
-        print("[INFO] Cloning dotfiles repository...")
-        run_command(f"git clone {DOTFILES_REPO} {DOTFILES_DIR}")
-    else:
-        print("[INFO] Dotfiles repository already exists. Pulling latest changes...")
-        run_command(f"cd {DOTFILES_DIR} && git pull")
+    
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] Repository ready in {elapsed:.1f}s ({format_bytes(fetched)} fetched).")
+    return elapsed, fetched
 
 def install_homebrew():
     """Install Homebrew if it's not already installed."""
     print("[INFO] Checking for Homebrew installation...")
-    result = run_command("which brew")
-    if result is None or result == "":
-        print("[INFO] Installing Homebrew...")
-        run_command(
-            '/bin/bash -c "$(curl -fsSL https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh)"'
-        )
-    else:
+    if shutil.which("brew"):
         print("[INFO] Homebrew is already installed.")
+        return
+    print("[INFO] Installing Homebrew...")
+    script = run(["curl", "-fsSL", HOMEBREW_INSTALL_URL], timeout=60)
+    if script.ok:
+        result = run(["/bin/bash", "-c", script.stdout], stream=echo("  "), interactive=True)
+    else:
+        result = script
+    if not result.ok:
+        print(f"[WARN] Homebrew install failed: {CommandError(result)}")
+
+def restore_brewfile(env, mode="diff"):
+    """Install what the Brewfile lists but Homebrew lacks (macOS only).
 
-def restore_brewfile(detector):
-    """Restore applications from the Brewfile if on macOS."""
-    os_type = detector.detect_os()
+    mode "cleanup" also removes formulae and casks the Brewfile doesn't
+    list; "full" runs a plain `brew bundle`.
+    """
+    os_type = env.os
     
     if os_type != "darwin":
         print("[INFO] Skipping Brewfile restore (not on macOS)")
         return
     
-    print("[INFO] Restoring applications from Brewfile...")
-    run_command(f"brew bundle --file={BREWFILE_PATH}")
+    if mode == "full":
+        print("[INFO] Restoring applications from Brewfile...")
+        result = run(["brew", "bundle", f"--file={BREWFILE_PATH}"], timeout=BREW_BUNDLE_TIMEOUT, stream=echo("  "))
+        if not result.ok:
+            print(f"[WARN] {CommandError(result)}")
+        else:
+            print(f"[INFO] Brewfile restored in {result.duration:.0f}s.")
+        return
+    
+    inventory = BrewInventory()
+    try:
+        leaves = inventory.leaves() if mode == "cleanup" else None
+        brew_diff = diff_inventory(read_brewfile(BREWFILE_PATH), inventory.load(), leaves)
+    except (OSError, CommandError) as e:
+        print(f"[WARN] Could not read the Brewfile or Homebrew inventory: {e}")
+        return
+    print(f"[INFO] Brewfile: {format_diff(brew_diff)}.")
+    apply_diff(brew_diff, timeout=BREW_BUNDLE_TIMEOUT, stream=echo("  "))
+
+def get_platform_packages(env):
+    """Return packages relevant to the current platform, per packages.toml."""
+    return packages_for(env)
+
+def profile_packages(profile, env):
+    """Packages for a fleet profile: a platform name, "all", or a comma list."""
+    manifest = load_manifest()
+    if not profile:
+        return get_platform_packages(env)
+    if profile == "all":
+        return manifest.names()
+    if profile in manifest.platforms:
+        return manifest.resolve(profile)
+    packages = profile.split(",")
+    unknown = [p for p in packages if p not in manifest.packages]
+    if unknown:
+        raise ValueError(f"unknown package(s) in profile {profile!r}: {', '.join(unknown)}")
+    return packages
 
-def get_platform_packages(detector):
-    """Return packages relevant to the current platform."""
-    os_type = detector.detect_os()
+def plan_stow(env):
+    """Plan links for every platform package in one pass."""
+    targets = load_manifest().targets()
+    linker = Linker(DOTFILES_DIR)
+    linker.plan((package, os.path.expanduser(targets[package])) for package in get_platform_packages(env))
+    return linker
+
+def apply_stow(linker, jobs=1):
+    """Apply a planned linker and report conflicts and errors."""
+    for conflict in linker.conflicts:
+        print(f"[WARN] Stow conflict in {conflict.package}: {conflict.path} ({conflict.reason})")
     
-    if os_type == "darwin":
-        return ["bash", "zsh", "tmux", "wezterm", "brew", "starship", "neovim", "opencode", "fish", "ghostty", "vscodium"]
-    elif os_type == "linux":
-        return ["bash", "zsh", "tmux", "starship", "neovim", "opencode", "fish", "nushell"]
-    else:
-        return list(STOW_PACKAGES.keys())
+    linker.journal = Journal.start()
+    try:
+        results = linker.apply_parallel(jobs)
+    finally:
+        linker.journal.close()
+    for action, error in linker.errors:
+        print(f"[WARN] Stow may have failed for {action.package}: {error}")
+    if jobs > 1:
+        print_summary("Stow", results)
+    
+    done = sum(len(result.value) for result in results if result.ok)
+    print(f"[INFO] Stowing complete ({done} actions).")
+    return linker
 
-def stow_packages(detector):
+def stow_packages(env, jobs=1):
     """Stow all defined packages for the current platform."""
     print("[INFO] Stowing packages...")
+    return apply_stow(plan_stow(env), jobs)
+
+def restore_fleet(env, fleet_file, jobs=1, clone_mode="full", cache=None, offline=False, checkout=None):
+    """Provision every home listed in fleet_file from a single checkout.
+
+    With checkout, that existing checkout is linked instead of cloning
+    into ~/.dotfiles (which, run as root, other users can't read).
+    """
+    targets = read_targets(fleet_file)
+    if checkout:
+        dotfiles_dir = os.path.abspath(os.path.expanduser(checkout))
+        if not os.path.isdir(dotfiles_dir):
+            print(f"[ERROR] Checkout not found: {dotfiles_dir}")
+            return False
+    else:
+        dotfiles_dir = DOTFILES_DIR
+        if clone_dotfiles(env, clone_mode, cache, offline) is None and not os.path.isdir(DOTFILES_DIR):
+            return False
+    print(f"[INFO] Linking {len(targets)} homes...")
+    reports = provision(dotfiles_dir, targets, lambda profile: profile_packages(profile, env),
+                        load_manifest().targets(), jobs)
+    return all(r.ok for r in reports)
+
+def build_plan(env, jobs=1, clone_mode="full", cache=None, offline=False, brew_mode="diff"):
+    """Build the full action graph for a restore without changing anything."""
+    plan = Plan()
+    os_type = env.os
+    repo_exists = os.path.exists(DOTFILES_DIR)
     
-    packages_to_stow = get_platform_packages(detector)
+    source = cache or DOTFILES_REPO
+    if repo_exists:
+        repo = plan.add("repo", "fetch", DOTFILES_DIR, detail=f"current branch from {source}")
+    else:
+        repo = plan.add("repo", "clone", DOTFILES_DIR, detail=f"{clone_mode} from {source}")
+    plan.on_apply("repo", lambda steps: clone_dotfiles(env, clone_mode, cache, offline))
     
-    for package in packages_to_stow:
-        if package not in STOW_PACKAGES:
-            continue
-            
-        target_dir = STOW_PACKAGES[package]
-        target_dir_expanded = os.path.expanduser(target_dir)
-        command = f"cd {DOTFILES_DIR} && stow -t {target_dir_expanded} {package}"
-        print(f"[INFO] Running: stow -t {target_dir_expanded} {package}")
-        result = run_command(command)
-        if result is None:
-            print(f"[WARN] Stow may have failed for {package}")
+    has_brew = shutil.which("brew") is not None
+    plan.add("brew", "install", "homebrew", satisfied=has_brew,
+             detail="already installed" if has_brew else "")
+    if os_type == "darwin":
+        plan.add("brew", "bundle", BREWFILE_PATH, detail=brew_mode, depends_on=[repo.id])
     
-    print("[INFO] Stowing complete.")
+    def run_brew(steps):
+        kinds = {s.kind for s in steps}
+        if "install" in kinds:
+            install_homebrew()
+        if "bundle" in kinds:
+            restore_brewfile(env, brew_mode)
+    plan.on_apply("brew", run_brew)
+    
+    if repo_exists:
+        linker = plan_stow(env)
+        for action in linker.satisfied:
+            plan.add("link", "link", action.path, action.package, satisfied=True)
+        for action in linker.actions:
+            detail = os.path.relpath(action.source, DOTFILES_DIR) if action.source else ""
+            plan.add("link", action.op, action.path, action.package, detail, depends_on=[repo.id])
+        for conflict in linker.conflicts:
+            plan.add("link", "conflict", conflict.path, conflict.package, conflict.reason)
+        plan.on_apply("link", lambda steps: apply_stow(linker, jobs))
+    else:
+        plan.add("link", "stow", "~", detail="planned after clone", depends_on=[repo.id])
+        plan.on_apply("link", lambda steps: stow_packages(env, jobs))
+    return plan
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Restore dotfiles on this machine.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N", help="stow up to N independent packages concurrently")
+    parser.add_argument("--plan", action="store_true", help="print the action graph without changing anything")
+    parser.add_argument("--apply", action="store_true", help="print the action graph, then execute it")
+    parser.add_argument("--json", action="store_true", help="print the --plan graph or --verify report as JSON")
+    parser.add_argument("--clone-mode", choices=CLONE_MODES, default="full",
+                        help="shallow: tip only; blobless: fetch file contents on checkout; "
+                             "sparse: blobless, this host's packages only")
+    parser.add_argument("--cache", metavar="DIR", help="clone from (and refresh) a local bare mirror at DIR")
+    parser.add_argument("--offline", action="store_true", help="use --cache as-is and never touch the network")
+    parser.add_argument("--brew", choices=BREW_MODES, default="diff",
+                        help="diff: install only what's missing; cleanup: also remove what the Brewfile "
+                             "doesn't list; full: run a plain `brew bundle`")
+    parser.add_argument("--verify", action="store_true",
+                        help="report drift from the repo (missing, broken, foreign, modified links) and exit 1 if any")
+    parser.add_argument("--rollback", nargs="?", const="latest", metavar="RUN",
+                        help="undo the links (and adoptions) made by RUN, default the latest run, from its journal, and exit")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="time each phase, print a summary and write the spans to FILE "
+                             "(JSON lines if FILE ends in .jsonl, else Chrome trace format)")
+    parser.add_argument("--fleet", metavar="FILE",
+                        help="link every `HOME [PROFILE]` listed in FILE from one checkout, --jobs at a time")
+    parser.add_argument("--checkout", metavar="DIR",
+                        help="--fleet: link from the existing checkout DIR (readable by every target user) "
+                             "instead of ~/.dotfiles")
+    args = parser.parse_args(argv)
+    if args.offline and not args.cache:
+        parser.error("--offline requires --cache")
+    if args.fleet and (args.plan or args.apply):
+        parser.error("--fleet cannot be combined with --plan or --apply")
+    if args.checkout and not args.fleet:
+        parser.error("--checkout requires --fleet")
+    return args
+
+def main(argv=None):
     """Main function to restore dotfiles and environment."""
-    detector = EnvironmentDetector()
-    os_type, distro, hostname = detector.detect()
+    args = parse_args(argv)
+    with session(args.trace):
+        restore(args)
+
+def restore(args):
+    """Run a fleet, plan or full restore as args select."""
+    if args.rollback:
+        if not rollback_links(None if args.rollback == "latest" else args.rollback):
+            sys.exit(1)
+        return
+    
+    with span("detect"):
+        env = get_environment(debug=os.environ.get("DOTFILES_DEBUG", "0") == "1")
+    
+    if args.verify:
+        report = verify(DOTFILES_DIR, manifest_packages(env))
+        print(to_json(report) if args.json else format_report(report))
+        if report.findings:
+            sys.exit(1)
+        return
+    
+    if args.fleet:
+        if not restore_fleet(env, args.fleet, args.jobs, args.clone_mode, args.cache, args.offline, args.checkout):
+            sys.exit(1)
+        return
+    
+    if args.plan:
+        with span("plan"):
+            plan = build_plan(env, args.jobs, args.clone_mode, args.cache, args.offline, args.brew)
+        print(plan.to_json() if args.json else plan.format())
+        return
     
-    print(f"[INFO] Starting dotfiles restoration for {distro} on {hostname}...")
+    print(f"[INFO] Starting dotfiles restoration for {env.distro} on {env.hostname}...")
 
-    clone_dotfiles()
-    install_homebrew()
-    restore_brewfile(detector)
-    stow_packages(detector)
+    with span("plan"):
+        plan = build_plan(env, args.jobs, args.clone_mode, args.cache, args.offline, args.brew)
+    if args.apply:
+        print(plan.format())
+    plan.apply(concurrent=True)
 
     print("[INFO] Dotfiles restoration complete.")
-    print(f"[INFO] Environment: OS={os_type}, Distro={distro}, Hostname={hostname}")
+    print(f"[INFO] Environment: OS={env.os}, Distro={env.distro}, Hostname={env.hostname}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Compressed tar archives that can be read one file at a time.
+
+An archive is a series of independently compressed frames: one per
+package, then one holding the tar end-of-archive blocks. Decompressed
+back to back, the frames form one ordinary tar stream, so `tar -xJf` (or
+`tar --zstd -xf`) reads the whole archive. The frame offsets plus each
+member's offset inside its frame form the index. With the index, one
+file can be extracted by decompressing only part of one frame.
+"""
+
+import io
+import lzma
+import os
+import shutil
+import stat
+import tarfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 1024 * 1024
+CODECS = {"zstd": ".tar.zst", "xz": ".tar.xz"}
+
+
+def default_codec():
+    """zstd when the zstandard module is installed, else xz from the stdlib."""
+    return "zstd" if zstandard is not None else "xz"
+
+
+def _check_codec(codec):
+    if codec not in CODECS:
+        raise ValueError(f"unknown archive codec: {codec}")
+    if codec == "zstd" and zstandard is None:
+        raise ValueError("zstd archives need the zstandard module")
+
+
+def compressor(codec):
+    _check_codec(codec)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compressobj()
+    return lzma.LZMACompressor(format=lzma.FORMAT_XZ, preset=6)
+
+
+def decompressor(codec):
+    _check_codec(codec)
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj()
+    return lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+
+
+class ArchiveWriter:
+    """Stream files into a framed archive without staging copies on disk.
+
+    The archive is written to a temporary name and moved into place by
+    close(); leaving the with-block on an exception removes it instead.
+    """
+
+    def __init__(self, path, codec=None):
+        self.path = path
+        self.codec = codec or default_codec()
+        self.frames = []
+        self.bytes_in = 0
+        self._compressor = None
+        self._package = None
+        self._start = 0
+        self._offset = 0
+        self._tmp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(self._tmp_path, "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _begin_frame(self, package):
+        self._end_frame()
+        self._compressor = compressor(self.codec)
+        self._package = package
+        self._start = self._file.tell()
+        self._offset = 0
+
+    def _end_frame(self):
+        if self._compressor is None:
+            return
+        self._file.write(self._compressor.flush())
+        end = self._file.tell()
+        self.frames.append({"package": self._package, "offset": self._start, "length": end - self._start})
+        self._compressor = None
+
+    def _write(self, data):
+        self._file.write(self._compressor.compress(data))
+        self._offset += len(data)
+        self.bytes_in += len(data)
+
+    def add(self, package, target_dir, nodes):
+        """Append (rel, abs_path, lstat) nodes to package's frame.
+
+        Returns manifest entries whose frame/offset locate each member.
+        Files are read straight into the compressor; a file that shrinks
+        while being read is zero-padded so the tar stream stays valid.
+        """
+        if self._compressor is None or self._package != package:
+            self._begin_frame(package)
+        entries = []
+        for rel, abs_path, st in nodes:
+            try:
+                entries.append(self._add_node(package, target_dir, rel, abs_path, st))
+            except OSError as e:
+                print(f"[WARN] Failed to archive {abs_path}: {e}")
+        return entries
+
+    def _add_node(self, package, target_dir, rel, abs_path, st):
+        info = tarfile.TarInfo(f"{package}/{rel}")
+        info.mtime = st.st_mtime
+        info.mode = stat.S_IMODE(st.st_mode)
+        entry = {"package": package, "target_dir": target_dir, "path": rel}
+        src = None
+        if stat.S_ISLNK(st.st_mode):
+            info.type = tarfile.SYMTYPE
+            info.linkname = os.readlink(abs_path)
+            entry.update(type="symlink", link=info.linkname)
+        else:
+            src = open(abs_path, "rb")
+            info.size = st.st_size
+            entry.update(type="file", size=st.st_size, mode=info.mode, mtime=st.st_mtime)
+        entry["frame"] = len(self.frames)
+        entry["offset"] = self._offset
+        self._write(info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape"))
+        if src is not None:
+            with src:
+                self._copy(src, info.size)
+        return entry
+
+    def _copy(self, src, size):
+        remaining = size
+        while remaining:
+            chunk = src.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                self._write(bytes(remaining))
+                break
+            self._write(chunk)
+            remaining -= len(chunk)
+        padding = -size % tarfile.BLOCKSIZE
+        if padding:
+            self._write(bytes(padding))
+
+    def close(self):
+        """Finish the archive and return its frame list."""
+        self._begin_frame(None)
+        self._write(bytes(2 * tarfile.BLOCKSIZE))
+        self._end_frame()
+        self.frames.pop()
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return self.frames
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.unlink(self._tmp_path)
+        except OSError:
+            pass
+
+
+class FrameReader(io.RawIOBase):
+    """Decompress one frame of an archive as it is read."""
+
+    def __init__(self, f, codec, frame):
+        f.seek(frame["offset"])
+        self._file = f
+        self._left = frame["length"]
+        self._decompressor = decompressor(codec)
+        self._buf = b""
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._pos == len(self._buf) and self._left:
+            chunk = self._file.read(min(CHUNK_SIZE, self._left))
+            if not chunk:
+                break
+            self._left -= len(chunk)
+            self._buf = self._decompressor.decompress(chunk)
+            self._pos = 0
+        n = min(len(b), len(self._buf) - self._pos)
+        b[:n] = self._buf[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+
+def extract_member(path, codec, frame, offset, out):
+    """Copy the member at offset in frame to the file object out.
+
+    Only the member's own frame is decompressed, and only up to the end
+    of the member. Returns its TarInfo.
+    """
+    with open(path, "rb") as f:
+        reader = io.BufferedReader(FrameReader(f, codec, frame), CHUNK_SIZE)
+        while offset:
+            skipped = len(reader.read(min(CHUNK_SIZE, offset)))
+            if not skipped:
+                raise tarfile.ReadError(f"{path}: offset beyond frame")
+            offset -= skipped
+        with tarfile.open(fileobj=reader, mode="r|") as tar:
+            info = tar.next()
+            if info is None:
+                raise tarfile.ReadError(f"{path}: no member at offset")
+            if info.isfile():
+                shutil.copyfileobj(tar.extractfile(info), out, CHUNK_SIZE)
+            return info
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Per-call latency of hostname detection, in-process vs. `hostname -s`.
+
+    python3 scripts/bench_detect_env.py [-n CALLS]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from detect_env import EnvironmentDetector
+
+
+def bench(func, calls):
+    """Return the best-of-5 per-call time in microseconds."""
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=5, number=calls)) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hostname detection")
+    parser.add_argument("-n", "--calls", type=int, default=200, help="calls per repeat")
+    args = parser.parse_args()
+
+    detector = EnvironmentDetector()
+    cases = [
+        ("detect_hostname (in-process)", detector.detect_hostname),
+        ("hostname -s (subprocess)", detector._hostname_from_command),
+        ("detect() total", detector.detect),
+    ]
+
+    print(f"{'case':<32} {'us/call':>10}")
+    results = {}
+    for name, func in cases:
+        results[name] = bench(func, args.calls)
+        print(f"{name:<32} {results[name]:>10.1f}")
+
+    speedup = results["hostname -s (subprocess)"] / results["detect_hostname (in-process)"]
+    print(f"[INFO] In-process hostname is {speedup:.0f}x faster than forking")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""Benchmark interactive startup of the shipped shell configs.
+
+Each shell is launched N times against a throwaway HOME with the repo's
+packages linked in, and the p50/p95 wall time is reported. --profile adds
+a per-file/per-line breakdown from the shell's own tracer:
+
+    fish  --profile-startup
+    zsh   zsh/zprof, loaded ahead of ~/.zshrc
+    bash  xtrace with $EPOCHREALTIME in PS4 (bash 5+)
+
+    python3 scripts/bench_shell_startup.py -n 20 --profile --json before.json
+    python3 scripts/bench_shell_startup.py -n 20 --compare before.json
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from git_ops import GitError, GitRepo
+from linker import Linker
+
+DOTFILES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGES = ["bash", "zsh", "fish", "nushell", "starship"]
+SHELLS = {
+    "fish": ["fish", "-i", "-c", "exit"],
+    "zsh": ["zsh", "-i", "-c", "exit"],
+    "bash": ["bash", "-i", "-c", "exit"],
+    "nu": ["nu", "--config", "{home}/.config/nushell/config.nu",
+           "--env-config", "{home}/.config/nushell/env.nu", "-c", "exit"],
+}
+TIMEOUT = 30
+
+BASH_TRACE_RE = re.compile(r"^\++(\d+[.,]\d+) (.*):(\d+) ")
+ZPROF_RE = re.compile(
+    r"^\s*\d+\)\s+(\d+)\s+([\d.]+)\s+[\d.]+\s+[\d.]+%\s+([\d.]+)\s+[\d.]+\s+[\d.]+%\s+(\S+)"
+)
+
+
+def make_home(dotfiles_dir, packages=PACKAGES):
+    """Return a TemporaryDirectory laid out like a freshly restored HOME."""
+    tmp = tempfile.TemporaryDirectory(prefix="shell-bench-")
+    home = tmp.name
+    os.symlink(dotfiles_dir, os.path.join(home, ".dotfiles"))
+    linker = Linker(dotfiles_dir)
+    linker.plan((p, home) for p in packages if os.path.isdir(os.path.join(dotfiles_dir, p)))
+    linker.apply()
+    for conflict in linker.conflicts:
+        print(f"[WARN] {conflict.package}: {conflict.path} ({conflict.reason})")
+    return tmp
+
+
+def shell_env(home):
+    env = {"HOME": home, "PATH": os.environ.get("PATH", "/usr/bin:/bin"), "TERM": "dumb"}
+    for name in ("USER", "LOGNAME", "LANG", "DOTFILES_COMPILED_INIT"):
+        if name in os.environ:
+            env[name] = os.environ[name]
+    return env
+
+
+def shell_argv(shell, home):
+    return [arg.format(home=home) for arg in SHELLS[shell]]
+
+
+def run_once(argv, env, cwd):
+    """Milliseconds for one startup; a non-zero exit raises CalledProcessError."""
+    start = time.perf_counter()
+    result = subprocess.run(argv, env=env, cwd=cwd, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=TIMEOUT)
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, argv, stderr=result.stderr)
+    return elapsed
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def top(costs, limit):
+    ranked = sorted(costs.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{"location": location, "ms": round(ms, 3)} for location, ms in ranked]
+
+
+def parse_fish_profile(text, limit=15):
+    """Parse `fish --profile-startup` output (microseconds, tab-separated).
+
+    Lines are ranked by self time; `source` commands also give per-file
+    totals.
+    """
+    lines = defaultdict(float)
+    files = defaultdict(float)
+    for row in text.splitlines()[1:]:
+        parts = row.split("\t", 2)
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        own, total = int(parts[0]) / 1000, int(parts[1]) / 1000
+        command = parts[2].lstrip("->").strip()
+        lines[command] += own
+        words = command.split()
+        if words[:2] == ["builtin", "source"]:
+            words = words[1:]
+        if len(words) > 1 and words[0] in ("source", "."):
+            files[words[1]] += total
+    return {"files": top(files, limit), "lines": top(lines, limit)}
+
+
+def parse_bash_xtrace(text, limit=15):
+    """Attribute the gap between consecutive xtrace stamps to the earlier line."""
+    lines = defaultdict(float)
+    files = defaultdict(float)
+    previous = None
+    for row in text.splitlines():
+        match = BASH_TRACE_RE.match(row)
+        if not match:
+            continue
+        stamp = float(match.group(1).replace(",", "."))
+        if previous is not None:
+            elapsed = (stamp - previous[0]) * 1000
+            lines[f"{previous[1]}:{previous[2]}"] += elapsed
+            files[previous[1]] += elapsed
+        previous = (stamp, match.group(2) or "-", match.group(3))
+    return {"files": top(files, limit), "lines": top(lines, limit)}
+
+
+def parse_zprof(text, limit=15):
+    """Parse the first zprof table; ranks functions by self time."""
+    lines = {}
+    for row in text.splitlines():
+        match = ZPROF_RE.match(row)
+        if match and match.group(4) not in lines:
+            lines[match.group(4)] = float(match.group(3))
+    return {"files": [], "lines": top(lines, limit)}
+
+
+def profile_shell(shell, home, env, limit):
+    """Run one traced startup; returns {"files": [...], "lines": [...]} or None."""
+    if shell == "fish":
+        out = os.path.join(home, ".fish-profile")
+        subprocess.run(["fish", "--profile-startup", out, "-i", "-c", "exit"], env=env, cwd=home,
+                       stdin=subprocess.DEVNULL, capture_output=True, timeout=TIMEOUT)
+        if not os.path.exists(out):
+            return None
+        with open(out) as f:
+            return parse_fish_profile(f.read(), limit)
+    if shell == "zsh":
+        zdotdir = os.path.join(home, ".zprof")
+        os.makedirs(zdotdir, exist_ok=True)
+        with open(os.path.join(zdotdir, ".zshrc"), "w") as f:
+            f.write('zmodload zsh/zprof\nZDOTDIR="$HOME"\n[ -f "$HOME/.zshrc" ] && source "$HOME/.zshrc"\n')
+        result = subprocess.run(["zsh", "-i", "-c", "zprof"], env=dict(env, ZDOTDIR=zdotdir), cwd=home,
+                                stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=TIMEOUT)
+        return parse_zprof(result.stdout, limit)
+    if shell == "bash":
+        # PS4 is set from an rcfile: bash ignores it in the environment when run as root.
+        rcfile = os.path.join(home, ".bench-bashrc")
+        with open(rcfile, "w") as f:
+            f.write("PS4='+${EPOCHREALTIME} ${BASH_SOURCE[0]:-}:${LINENO} '\n"
+                    'set -x\n[ -f "$HOME/.bashrc" ] && source "$HOME/.bashrc"\nset +x\n')
+        result = subprocess.run(["bash", "--rcfile", rcfile, "-i", "-c", "exit"], env=env, cwd=home,
+                                stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=TIMEOUT)
+        return parse_bash_xtrace(result.stderr, limit)
+    return None
+
+
+def bench_shell(shell, home, runs, profile=False, limit=15):
+    """Time runs startups of shell.
+
+    A shell that hangs is reported with timed_out set, one that exits
+    non-zero with failed set to the reason.
+    """
+    env = shell_env(home)
+    argv = shell_argv(shell, home)
+    try:
+        run_once(argv, env, home)  # warm caches, including the env fingerprint
+        samples = [run_once(argv, env, home) for _ in range(runs)]
+    except subprocess.TimeoutExpired:
+        print(f"[WARN] {shell} did not exit within {TIMEOUT}s; skipping it")
+        return {"timed_out": True, "samples_ms": [], "p50_ms": None, "p95_ms": None}
+    except subprocess.CalledProcessError as e:
+        detail = e.stderr.strip().splitlines()[-1:] if e.stderr else []
+        reason = f"exited {e.returncode}" + (f": {detail[0]}" if detail else "")
+        print(f"[WARN] {shell} {reason}; skipping it")
+        return {"failed": reason, "samples_ms": [], "p50_ms": None, "p95_ms": None}
+    result = {
+        "samples_ms": [round(s, 3) for s in samples],
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+    }
+    if profile:
+        try:
+            result["profile"] = profile_shell(shell, home, env, limit)
+        except subprocess.TimeoutExpired:
+            print(f"[WARN] Profiling {shell} timed out after {TIMEOUT}s")
+            result["profile"] = None
+        # The temp HOME differs per run; keep locations comparable.
+        for items in (result["profile"] or {}).values():
+            for item in items:
+                item["location"] = item["location"].replace(home, "~")
+    return result
+
+
+def current_commit(dotfiles_dir):
+    try:
+        return GitRepo(dotfiles_dir).run("rev-parse", "--short", "HEAD").stdout.strip()
+    except (GitError, OSError):
+        return None
+
+
+def skipped(result):
+    return result.get("timed_out") or result.get("failed")
+
+
+def compare(results, baseline, threshold):
+    """Print p50/p95 deltas against a baseline; returns True on a regression."""
+    regressed = False
+    print(f"{'shell':<6} {'p50 before':>10} {'p50 now':>9} {'change':>8}   {'p95 before':>10} {'p95 now':>9}")
+    for shell, now in results["shells"].items():
+        before = baseline.get("shells", {}).get(shell)
+        if not before or skipped(now) or skipped(before):
+            continue
+        change = (now["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100
+        flag = ""
+        if change > threshold:
+            regressed = True
+            flag = "  REGRESSION"
+        print(f"{shell:<6} {before['p50_ms']:>10.1f} {now['p50_ms']:>9.1f} {change:>+7.1f}%"
+              f"   {before['p95_ms']:>10.1f} {now['p95_ms']:>9.1f}{flag}")
+    return regressed
+
+
+def print_report(results):
+    print(f"{'shell':<6} {'runs':>5} {'p50 ms':>8} {'p95 ms':>8}")
+    for shell, result in results["shells"].items():
+        if result.get("timed_out"):
+            print(f"{shell:<6} {'-':>5} {'timed out':>17}")
+            continue
+        if result.get("failed"):
+            print(f"{shell:<6} {'-':>5} {'failed':>17}  ({result['failed']})")
+            continue
+        print(f"{shell:<6} {len(result['samples_ms']):>5} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}")
+    for shell, result in results["shells"].items():
+        profile = result.get("profile")
+        if not profile:
+            continue
+        for section in ("files", "lines"):
+            if profile[section]:
+                print(f"\n{shell} — slowest {section}")
+                for item in profile[section]:
+                    print(f"  {item['ms']:>8.2f} ms  {item['location']}")
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark shell startup with the dotfiles configs.")
+    parser.add_argument("-n", "--runs", type=positive_int, default=10, help="timed runs per shell")
+    parser.add_argument("--shell", action="append", dest="shells", choices=sorted(SHELLS),
+                        help="shell to benchmark (repeatable; default: every installed one)")
+    parser.add_argument("--profile", action="store_true", help="add a per-file/per-line breakdown")
+    parser.add_argument("--top", type=int, default=15, help="entries per profile section")
+    parser.add_argument("--json", metavar="FILE", help="write results to FILE")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a previous --json result")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="p50 increase in percent that counts as a regression (default: 10)")
+    parser.add_argument("--dotfiles", default=DOTFILES_DIR, help="dotfiles checkout to link from")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    shells = [s for s in (args.shells or SHELLS) if shutil.which(SHELLS[s][0])]
+    for skipped in sorted(set(args.shells or SHELLS) - set(shells)):
+        print(f"[INFO] Skipping {skipped} (not installed)")
+    if not shells:
+        print("[WARN] No shells to benchmark.")
+        return 1
+
+    tmp = make_home(os.path.abspath(args.dotfiles))
+    try:
+        results = {
+            "commit": current_commit(args.dotfiles),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "runs": args.runs,
+            "shells": {},
+        }
+        for shell in shells:
+            print(f"[INFO] Benchmarking {shell}...")
+            results["shells"][shell] = bench_shell(shell, tmp.name, args.runs, args.profile, args.top)
+    finally:
+        tmp.cleanup()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[INFO] Results written to {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} ({baseline.get('commit') or 'unknown commit'}):")
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""Diff brew/Brewfile against what Homebrew has installed.
+
+The installed inventory is read from Homebrew's own directories rather
+than from `brew list`:
+
+    formulae  <prefix>/Cellar/<name>
+    casks     <prefix>/Caskroom/<token>
+    taps      <repository>/Library/Taps/<user>/homebrew-<repo>
+
+Each kind is cached in ~/.cache/dotfiles/brew-inventory.json along with
+its directory's mtime, and is re-listed only when that directory changes
+(installs and uninstalls add or remove an entry there). Restore installs
+just the missing taps, formulae and casks. Other Brewfile kinds (vscode,
+go, mas, ...) are not diffed; their entries go through `brew bundle`.
+
+Backup re-dumps the Brewfile only when something changed since the last
+dump: the inventory directories above, or the directories those other
+kinds install into (VS Code extension dirs, GOPATH/bin, /Applications).
+A Brewfile with a kind that has no such directory is always re-dumped.
+"""
+
+import json
+import os
+import re
+import tempfile
+from collections import namedtuple
+
+from runner import CommandError, run
+
+CACHE_VERSION = 1
+LINE_RE = re.compile(r'^\s*(\w+)\s+"([^"]+)"\s*(?:,\s*(.*?))?\s*$')
+QUOTED_RE = re.compile(r'"([^"]*)"')
+DIFFED_KINDS = ("tap", "brew", "cask")
+
+Entry = namedtuple("Entry", ["kind", "name", "options"])
+Inventory = namedtuple("Inventory", ["taps", "formulae", "casks"])
+BrewDiff = namedtuple("BrewDiff", ["taps", "formulae", "casks", "remove_formulae", "remove_casks", "unmanaged"])
+
+
+def parse_brewfile(text):
+    """Return the Entries of a Brewfile, skipping comments and blank lines."""
+    entries = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        match = LINE_RE.match(line)
+        if match:
+            kind, name, options = match.groups()
+            entries.append(Entry(kind, name, options or ""))
+    return entries
+
+
+def read_brewfile(path):
+    with open(path) as f:
+        return parse_brewfile(f.read())
+
+
+def short_name(name):
+    """"user/tap/formula" -> "formula"; Cellar and Caskroom use the short name."""
+    return name.rsplit("/", 1)[-1].lower()
+
+
+def tap_url(entry):
+    match = QUOTED_RE.search(entry.options)
+    return match.group(1) if match else None
+
+
+def extension_dirs():
+    """Directories that `brew bundle dump` reads the non-Homebrew kinds from."""
+    home = os.path.expanduser("~")
+    gopath = (os.environ.get("GOPATH") or os.path.join(home, "go")).split(os.pathsep)[0]
+    return {
+        "vscode": [os.path.join(home, ".vscode", "extensions"), os.path.join(home, ".vscode-oss", "extensions")],
+        "go": [os.environ.get("GOBIN") or os.path.join(gopath, "bin")],
+        "mas": ["/Applications"],
+    }
+
+
+def format_entry(entry):
+    return f'{entry.kind} "{entry.name}"' + (f", {entry.options}" if entry.options else "")
+
+
+def brew_cache_path():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "dotfiles", "brew-inventory.json")
+
+
+class BrewInventory:
+    """Installed taps, formulae and casks, cached per directory mtime."""
+
+    def __init__(self, cache=None, brew="brew", extensions=None):
+        self.cache = cache or brew_cache_path()
+        self.brew = brew
+        self.extensions = extension_dirs() if extensions is None else extensions
+        self.state = self._load()
+        self.dirty = False
+
+    def _load(self):
+        try:
+            with open(self.cache) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {"version": CACHE_VERSION}
+        return state if state.get("version") == CACHE_VERSION else {"version": CACHE_VERSION}
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = f"{self.cache}.{os.getpid()}"
+        try:
+            os.makedirs(os.path.dirname(self.cache), exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(self.state, f)
+            os.replace(tmp, self.cache)
+            self.dirty = False
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    def _locate(self, key, flag):
+        """`brew --prefix` / `--repository`, asked once and then cached."""
+        if self.state.get(key) and os.path.isdir(self.state[key]):
+            return self.state[key]
+        result = run([self.brew, flag], timeout=60, check=True)
+        self.state[key] = result.stdout.strip()
+        self.dirty = True
+        return self.state[key]
+
+    def directories(self):
+        prefix = self._locate("prefix", "--prefix")
+        repository = self._locate("repository", "--repository")
+        return {
+            "formulae": os.path.join(prefix, "Cellar"),
+            "casks": os.path.join(prefix, "Caskroom"),
+            "taps": os.path.join(repository, "Library", "Taps"),
+        }
+
+    def stamps(self):
+        """Directory mtimes that change whenever something is (un)installed."""
+        stamps = {}
+        for kind, path in self.directories().items():
+            stamps[kind] = _mtime(path)
+            if kind == "taps" and os.path.isdir(path):
+                # A new tap adds homebrew-<repo> under an existing user dir.
+                stamps[kind] = [stamps[kind]] + [_mtime(os.path.join(path, user)) for user in sorted(os.listdir(path))]
+        return stamps
+
+    def load(self, refresh=False):
+        """Return an Inventory, re-listing only the kinds whose directory changed."""
+        kinds = self.state.setdefault("kinds", {})
+        stamps = self.stamps()
+        for kind, path in self.directories().items():
+            cached = kinds.get(kind)
+            if not refresh and cached and cached["stamp"] == stamps[kind]:
+                continue
+            names = _list_taps(path) if kind == "taps" else _list_dir(path)
+            kinds[kind] = {"stamp": stamps[kind], "names": sorted(names)}
+            self.dirty = True
+        self.save()
+        return Inventory(*(set(kinds[kind]["names"]) for kind in ("taps", "formulae", "casks")))
+
+    def leaves(self):
+        """Formulae installed on request, cached against the Cellar's mtime."""
+        stamp = self.stamps()["formulae"]
+        cached = self.state.get("leaves")
+        if cached and cached["stamp"] == stamp:
+            return set(cached["names"])
+        result = run([self.brew, "leaves", "--installed-on-request"], timeout=300, check=True)
+        names = sorted(short_name(n) for n in result.stdout.split())
+        self.state["leaves"] = {"stamp": stamp, "names": names}
+        self.dirty = True
+        self.save()
+        return set(names)
+
+    def dump_stamp(self, brewfile_path):
+        return {
+            "inventory": self.stamps(),
+            "extensions": {kind: [_mtime(p) for p in paths] for kind, paths in sorted(self.extensions.items())},
+            "brewfile": _mtime(brewfile_path),
+        }
+
+    def needs_dump(self, brewfile_path):
+        """True unless nothing was installed or removed since the last dump."""
+        try:
+            kinds = {e.kind for e in read_brewfile(brewfile_path)}
+        except OSError:
+            return True
+        if kinds - set(DIFFED_KINDS) - set(self.extensions):
+            return True
+        return self.state.get("dumped") != self.dump_stamp(brewfile_path)
+
+    def record_dump(self, brewfile_path):
+        self.state["dumped"] = self.dump_stamp(brewfile_path)
+        self.dirty = True
+        self.save()
+
+
+def diff_inventory(entries, inventory, leaves=None):
+    """Compare Brewfile entries with an Inventory.
+
+    With leaves (formulae installed on request), formulae and casks that
+    the Brewfile doesn't list are returned for removal too.
+    """
+    wanted = {kind: [e for e in entries if e.kind == kind] for kind in DIFFED_KINDS}
+    taps = [e for e in wanted["tap"] if e.name.lower() not in inventory.taps]
+    formulae = [e.name for e in wanted["brew"] if short_name(e.name) not in inventory.formulae]
+    casks = [e.name for e in wanted["cask"] if short_name(e.name) not in inventory.casks]
+    remove_formulae = remove_casks = []
+    if leaves is not None:
+        listed = {short_name(e.name) for e in wanted["brew"]}
+        remove_formulae = sorted(leaves - listed)
+        listed = {short_name(e.name) for e in wanted["cask"]}
+        remove_casks = sorted(inventory.casks - listed)
+    unmanaged = [e for e in entries if e.kind not in DIFFED_KINDS]
+    return BrewDiff(taps, formulae, casks, remove_formulae, remove_casks, unmanaged)
+
+
+def apply_diff(brew_diff, brew="brew", timeout=None, stream=None):
+    """Install (and remove) only the difference. Returns the CommandResults."""
+    commands = [[brew, "tap", e.name, *filter(None, [tap_url(e)])] for e in brew_diff.taps]
+    if brew_diff.formulae:
+        commands.append([brew, "install", "--formula", *brew_diff.formulae])
+    if brew_diff.casks:
+        commands.append([brew, "install", "--cask", *brew_diff.casks])
+    if brew_diff.remove_formulae:
+        commands.append([brew, "uninstall", "--formula", *brew_diff.remove_formulae])
+    if brew_diff.remove_casks:
+        commands.append([brew, "uninstall", "--cask", *brew_diff.remove_casks])
+    bundle = None
+    if brew_diff.unmanaged:
+        # brew bundle checks these itself; hand it a Brewfile with only them.
+        with tempfile.NamedTemporaryFile("w", prefix="Brewfile.", delete=False) as f:
+            f.write("".join(format_entry(e) + "\n" for e in brew_diff.unmanaged))
+            bundle = f.name
+        commands.append([brew, "bundle", f"--file={bundle}"])
+    results = []
+    try:
+        for argv in commands:
+            result = run(argv, timeout=timeout, stream=stream)
+            results.append(result)
+            if not result.ok:
+                print(f"[WARN] {CommandError(result)}")
+    finally:
+        if bundle:
+            os.unlink(bundle)
+    return results
+
+
+def format_diff(brew_diff):
+    parts = []
+    for label, items in (
+        ("taps", brew_diff.taps), ("formulae", brew_diff.formulae), ("casks", brew_diff.casks),
+    ):
+        if items:
+            parts.append(f"{len(items)} {label}")
+    removals = len(brew_diff.remove_formulae) + len(brew_diff.remove_casks)
+    text = f"install {', '.join(parts)}" if parts else "nothing to install"
+    if brew_diff.unmanaged:
+        kinds = "/".join(sorted({e.kind for e in brew_diff.unmanaged}))
+        text += f", check {len(brew_diff.unmanaged)} {kinds} entries with brew bundle"
+    return text + (f", remove {removals}" if removals else "")
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _list_dir(path, lower=True):
+    try:
+        return [name.lower() if lower else name for name in os.listdir(path) if not name.startswith(".")]
+    except OSError:
+        return []
+
+
+def _list_taps(path):
+    taps = []
+    for user in _list_dir(path, lower=False):
+        for repo in _list_dir(os.path.join(path, user), lower=False):
+            if repo.startswith("homebrew-"):
+                taps.append(f"{user}/{repo[len('homebrew-'):]}".lower())
+    return taps
@@ -0,0 +1,786 @@
+#!/usr/bin/env python3
+"""Flatten the fish startup files into one pre-resolved init per host.
+
+conf.d/*.fish and config.fish are inlined in the order fish sources them,
+except files without the __dotfiles_compiled guard, which fish keeps
+sourcing itself.
+Anything whose answer only depends on this host is decided here instead of
+on every shell start:
+
+    command -v / type -q probes      resolved against PATH
+    $DOTFILES_OS/$DISTRO branches    resolved from detect_env
+    test -f/-d on absolute paths     resolved, path added to the key
+    `source FILE`                    inlined
+    `CMD | source`, `eval (CMD)`     CMD run once, its output inlined
+    `(brew --prefix ...)`, `(uname)` substituted in `set` lines
+    `git config --global K V`        dropped when already set
+
+Everything else (functions, loops, status checks, relative paths) is
+copied verbatim. conf.d/00-compiled-init.fish sources the result when its
+key still matches: $PATH plus the mtimes of the sources, every file a
+resolved test or inline depended on, and every PATH directory. Installing
+a tool touches its PATH directory, so that alone triggers a rebuild.
+"""
+
+import argparse
+import copy
+import glob
+import os
+import re
+import socket
+import subprocess
+import sys
+import textwrap
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from detect_env import get_environment
+
+LOADER = "00-compiled-init.fish"
+OPENERS = ("if", "for", "while", "function", "switch", "begin")
+# Variables only the loader sets; false while compiling.
+LOADER_FLAGS = ("__dotfiles_compiled", "__dotfiles_startup_path")
+COMMAND_TIMEOUT = 20
+MAX_INLINE_DEPTH = 3
+
+GUARD_RE = re.compile(r"^\s*if\s+not\s+set\s+-q\s+__dotfiles_compiled\b", re.M)
+SOURCE_PSUB_RE = re.compile(r"^source\s+\((.+?)\s*\|\s*psub\)\s*$")
+PIPE_SOURCE_RE = re.compile(r"^(.+?)\s*\|\s*source\s*$")
+EVAL_RE = re.compile(r'^eval\s+(?:"\$\((.+)\)"|\((.+)\))\s*$')
+GIT_CONFIG_RE = re.compile(r"^git\s+config\s+--global\s+(\S+)\s+(.+)$")
+PROBE_RE = re.compile(
+    r"^(?:command\s+(?:-v|-q|-s|--search)|type\s+-q|which)\s+(\S+)"
+    r"(?:\s*>\s*/dev/null)?(?:\s+2>\s*(?:&1|/dev/null))?$"
+)
+AND_RE = re.compile(r";\s*and\s+")
+OR_RE = re.compile(r";\s*or\s+")
+INLINE_END_RE = re.compile(r";\s*end\b")
+VAR_RE = re.compile(r"\$(\w+)")
+SAFE_WORD_RE = re.compile(r"[\w@%+=:,./-]+")
+EMPTY = object()
+
+
+def cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "dotfiles", "fish")
+
+
+def config_dir():
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(config_home, "fish")
+
+
+def init_paths(hostname, directory=None):
+    base = os.path.join(directory or cache_dir(), f"init-{hostname}.fish")
+    return base, base + ".key"
+
+
+def natural_key(name):
+    """Approximate fish's glob ordering (digit runs compare numerically)."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def is_guarded(path):
+    """True if path skips itself once the loader set __dotfiles_compiled."""
+    try:
+        with open(path) as f:
+            return GUARD_RE.search(f.read()) is not None
+    except OSError:
+        return False
+
+
+def source_files(fish_dir):
+    """Startup files in the order fish reads them, loader excluded.
+
+    Only files with the __dotfiles_compiled guard are compiled in. fish
+    still sources anything else in conf.d (plugins, fisher, files the
+    repo doesn't ship), so inlining it would run it twice.
+    """
+    conf_d = sorted(glob.glob(os.path.join(fish_dir, "conf.d", "*.fish")), key=natural_key)
+    files = [p for p in conf_d if os.path.basename(p) != LOADER] + [os.path.join(fish_dir, "config.fish")]
+    return [p for p in files if is_guarded(p)]
+
+
+def key_sources(fish_dir):
+    """Files the loader stats, in the loader's order (before the extras)."""
+    conf_d = sorted(glob.glob(os.path.join(fish_dir, "conf.d", "*.fish")), key=natural_key)
+    return [os.path.join(fish_dir, "config.fish")] + conf_d + ["/etc/os-release"]
+
+
+def mtime(path):
+    try:
+        return str(int(os.stat(path).st_mtime))
+    except OSError:
+        return None
+
+
+def compute_key(path_dirs, stamps):
+    """Mirror of the loader: `string join ' ' -- $PATH (path mtime -- $sources $PATH)`.
+
+    Missing paths print nothing, as `path mtime` does.
+    """
+    return " ".join(list(path_dirs) + [m for m in stamps if m is not None])
+
+
+def fish_quote(value):
+    if value and SAFE_WORD_RE.fullmatch(value):
+        return value
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+class Token:
+    def __init__(self, raw, parts):
+        self.raw = raw
+        self.parts = parts
+
+    @property
+    def literal(self):
+        """The token's text if it needs no expansion at all, else None."""
+        if all(kind == "lit" or (kind == "bare" and not set(text) & set("$~*?{")) for kind, text in self.parts):
+            return "".join(text for _, text in self.parts)
+        return None
+
+
+def tokenize(line):
+    """Split one fish statement into Tokens.
+
+    Returns None for pipes, redirections, `;`/`&` and anything else this
+    compiler does not model, so the caller copies the line verbatim.
+    """
+    tokens = []
+    parts = []
+    start = None
+    i, n = 0, len(line)
+
+    def flush(end):
+        if parts:
+            tokens.append(Token(line[start:end], list(parts)))
+            parts.clear()
+
+    while i < n:
+        c = line[i]
+        if c in " \t":
+            flush(i)
+            i += 1
+            continue
+        if not parts:
+            start = i
+        if c == "#" and not parts:
+            break
+        if c in ";|&<>":
+            return None
+        if c in "'\"":
+            j = i + 1
+            buf = []
+            escapes = "'\\" if c == "'" else '"\\$'
+            while j < n and line[j] != c:
+                if line[j] == "\\" and j + 1 < n and line[j + 1] in escapes:
+                    buf.append(line[j + 1])
+                    j += 2
+                    continue
+                buf.append(line[j])
+                j += 1
+            if j >= n:
+                return None
+            parts.append(("lit" if c == "'" else "dq", "".join(buf)))
+            i = j + 1
+            continue
+        if c == "(":
+            depth, j, quote = 0, i, None
+            while j < n:
+                ch = line[j]
+                if quote:
+                    if ch == quote:
+                        quote = None
+                elif ch in "'\"":
+                    quote = ch
+                elif ch == "(":
+                    depth += 1
+                elif ch == ")":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                j += 1
+            if j >= n:
+                return None
+            parts.append(("cmd", line[i + 1:j]))
+            i = j + 1
+            continue
+        if c == "\\":
+            if i + 1 >= n:
+                return None
+            parts.append(("lit", line[i + 1]))
+            i += 2
+            continue
+        j = i
+        while j < n and line[j] not in " \t;|&<>'\"()\\":
+            j += 1
+        parts.append(("bare", line[i:j]))
+        i = j
+    flush(n)
+    return tokens
+
+
+def _keyword(stripped):
+    return re.split(r"[\s;]", stripped, maxsplit=1)[0]
+
+
+def _opens_block(stripped):
+    return _keyword(stripped) in OPENERS and not INLINE_END_RE.search(stripped)
+
+
+def join_continuations(lines):
+    joined = []
+    buf = ""
+    for line in lines:
+        if line.rstrip().endswith("\\") and not line.rstrip().endswith("\\\\"):
+            buf += line.rstrip()[:-1] + " "
+            continue
+        joined.append(buf + line.rstrip("\n"))
+        buf = ""
+    if buf:
+        joined.append(buf)
+    return joined
+
+
+def parse(lines):
+    """Parse lines into ("line", text), ("if", branches) and ("verbatim", lines) nodes."""
+    nodes = []
+    i = 0
+    while i < len(lines):
+        node, i = _parse_node(lines, i)
+        nodes.append(node)
+    return nodes
+
+
+def _parse_node(lines, i):
+    stripped = lines[i].strip()
+    if not _opens_block(stripped):
+        return ("line", lines[i]), i + 1
+
+    is_if = _keyword(stripped) == "if"
+    branches = [[stripped[3:].strip() if is_if else None, []]]
+    depth = 0
+    j = i + 1
+    while j < len(lines):
+        inner = lines[j].strip()
+        word = _keyword(inner)
+        if _opens_block(inner):
+            depth += 1
+        elif word == "end":
+            if depth == 0:
+                if is_if and inner != "end":
+                    is_if = False
+                break
+            depth -= 1
+        elif is_if and depth == 0 and word == "else":
+            rest = inner[4:].strip()
+            branches.append([rest[3:].strip() if rest.startswith("if ") else None, []])
+            j += 1
+            continue
+        branches[-1][1].append(lines[j])
+        j += 1
+    else:
+        return ("verbatim", lines[i:]), len(lines)
+
+    if is_if:
+        return ("if", branches), j + 1
+    return ("verbatim", lines[i:j + 1]), j + 1
+
+
+class Compiler:
+    """Compile fish startup files against one host's environment."""
+
+    def __init__(self, env, home, path_dirs, fish_dir, dotfiles_dir):
+        self.env = env
+        self.home = home
+        self.fish_dir = fish_dir
+        self.dotfiles_dir = dotfiles_dir
+        self.startup_path = list(path_dirs)
+        self.vars = {
+            "HOME": [home],
+            "PATH": list(path_dirs),
+            "DOTFILES_OS": [env.os],
+            "DOTFILES_DISTRO": [env.distro],
+            "DOTFILES_HOSTNAME": [env.hostname],
+            "hostname": [socket.gethostname()],
+            "__fish_config_dir": [fish_dir],
+        }
+        self.extras = []
+        self._stamps = {}
+        self._sourcing = []
+
+    def stamp(self, path):
+        """Record path's mtime now, so edits made during compilation invalidate."""
+        if path not in self._stamps:
+            self._stamps[path] = mtime(path)
+        return self._stamps[path]
+
+    def depend(self, path):
+        if "\n" in path:
+            return
+        self.stamp(path)
+        if path not in self.extras and path not in self.startup_path:
+            self.extras.append(path)
+
+    def key(self):
+        sources = key_sources(self.fish_dir)
+        stamps = [self.stamp(p) for p in sources + self.extras + self.startup_path]
+        return compute_key(self.startup_path, stamps)
+
+    def compile(self):
+        for path in key_sources(self.fish_dir) + self.startup_path:
+            self.stamp(path)
+        out = []
+        for path in source_files(self.fish_dir):
+            out.append(f"# {os.path.relpath(path, self.fish_dir)}")
+            out.extend(self.compile_file(path))
+        return out
+
+    def compile_file(self, path, indent=""):
+        with open(path) as f:
+            lines = join_continuations(f.read().splitlines())
+        self._sourcing.append(os.path.realpath(path))
+        try:
+            return self.compile_nodes(parse(lines), indent)
+        finally:
+            self._sourcing.pop()
+
+    def compile_nodes(self, nodes, indent="", depth=0):
+        out = []
+        for node in nodes:
+            if node[0] == "line":
+                for line in self.compile_statement(node[1].strip(), depth):
+                    out.append(indent + line if line else line)
+            elif node[0] == "verbatim":
+                if self._is_conf_d_loop(node[1][0]):
+                    continue
+                out.extend(indent + line if line.strip() else "" for line in textwrap.dedent("\n".join(node[1])).splitlines())
+            else:
+                out.extend(self.compile_if(node[1], indent, depth))
+        return [line for line in out if line.strip()]
+
+    def _is_conf_d_loop(self, header):
+        # fish sources conf.d itself before config.fish
+        return re.match(r"\s*for\s+\w+\s+in\s+\S*conf\.d/\*\.fish\s*$", header) is not None
+
+    def compile_if(self, branches, indent, depth):
+        out = []
+        opened = False
+        for cond, body in branches:
+            result = True if cond is None else self.resolve(cond)
+            if result is False:
+                continue
+            nodes = parse(textwrap.dedent("\n".join(body)).splitlines())
+            if result is True and not opened:
+                out.extend(self.compile_nodes(nodes, indent, depth))
+                return out
+            if result is True:
+                out.append(indent + "else")
+            else:
+                out.append(indent + ("else if " if opened else "if ") + cond)
+                opened = True
+            saved = copy.deepcopy(self.vars)
+            out.extend(self.compile_nodes(nodes, indent + "    ", depth))
+            self.vars = saved
+            if result is True:
+                break
+        if opened:
+            out.append(indent + "end")
+        return out
+
+    def which(self, name):
+        if "/" in name:
+            return name if os.path.isfile(name) and os.access(name, os.X_OK) else None
+        for directory in self.vars.get("PATH", []):
+            candidate = os.path.join(directory, name)
+            if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+                return candidate
+        return None
+
+    def expand(self, token):
+        """Expand a Token to its list of words, or None if not known here."""
+        parts = token.parts
+        if len(parts) == 1 and parts[0][0] == "bare":
+            match = re.fullmatch(r"\$(\w+)", parts[0][1])
+            if match:
+                return list(self.vars[match.group(1)]) if match.group(1) in self.vars else None
+        words = []
+        for index, (kind, text) in enumerate(parts):
+            if kind == "lit":
+                words.append(text)
+                continue
+            if kind == "cmd" or "$(" in text:
+                return None
+            if kind == "bare":
+                if set(text) & set("*?{}"):
+                    return None
+                if index == 0 and (text == "~" or text.startswith("~/")):
+                    text = self.home + text[1:]
+            value = self._expand_vars(text, joined=kind == "dq")
+            if value is None:
+                return None
+            if value is EMPTY:
+                return []
+            words.append(value)
+        return ["".join(words)]
+
+    def _expand_vars(self, text, joined):
+        result = []
+        pos = 0
+        for match in VAR_RE.finditer(text):
+            values = self.vars.get(match.group(1))
+            if values is None:
+                return None
+            if not joined and not values:
+                return EMPTY
+            if not joined and len(values) > 1:
+                return None
+            result.append(text[pos:match.start()])
+            result.append(" ".join(values))
+            pos = match.end()
+        result.append(text[pos:])
+        return "".join(result)
+
+    def expand_all(self, tokens):
+        words = []
+        for token in tokens:
+            value = self.expand(token)
+            if value is None:
+                return None
+            words.extend(value)
+        return words
+
+    def resolve(self, cond):
+        """Evaluate a condition: True/False if decided by this host, else None."""
+        cond = cond.strip()
+        for joiner, decisive in ((AND_RE, False), (OR_RE, True)):
+            parts = joiner.split(cond)
+            if len(parts) > 1:
+                results = [self.resolve(part) for part in parts]
+                if decisive in results:
+                    return decisive
+                return None if None in results else not decisive
+        if cond.startswith("not "):
+            result = self.resolve(cond[4:])
+            return None if result is None else not result
+
+        probe = PROBE_RE.match(cond)
+        if probe:
+            tokens = tokenize(probe.group(1))
+            words = self.expand_all(tokens) if tokens else None
+            if not words or len(words) != 1:
+                return None
+            found = self.which(words[0])
+            if found is None and cond.startswith("type"):
+                return None  # could still be a function or builtin
+            return found is not None
+
+        tokens = tokenize(cond)
+        if not tokens:
+            return None
+        head = tokens[0].literal
+        if head == "set" and len(tokens) == 3 and tokens[1].literal == "-q":
+            name = tokens[2].literal
+            if name in LOADER_FLAGS:
+                return False
+            return True if name in self.vars and self.vars[name] else None
+        if head not in ("test", "[") or head == "[" and tokens[-1].literal != "]":
+            return None
+        args = tokens[1:-1] if head == "[" else tokens[1:]
+        return self._resolve_test(args)
+
+    def _resolve_test(self, args):
+        if len(args) == 3 and args[1].literal in ("=", "!="):
+            left, right = self.expand(args[0]), self.expand(args[2])
+            if left is None or right is None:
+                return None
+            equal = " ".join(left) == " ".join(right)
+            return equal if args[1].literal == "=" else not equal
+        if len(args) == 2 and args[0].literal in ("-n", "-z"):
+            value = self.expand(args[1])
+            if value is None:
+                return None
+            empty = not "".join(value)
+            return empty if args[0].literal == "-z" else not empty
+        if len(args) == 2 and args[0].literal in ("-d", "-f", "-e", "-x", "-L"):
+            value = self.expand(args[1])
+            if value is None or len(value) != 1 or not os.path.isabs(value[0]):
+                return None
+            path = value[0]
+            self.depend(path)
+            if os.path.islink(path):
+                self.depend(os.path.dirname(path))
+            check = {
+                "-d": os.path.isdir,
+                "-f": os.path.isfile,
+                "-e": os.path.exists,
+                "-x": lambda p: os.path.exists(p) and os.access(p, os.X_OK),
+                "-L": os.path.islink,
+            }[args[0].literal]
+            return check(path)
+        return None
+
+    def compile_statement(self, line, depth):
+        """Return the lines to emit for one statement."""
+        if not line or line.startswith("#"):
+            return []
+
+        for regex in (SOURCE_PSUB_RE, PIPE_SOURCE_RE, EVAL_RE):
+            match = regex.match(line)
+            if match:
+                command = next(group for group in match.groups() if group)
+                inlined = self.inline_command(command, depth)
+                return inlined if inlined is not None else [line]
+
+        git = GIT_CONFIG_RE.match(line)
+        if git:
+            return [] if self.git_config_matches(git.group(1), git.group(2)) else [line]
+
+        tokens = tokenize(line)
+        if not tokens:
+            return [line]
+        head = tokens[0].literal
+        if head in ("source", ".") and len(tokens) == 2:
+            return self.compile_source(line, tokens[1])
+        if head == "set":
+            return self.compile_set(line, tokens)
+        if head == "fish_add_path":
+            self.track_add_path(tokens[1:])
+        return [line]
+
+    def compile_source(self, line, token):
+        words = self.expand(token)
+        if not words or len(words) != 1 or not os.path.isabs(words[0]):
+            return [line]
+        path = words[0]
+        if os.path.basename(path) == "detect-env.fish":
+            return [f"set -gx {name} {fish_quote(value)}" for name, value in self.env.to_env_dict().items()]
+        real = os.path.realpath(path)
+        if not os.path.isfile(path) or real in self._sourcing:
+            return [line]
+        self.depend(path)
+        self.depend(real)
+        return [f"# source {path}"] + self.compile_file(path)
+
+    def compile_set(self, line, tokens):
+        flags = []
+        index = 1
+        while index < len(tokens) and (tokens[index].literal or "").startswith("-"):
+            flags.append(tokens[index].literal)
+            index += 1
+        if index >= len(tokens) or not tokens[index].literal:
+            return [line]
+        name = tokens[index].literal
+        value_tokens = tokens[index + 1:]
+        letters = "".join(flag.lstrip("-") for flag in flags if not flag.startswith("--"))
+
+        if "q" in letters or "n" in letters or "S" in letters:
+            return [line]
+        if "e" in letters:
+            self.vars.pop(name, None)
+            return [line]
+
+        raw = []
+        values = []
+        rewritten = False
+        for token in value_tokens:
+            expanded = self.expand(token)
+            if expanded is None:
+                substituted = self.substitute(token)
+                if substituted is None:
+                    self.vars.pop(name, None)
+                    return [line]
+                expanded, token_raw = substituted
+                rewritten = True
+            else:
+                token_raw = token.raw
+            values.extend(expanded)
+            raw.append(token_raw)
+
+        current = self.vars.get(name, [])
+        if "a" in letters or "--append" in flags:
+            values = current + values
+        elif "p" in letters or "--prepend" in flags:
+            values = values + current
+        if name == "PATH":
+            for directory in values:
+                if directory not in self.startup_path:
+                    self.depend(directory)
+        self.vars[name] = values
+        if not rewritten:
+            return [line]
+        return [" ".join(["set"] + flags + [name] + raw)]
+
+    def substitute(self, token):
+        """Run a token's `(command -v X)`, `(brew --prefix ...)` or `(uname ...)`.
+
+        Returns (words, fish source) or None if the token must stay dynamic.
+        """
+        words = []
+        for kind, text in token.parts:
+            if kind != "cmd":
+                value = self.expand(Token(text, [(kind, text)]))
+                if value is None or len(value) != 1:
+                    return None
+                words.append(value[0])
+                continue
+            output = self.run_substitution(text)
+            if output is None:
+                return None
+            words.append(output)
+        if len(token.parts) == 1:
+            return ([words[0]] if words[0] else []), (fish_quote(words[0]) if words[0] else "")
+        value = "".join(words)
+        return [value], fish_quote(value)
+
+    def run_substitution(self, text):
+        probe = PROBE_RE.match(text.strip())
+        if probe and not text.strip().startswith("type"):
+            found = self.which(probe.group(1))
+            return found or ""
+        tokens = tokenize(text)
+        argv = self.expand_all(tokens) if tokens else None
+        if not argv:
+            return None
+        name = os.path.basename(argv[0])
+        if not (name == "uname" or (name == "brew" and argv[1:2] == ["--prefix"])):
+            return None
+        output = self.run(argv)
+        if output is None or "\n" in output.strip():
+            return None
+        return output.strip()
+
+    def track_add_path(self, tokens):
+        words = self.expand_all(tokens)
+        if words is None:
+            return
+        append = "--append" in words or "-a" in words
+        move = "--move" in words or "-m" in words
+        path = self.vars.setdefault("PATH", [])
+        added = []
+        for directory in (w for w in words if not w.startswith("-")):
+            self.depend(directory)
+            if not os.path.isdir(directory):
+                continue
+            if directory in path:
+                if not move:
+                    continue
+                path.remove(directory)
+            added.append(directory)
+        self.vars["PATH"] = path + added if append else added + path
+
+    def inline_command(self, command, depth):
+        """Run an init generator once and compile its output in place."""
+        if depth >= MAX_INLINE_DEPTH:
+            return None
+        tokens = tokenize(command)
+        argv = self.expand_all(tokens) if tokens else None
+        if not argv:
+            return None
+        binary = self.which(argv[0])
+        if binary is None:
+            return None
+        output = self.run([binary] + argv[1:])
+        if output is None:
+            return None
+        self.depend(binary)
+        lines = join_continuations(output.splitlines())
+        return [f"# {command}"] + self.compile_nodes(parse(lines), depth=depth + 1)
+
+    def run(self, argv):
+        env = dict(os.environ)
+        env.update({name: " ".join(values) for name, values in self.vars.items() if name.isupper()})
+        env["PATH"] = os.pathsep.join(self.vars.get("PATH", []))
+        try:
+            result = subprocess.run(argv, env=env, capture_output=True, text=True,
+                                    timeout=COMMAND_TIMEOUT, stdin=subprocess.DEVNULL)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return result.stdout if result.returncode == 0 else None
+
+    def git_config_matches(self, key, value_text):
+        tokens = tokenize(value_text)
+        values = self.expand_all(tokens) if tokens else None
+        if not values or len(values) != 1 or not self.which("git"):
+            return False
+        current = self.run(["git", "config", "--global", "--get", key])
+        return current is not None and current.rstrip("\n") == values[0]
+
+
+def write_atomic(path, text, mode=0o600):
+    tmp = f"{path}.{os.getpid()}"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def read_key_file(key_path):
+    try:
+        with open(key_path) as f:
+            lines = f.read().split("\n")
+    except OSError:
+        return None, []
+    return lines[0], [line for line in lines[1:] if line]
+
+
+def is_fresh(fish_dir, path_dirs, hostname, directory=None):
+    init, key_path = init_paths(hostname, directory)
+    expected, extras = read_key_file(key_path)
+    if expected is None or not os.path.exists(init):
+        return False
+    stamps = [mtime(p) for p in key_sources(fish_dir) + extras + list(path_dirs)]
+    return compute_key(path_dirs, stamps) == expected
+
+
+def compile_init(fish_dir, path_dirs, directory=None, env=None, dotfiles_dir=None):
+    """Compile and write the init for this host. Returns (init path, Compiler)."""
+    env = env or get_environment()
+    home = os.path.expanduser("~")
+    compiler = Compiler(env, home, path_dirs, fish_dir, dotfiles_dir or os.path.join(home, ".dotfiles"))
+    body = compiler.compile()
+    hostname = compiler.vars["hostname"][0]
+    header = [
+        f"# Generated by scripts/compile_fish_init.py for {hostname}; do not edit.",
+        "# Sourced by conf.d/00-compiled-init.fish while its key matches.",
+    ]
+    init, key_path = init_paths(hostname, directory)
+    os.makedirs(os.path.dirname(init), exist_ok=True)
+    write_atomic(init, "\n".join(header + body) + "\n")
+    write_atomic(key_path, "\n".join([compiler.key()] + compiler.extras) + "\n")
+    return init, compiler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Precompile the fish startup files for this host.")
+    parser.add_argument("--path", help="PATH fish starts with (default: $PATH)")
+    parser.add_argument("--config-dir", default=None, help="fish config dir (default: ~/.config/fish)")
+    parser.add_argument("--output", default=None, help="cache dir (default: ~/.cache/dotfiles/fish)")
+    parser.add_argument("--check", action="store_true", help="exit 0 if the compiled init is fresh, 1 otherwise")
+    parser.add_argument("--print", action="store_true", help="print the compiled init instead of writing it")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fish_dir = args.config_dir or config_dir()
+    path_dirs = [p for p in (args.path if args.path is not None else os.environ.get("PATH", "")).split(os.pathsep) if p]
+
+    if args.check:
+        return 0 if is_fresh(fish_dir, path_dirs, socket.gethostname(), args.output) else 1
+    if args.print:
+        compiler = Compiler(get_environment(), os.path.expanduser("~"), path_dirs, fish_dir,
+                            os.path.join(os.path.expanduser("~"), ".dotfiles"))
+        print("\n".join(compiler.compile()))
+        return 0
+
+    init, compiler = compile_init(fish_dir, path_dirs, args.output)
+    if not args.quiet:
+        print(f"[INFO] Wrote {init} ({len(compiler.extras)} extra dependencies)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
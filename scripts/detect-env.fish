@@ -48,9 +48,74 @@ function detect_hostname
     hostname -s 2>/dev/null || hostname || echo "unknown"
 end
 
-set -gx DOTFILES_OS (detect_os)
-set -gx DOTFILES_DISTRO (detect_distro)
-set -gx DOTFILES_HOSTNAME (detect_hostname)
+function __dotfiles_env_cache_file
+    if set -q XDG_CACHE_HOME; and test -n "$XDG_CACHE_HOME"
+        echo $XDG_CACHE_HOME/dotfiles/env
+    else
+        echo $HOME/.cache/dotfiles/env
+    end
+end
+
+# "<boot id>:<hostname>", built from builtins only.
+function __dotfiles_env_cache_key
+    set -l boot_id ""
+    if test -r /proc/sys/kernel/random/boot_id
+        read boot_id </proc/sys/kernel/random/boot_id
+    end
+    echo "$boot_id:$hostname"
+end
+
+# Sets the three variables from the cache without forking. Fails if the
+# cache is missing, older than /etc/os-release, or from another boot/host.
+function __dotfiles_load_env_cache --argument-names cache_file key
+    builtin -q path; or return 1
+    test -f $cache_file; or return 1
+    if test -f /etc/os-release
+        test (path mtime $cache_file) -ge (path mtime /etc/os-release); or return 1
+    end
+
+    set -l cached_key
+    set -l os
+    set -l distro
+    set -l host
+    while read -l line
+        set -l kv (string split -m 1 = -- $line)
+        switch $kv[1]
+            case DOTFILES_CACHE_KEY
+                set cached_key $kv[2]
+            case DOTFILES_OS
+                set os $kv[2]
+            case DOTFILES_DISTRO
+                set distro $kv[2]
+            case DOTFILES_HOSTNAME
+                set host $kv[2]
+        end
+    end <$cache_file
+
+    test "$cached_key" = "$key"; and test -n "$os"; and test -n "$distro"; and test -n "$host"; or return 1
+    set -gx DOTFILES_OS $os
+    set -gx DOTFILES_DISTRO $distro
+    set -gx DOTFILES_HOSTNAME $host
+end
+
+function __dotfiles_write_env_cache --argument-names cache_file key
+    set -l tmp $cache_file.$fish_pid
+    mkdir -p (dirname $cache_file) 2>/dev/null; or return 0
+    printf 'DOTFILES_CACHE_KEY=%s\nDOTFILES_OS=%s\nDOTFILES_DISTRO=%s\nDOTFILES_HOSTNAME=%s\n' \
+        $key $DOTFILES_OS $DOTFILES_DISTRO $DOTFILES_HOSTNAME >$tmp 2>/dev/null
+    and mv -f $tmp $cache_file 2>/dev/null
+    or rm -f $tmp
+end
+
+set -l __dotfiles_cache_file (__dotfiles_env_cache_file)
+set -l __dotfiles_cache_key (__dotfiles_env_cache_key)
+
+if contains -- --refresh $argv; or test "$DOTFILES_ENV_REFRESH" = "1"; or not __dotfiles_load_env_cache $__dotfiles_cache_file $__dotfiles_cache_key
+    set -gx DOTFILES_OS (detect_os)
+    set -gx DOTFILES_DISTRO (detect_distro)
+    set -gx DOTFILES_HOSTNAME (detect_hostname)
+    __dotfiles_write_env_cache $__dotfiles_cache_file $__dotfiles_cache_key
+end
 
 if test "$DOTFILES_DEBUG" = "1"
     echo "[dotfiles-env] OS: $DOTFILES_OS, Distro: $DOTFILES_DISTRO, Hostname: $DOTFILES_HOSTNAME" >&2
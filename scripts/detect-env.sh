@@ -2,6 +2,8 @@
 
 set -euo pipefail
 
+DOTFILES_ENV_CACHE="${XDG_CACHE_HOME:-$HOME/.cache}/dotfiles/env"
+
 detect_os() {
     if [[ "$OSTYPE" == "darwin"* ]]; then
         echo "darwin"
@@ -13,19 +15,19 @@ detect_os() {
 detect_distro() {
     local os
     os=$(detect_os)
-    
+
     if [[ "$os" == "darwin" ]]; then
         echo "macos"
         return 0
     fi
-    
+
     if [[ ! -f /etc/os-release ]]; then
         echo "unknown"
         return 1
     fi
-    
+
     . /etc/os-release
-    
+
     case "${ID:-unknown}" in
         arch)
             echo "arch"
@@ -49,6 +51,47 @@ detect_hostname() {
     hostname -s 2>/dev/null || hostname || echo "unknown"
 }
 
+# Sets DOTFILES_ENV_KEY to "<boot id>:<hostname>" using only builtins.
+env_cache_key() {
+    local boot_id=""
+    if [[ -r /proc/sys/kernel/random/boot_id ]]; then
+        read -r boot_id < /proc/sys/kernel/random/boot_id || true
+    fi
+    DOTFILES_ENV_KEY="${boot_id}:${HOSTNAME:-}"
+}
+
+# Loads the three variables from the cache without forking. Fails if the
+# cache is missing, older than /etc/os-release, or from another boot/host.
+load_env_cache() {
+    [[ -f "$DOTFILES_ENV_CACHE" ]] || return 1
+    if [[ -f /etc/os-release && /etc/os-release -nt "$DOTFILES_ENV_CACHE" ]]; then
+        return 1
+    fi
+
+    local name value cached_key="" os="" distro="" host=""
+    while IFS='=' read -r name value; do
+        case "$name" in
+            DOTFILES_CACHE_KEY) cached_key=$value ;;
+            DOTFILES_OS) os=$value ;;
+            DOTFILES_DISTRO) distro=$value ;;
+            DOTFILES_HOSTNAME) host=$value ;;
+        esac
+    done < "$DOTFILES_ENV_CACHE"
+
+    [[ "$cached_key" == "$DOTFILES_ENV_KEY" && -n "$os" && -n "$distro" && -n "$host" ]] || return 1
+    DOTFILES_OS=$os
+    DOTFILES_DISTRO=$distro
+    DOTFILES_HOSTNAME=$host
+}
+
+write_env_cache() {
+    local tmp="${DOTFILES_ENV_CACHE}.$$"
+    mkdir -p "$(dirname "$DOTFILES_ENV_CACHE")" 2>/dev/null || return 0
+    printf 'DOTFILES_CACHE_KEY=%s\nDOTFILES_OS=%s\nDOTFILES_DISTRO=%s\nDOTFILES_HOSTNAME=%s\n' \
+        "$DOTFILES_ENV_KEY" "$DOTFILES_OS" "$DOTFILES_DISTRO" "$DOTFILES_HOSTNAME" > "$tmp" 2>/dev/null \
+        && mv -f "$tmp" "$DOTFILES_ENV_CACHE" 2>/dev/null || rm -f "$tmp"
+}
+
 export_env_vars() {
     export DOTFILES_OS
     export DOTFILES_DISTRO
@@ -56,12 +99,17 @@ export_env_vars() {
 }
 
 main() {
-    DOTFILES_OS=$(detect_os)
-    DOTFILES_DISTRO=$(detect_distro)
-    DOTFILES_HOSTNAME=$(detect_hostname)
-    
+    env_cache_key
+
+    if [[ "${1:-}" == "--refresh" || "${DOTFILES_ENV_REFRESH:-0}" == "1" ]] || ! load_env_cache; then
+        DOTFILES_OS=$(detect_os)
+        DOTFILES_DISTRO=$(detect_distro || true)
+        DOTFILES_HOSTNAME=$(detect_hostname)
+        write_env_cache
+    fi
+
     export_env_vars
-    
+
     if [[ "${DOTFILES_DEBUG:-0}" == "1" ]]; then
         echo "[dotfiles-env] OS: $DOTFILES_OS, Distro: $DOTFILES_DISTRO, Hostname: $DOTFILES_HOSTNAME" >&2
     fi
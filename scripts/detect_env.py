@@ -3,10 +3,30 @@
 import os
 import sys
 import platform
+import socket
 import subprocess
+import threading
+from dataclasses import dataclass
 from pathlib import Path
 
 
+@dataclass(frozen=True)
+class Environment:
+    """Immutable result of one detection run."""
+
+    __slots__ = ("os", "distro", "hostname")
+    os: str
+    distro: str
+    hostname: str
+
+    def to_env_dict(self):
+        return {
+            "DOTFILES_OS": self.os,
+            "DOTFILES_DISTRO": self.distro,
+            "DOTFILES_HOSTNAME": self.hostname,
+        }
+
+
 class EnvironmentDetector:
     def __init__(self, debug=False):
         self.debug = debug
@@ -45,8 +65,8 @@ class EnvironmentDetector:
 
         return self._os_release_cache
 
-    def detect_distro(self):
-        os_type = self.detect_os()
+    def detect_distro(self, os_type=None):
+        os_type = os_type or self.detect_os()
 
         if os_type == "darwin":
             return "macos"
@@ -66,6 +86,17 @@ class EnvironmentDetector:
         return distro_map.get(distro_id, distro_id)
 
     def detect_hostname(self):
+        """Short hostname, as `hostname -s` would print it, without forking."""
+        for resolve in (socket.gethostname, lambda: os.uname().nodename):
+            try:
+                hostname = short_hostname(resolve())
+            except Exception:
+                continue
+            if hostname:
+                return hostname
+        return self._hostname_from_command()
+
+    def _hostname_from_command(self):
         try:
             result = subprocess.run(
                 ["hostname", "-s"], capture_output=True, text=True, check=False
@@ -79,7 +110,7 @@ class EnvironmentDetector:
                 ["hostname"], capture_output=True, text=True, check=False
             )
             if result.returncode == 0:
-                hostname = result.stdout.strip()
+                hostname = short_hostname(result.stdout)
                 if hostname:
                     return hostname
         except Exception:
@@ -89,7 +120,7 @@ class EnvironmentDetector:
 
     def detect(self):
         os_type = self.detect_os()
-        distro = self.detect_distro()
+        distro = self.detect_distro(os_type)
         hostname = self.detect_hostname()
 
         if self.debug:
@@ -100,23 +131,134 @@ class EnvironmentDetector:
 
         return os_type, distro, hostname
 
+    def environment(self):
+        return Environment(*self.detect())
+
     def to_env_dict(self):
-        os_type, distro, hostname = self.detect()
-        return {
-            "DOTFILES_OS": os_type,
-            "DOTFILES_DISTRO": distro,
-            "DOTFILES_HOSTNAME": hostname,
-        }
+        return self.environment().to_env_dict()
+
+
+_environment = None
+_environment_lock = threading.Lock()
+
+
+def get_environment(debug=False):
+    """Return the process-wide Environment, detecting it on first use only."""
+    global _environment
+    env = _environment
+    if env is None:
+        with _environment_lock:
+            if _environment is None:
+                _environment = EnvironmentDetector(debug=debug).environment()
+            env = _environment
+    return env
+
+
+def set_environment(env):
+    """Override the shared Environment (None forces re-detection).
+
+    Meant for tests; returns the previous value so it can be restored.
+    """
+    global _environment
+    with _environment_lock:
+        previous, _environment = _environment, env
+    return previous
+
+
+def short_hostname(name):
+    """Strip the domain part, matching `hostname -s`."""
+    return name.strip().split(".", 1)[0]
+
+
+ENV_KEYS = ("DOTFILES_OS", "DOTFILES_DISTRO", "DOTFILES_HOSTNAME")
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+OS_RELEASE_PATH = "/etc/os-release"
+
+
+def env_cache_path():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "dotfiles", "env")
+
+
+def env_cache_key():
+    """Return "<boot id>:<hostname>", the same key detect-env.sh/.fish use."""
+    boot_id = ""
+    try:
+        with open(BOOT_ID_PATH) as f:
+            boot_id = f.read().strip()
+    except OSError:
+        pass
+    return f"{boot_id}:{socket.gethostname()}"
+
+
+def read_env_cache(path=None, key=None):
+    """Return the cached env dict, or None if missing or stale.
+
+    The cache is stale when /etc/os-release is newer than it (an OS
+    upgrade) or when it was written on another boot or host.
+    """
+    path = path or env_cache_path()
+    try:
+        cache_mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    try:
+        if os.stat(OS_RELEASE_PATH).st_mtime_ns > cache_mtime:
+            return None
+    except OSError:
+        pass
+
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                name, sep, value = line.rstrip("\n").partition("=")
+                if sep:
+                    values[name] = value
+    except OSError:
+        return None
+
+    if values.get("DOTFILES_CACHE_KEY") != (key or env_cache_key()):
+        return None
+    if not all(values.get(name) for name in ENV_KEYS):
+        return None
+    return {name: values[name] for name in ENV_KEYS}
+
+
+def write_env_cache(env, path=None, key=None):
+    path = path or env_cache_path()
+    tmp = f"{path}.{os.getpid()}"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w") as f:
+            f.write(f"DOTFILES_CACHE_KEY={key or env_cache_key()}\n")
+            for name in ENV_KEYS:
+                f.write(f"{name}={env[name]}\n")
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def cached_env(refresh=False, debug=False):
+    """Return the env dict from the cache, detecting and rewriting it on a miss."""
+    key = env_cache_key()
+    env = None if refresh else read_env_cache(key=key)
+    if env is None:
+        env = EnvironmentDetector(debug=debug).to_env_dict()
+        write_env_cache(env, key=key)
+    return env
 
 
 def main():
     debug = os.environ.get("DOTFILES_DEBUG", "0") == "1"
-    detector = EnvironmentDetector(debug=debug)
-    os_type, distro, hostname = detector.detect()
+    refresh = "--refresh" in sys.argv[1:] or os.environ.get("DOTFILES_ENV_REFRESH", "0") == "1"
+    env = cached_env(refresh=refresh, debug=debug)
 
-    print(f"DOTFILES_OS={os_type}")
-    print(f"DOTFILES_DISTRO={distro}")
-    print(f"DOTFILES_HOSTNAME={hostname}")
+    for name in ENV_KEYS:
+        print(f"{name}={env[name]}")
 
 
 if __name__ == "__main__":
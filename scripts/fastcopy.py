@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Copy file contents without pushing every byte through userspace.
+
+copy_file() tries, in order:
+
+    reflink          FICLONE ioctl; a copy-on-write clone on btrfs/xfs/bcachefs
+    copy_file_range  in-kernel copy (server-side on NFS 4.2, CoW where supported)
+    sendfile         in-kernel copy between two regular files
+    userspace        plain read/write
+
+A method that fails with an "unsupported here" errno is remembered for
+that pair of filesystems and skipped from then on. Any other error is
+raised.
+"""
+
+import errno
+import os
+import shutil
+import sys
+import threading
+
+FICLONE = 0x40049409
+CHUNK_SIZE = 1024 * 1024
+
+# Errnos that mean "this method can't do this copy", not "the copy failed".
+FALLBACK_ERRNOS = {
+    errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTTY, errno.EXDEV, errno.EINVAL,
+    errno.ENOSYS, errno.EPERM, errno.EBADF, errno.ENOTSOCK,
+}
+
+_unsupported = {}
+_unsupported_lock = threading.Lock()
+
+
+def _reflink(src_fd, dst_fd, size):
+    import fcntl
+
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+
+def _copy_file_range(src_fd, dst_fd, size):
+    offset = 0
+    while offset < size:
+        copied = os.copy_file_range(src_fd, dst_fd, size - offset, offset, offset)
+        if not copied:
+            break
+        offset += copied
+
+
+def _sendfile(src_fd, dst_fd, size):
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+        if not sent:
+            break
+        offset += sent
+
+
+def _userspace(src_fd, dst_fd, size):
+    os.lseek(src_fd, 0, os.SEEK_SET)
+    os.lseek(dst_fd, 0, os.SEEK_SET)
+    with open(src_fd, "rb", closefd=False) as src, open(dst_fd, "wb", closefd=False) as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+METHODS = []
+if sys.platform.startswith("linux"):
+    METHODS.append(("reflink", _reflink))
+if hasattr(os, "copy_file_range"):
+    METHODS.append(("copy_file_range", _copy_file_range))
+if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+    METHODS.append(("sendfile", _sendfile))
+METHODS.append(("userspace", _userspace))
+
+
+def copy_file(src, dst):
+    """Write src's contents to dst (created or truncated); returns the method used."""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        src_st = os.fstat(src_fd)
+        key = (src_st.st_dev, os.fstat(dst_fd).st_dev)
+        for name, method in METHODS:
+            if name in _unsupported.get(key, ()):
+                continue
+            try:
+                method(src_fd, dst_fd, src_st.st_size)
+                return name
+            except OSError as e:
+                if e.errno not in FALLBACK_ERRNOS or name == "userspace":
+                    raise
+                with _unsupported_lock:
+                    _unsupported.setdefault(key, set()).add(name)
+                os.ftruncate(dst_fd, 0)
+    raise AssertionError("userspace copy is always available")
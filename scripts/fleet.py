@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+import os
+import pwd
+import shlex
+import stat
+import time
+from collections import namedtuple
+
+from linker import Linker
+from parallel import run_packages
+
+FleetTarget = namedtuple("FleetTarget", ["home", "profile"])
+TargetReport = namedtuple(
+    "TargetReport", ["home", "profile", "ok", "actions", "conflicts", "error", "duration"]
+)
+
+
+def read_targets(path):
+    """Parse a fleet file: one `HOME [PROFILE]` per line, # comments allowed."""
+    targets = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            fields = shlex.split(line, comments=True)
+            if not fields:
+                continue
+            if len(fields) > 2:
+                raise ValueError(f"{path}:{number}: expected HOME [PROFILE]")
+            targets.append(FleetTarget(os.path.abspath(os.path.expanduser(fields[0])),
+                                       fields[1] if len(fields) > 1 else None))
+    return targets
+
+
+def home_path(spec, home):
+    """Expand a "~"-relative target spec against home instead of $HOME."""
+    if spec == "~" or spec.startswith("~/"):
+        return home + spec[1:]
+    return spec
+
+
+def makedirs(path, created):
+    """os.makedirs(path, exist_ok=True), appending each directory it creates to created."""
+    missing = []
+    while not os.path.isdir(path):
+        missing.append(path)
+        path = os.path.dirname(path)
+    for path in reversed(missing):
+        os.mkdir(path)
+        created.append(path)
+
+
+def link_checkout(dotfiles_dir, home, created):
+    """Point home/.dotfiles at the shared checkout unless something is there."""
+    link = os.path.join(home, ".dotfiles")
+    if not os.path.lexists(link):
+        os.symlink(dotfiles_dir, link)
+        created.append(link)
+
+
+def _groups(uid, gid):
+    try:
+        return set(os.getgrouplist(pwd.getpwuid(uid).pw_name, gid))
+    except KeyError:
+        return {gid}
+
+
+def _permits(st, uid, groups, bits):
+    """Whether mode st grants uid (in groups) every permission in bits (r=4, x=1)."""
+    if uid == 0:
+        return True
+    if st.st_uid == uid:
+        return st.st_mode & (bits << 6) == bits << 6
+    if st.st_gid in groups:
+        return st.st_mode & (bits << 3) == bits << 3
+    return st.st_mode & bits == bits
+
+
+def check_checkout(dotfiles_dir, uid, gid):
+    """Raise PermissionError unless uid can reach and list the checkout.
+
+    A fleet run as root links every home into root's checkout, which is
+    usually under a 0700 home directory; the links would all dangle for
+    the home's owner.
+    """
+    groups = _groups(uid, gid)
+    path = os.path.realpath(dotfiles_dir)
+    ancestors = []
+    while True:
+        ancestors.append(path)
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    for path in ancestors:
+        bits = stat.S_IROTH | stat.S_IXOTH if path == ancestors[0] else stat.S_IXOTH
+        if not _permits(os.stat(path), uid, groups, bits):
+            raise PermissionError(
+                f"checkout {dotfiles_dir} is not readable by uid {uid} ({path} denies access); "
+                "use --checkout with a checkout outside root's home"
+            )
+
+
+def chown_created(paths, uid, gid):
+    for path in paths:
+        os.lchown(path, uid, gid)
+
+
+def provision_home(dotfiles_dir, home, packages, package_targets):
+    """Link packages into one home; returns the applied Linker.
+
+    Run as root for other users' homes, the checkout must be readable by
+    the home's owner, and everything created is chowned to that owner.
+    """
+    created = []
+    makedirs(home, created)
+    st = os.stat(home)
+    owner = (st.st_uid, st.st_gid)
+    foreign = owner != (os.geteuid(), os.getegid())
+    if foreign:
+        check_checkout(dotfiles_dir, *owner)
+    link_checkout(dotfiles_dir, home, created)
+    pairs = []
+    for package in packages:
+        target = home_path(package_targets[package], home)
+        makedirs(target, created)
+        pairs.append((package, target))
+    linker = Linker(dotfiles_dir)
+    linker.plan(pairs)
+    done = linker.apply()
+    if foreign:
+        chown_created(created + [a.path for a in done if a.op in ("mkdir", "link")], *owner)
+    return linker
+
+
+def provision(dotfiles_dir, targets, resolve_packages, package_targets, jobs=1):
+    """Link every target home from one checkout, jobs homes at a time.
+
+    resolve_packages(profile) returns the package list for a target and
+    may raise ValueError for an unknown profile. A target fails on any
+    error or conflict; the others carry on. Returns TargetReports in
+    input order.
+    """
+    by_home = {}
+    for target in targets:
+        if target.home in by_home:
+            raise ValueError(f"duplicate fleet target: {target.home}")
+        by_home[target.home] = target
+
+    def work(home):
+        packages = resolve_packages(by_home[home].profile)
+        linker = provision_home(dotfiles_dir, home, packages, package_targets)
+        if linker.errors:
+            action, error = linker.errors[0]
+            raise OSError(f"{action.path}: {error}")
+        return linker
+
+    start = time.perf_counter()
+    results = run_packages(list(by_home), work, {home: [home] for home in by_home}, jobs, "home")
+    reports = []
+    for result in results:
+        target = by_home[result.package]
+        linker = result.value
+        conflicts = linker.conflicts if linker else []
+        error = result.error
+        if error is None and conflicts:
+            first = conflicts[0]
+            error = f"{len(conflicts)} conflicts, first: {first.path} ({first.reason})"
+        reports.append(TargetReport(
+            target.home,
+            target.profile,
+            error is None,
+            len(linker.actions) if linker else 0,
+            len(conflicts),
+            error,
+            result.duration,
+        ))
+    print_report(reports, time.perf_counter() - start)
+    return reports
+
+
+def print_report(reports, elapsed):
+    failed = [r for r in reports if not r.ok]
+    print(f"[INFO] Fleet: {len(reports) - len(failed)} ok, {len(failed)} failed "
+          f"({len(reports)} targets in {elapsed:.2f}s)")
+    width = max((len(r.home) for r in reports), default=0)
+    for r in reports:
+        status = "ok" if r.ok else f"FAILED: {r.error}"
+        print(f"[INFO]   {r.home:<{width}}  {r.profile or 'default':<10} "
+              f"{r.actions:4d} actions {r.duration * 1000:8.1f} ms  {status}")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import os
+
+from runner import command_name, run
+from tracing import span
+
+# Long enough for a full clone over a slow link; a fetch stuck on the
+# network is killed rather than blocking the run.
+GIT_TIMEOUT = 600
+
+
+class GitError(Exception):
+    pass
+
+
+def _run_git(argv, name, timeout, **args):
+    """Run git with no terminal: stdin is /dev/null and credential prompts fail."""
+    with span(name, "git", **args):
+        return run(argv, timeout=timeout, env=dict(os.environ, GIT_TERMINAL_PROMPT="0"), detach=True)
+
+
+def _reason(result):
+    if result.timed_out:
+        return f"timed out after {result.duration:.0f}s"
+    return result.stderr.strip()
+
+
+class GitRepo:
+    """Minimal git wrapper that passes argv lists, never shell strings.
+
+    Work is limited to explicit pathspecs so git only refreshes the index
+    entries the run actually touched, and a commit takes at most three
+    process launches: status, add (only for untracked files) and commit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def run(self, *args, check=True, timeout=GIT_TIMEOUT):
+        result = _run_git(["git", "-C", self.path, *args], command_name(["git", *args]), timeout)
+        if check and not result.ok:
+            raise GitError(f"git {' '.join(args)} failed: {_reason(result)}")
+        return result
+
+    def status(self, paths=None):
+        """Return [(code, path)] for changed files, limited to paths if given."""
+        args = ["--no-optional-locks", "--literal-pathspecs", "status", "--porcelain=v1", "-z", "--untracked-files=all"]
+        if paths is not None:
+            if not paths:
+                return []
+            args += ["--", *paths]
+        output = self.run(*args).stdout
+        return parse_porcelain_z(output)
+
+    def commit_paths(self, paths, message):
+        """Commit only the changes under paths. Returns the changed paths."""
+        changes = self.status(paths)
+        if not changes:
+            return []
+
+        untracked = [path for code, path in changes if code == "??"]
+        if untracked:
+            self.run("--literal-pathspecs", "add", "--", *untracked)
+        changed = [path for _, path in changes]
+        self.run("--literal-pathspecs", "commit", "-q", "-m", message, "--", *changed)
+        return changed
+
+    def is_shallow(self):
+        return self.run("rev-parse", "--is-shallow-repository").stdout.strip() == "true"
+
+    def is_sparse(self):
+        return self.run("config", "--bool", "core.sparseCheckout", check=False).stdout.strip() == "true"
+
+    def current_branch(self):
+        return self.run("symbolic-ref", "--short", "HEAD").stdout.strip()
+
+    def sparse_checkout(self, paths):
+        """Limit the working tree to paths (cone mode); top-level files stay."""
+        self.run("sparse-checkout", "set", "--cone", *paths)
+
+    def object_bytes(self):
+        """Bytes in the object store, loose plus packed (what a fetch grows)."""
+        counts = {}
+        for line in self.run("count-objects", "-v").stdout.splitlines():
+            key, _, value = line.partition(":")
+            counts[key.strip()] = value.strip()
+        return (int(counts.get("size", 0)) + int(counts.get("size-pack", 0))) * 1024
+
+    def update(self, remote="origin"):
+        """Fetch only the current branch and fast-forward to it.
+
+        In a shallow repo this transfers just the commits past the shallow
+        boundary; the existing history is neither deepened nor re-fetched.
+        """
+        self.run("fetch", "-q", remote, self.current_branch())
+        self.run("merge", "-q", "--ff-only", "FETCH_HEAD")
+
+
+def clone(url, dest, depth=None, blob_filter=None, sparse=False, bare=False, timeout=GIT_TIMEOUT):
+    """Clone url into dest and return a GitRepo for it.
+
+    Local sources need a file:// url for depth and blob_filter to apply.
+    """
+    args = ["git", "clone", "-q"]
+    if bare:
+        args.append("--bare")
+    if depth:
+        args += ["--depth", str(depth)]
+    if blob_filter:
+        args.append(f"--filter={blob_filter}")
+    if sparse:
+        args.append("--sparse")
+    result = _run_git(args + ["--", url, dest], "git clone", timeout, url=url)
+    if not result.ok:
+        raise GitError(f"git clone {url} failed: {_reason(result)}")
+    return GitRepo(dest)
+
+
+def parse_porcelain_z(output):
+    """Parse `git status --porcelain=v1 -z` output into [(code, path)].
+
+    Renames and copies are reported as two entries, one per path, so both
+    sides end up in the commit.
+    """
+    changes = []
+    fields = output.split("\0")
+    i = 0
+    while i < len(fields):
+        field = fields[i]
+        i += 1
+        if not field:
+            continue
+        code, path = field[:2], field[3:]
+        changes.append((code, path))
+        if code[0] in "RC":
+            changes.append((code, fields[i]))
+            i += 1
+    return changes
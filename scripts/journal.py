@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Write-ahead journal for linker runs, with rollback.
+
+Every run gets ~/.local/state/dotfiles/journal/<run>.jsonl. Before a
+package's actions touch the home directory, one record per action is
+appended and fsync'ed in a single batch:
+
+    mkdir   path                   undo: rmdir (if still empty)
+    link    path, source           undo: unlink (if it still points at source)
+    unlink  path, dest             undo: symlink dest (if nothing took its place)
+    adopt   path, source, saved    undo: move source back to path and put
+                                   the saved original in the repo again
+
+For an adopt, the repo's original file is kept as a hard link in
+<run>.saved/, so nothing is copied unless hard links aren't possible.
+A package ends with a commit record. If one of its actions fails, the
+ones already done (and a half-done adopt) are undone in reverse and the
+package ends with abort
+instead, so each package is applied whole or not at all. Commit records
+are not fsync'ed one by one; close() syncs them with the closing end
+record.
+
+A journal without an end record means the run was interrupted. The
+next run first undoes that run's packages that never committed. A
+committed run can be undone completely with rollback(). Every undo step
+checks the current state first, so replaying a journal twice is
+harmless.
+"""
+
+import errno
+import json
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+
+from fastcopy import copy_file
+
+KEEP_JOURNALS = 20
+
+Undo = namedtuple("Undo", ["run", "undone", "skipped"])
+
+
+def journal_dir():
+    state_home = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(state_home, "dotfiles", "journal")
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    """One run's journal, opened for appending."""
+
+    def __init__(self, path):
+        self.path = path
+        self.run = os.path.basename(path)[:-len(".jsonl")]
+        self.saved_dir = os.path.join(os.path.dirname(path), self.run + ".saved")
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._file = open(path, "a")
+
+    @classmethod
+    def start(cls, directory=None):
+        """Recover interrupted runs, prune old journals, and open a new one."""
+        directory = directory or journal_dir()
+        os.makedirs(directory, exist_ok=True)
+        for run in unfinished(directory):
+            result = undo(directory, run, committed=False)
+            if result.undone:
+                print(f"[WARN] Undid {result.undone} actions left by interrupted run {run}")
+        prune(directory)
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}-{os.getpid()}"
+        journal = cls(os.path.join(directory, name + ".jsonl"))
+        journal._append([{"op": "begin", "time": time.time()}], sync=True)
+        _fsync_dir(directory)
+        return journal
+
+    def _append(self, records, sync):
+        with self._lock:
+            self._file.write("".join(json.dumps(r) + "\n" for r in records))
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def _prepare(self, package, action):
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        record = {"op": action.op, "package": package, "path": action.path, "seq": seq}
+        if action.op == "link":
+            record["source"] = action.source
+        elif action.op == "unlink":
+            record["dest"] = os.readlink(action.path)
+        elif action.op == "adopt":
+            record["source"] = action.source
+            record["saved"] = self._save(action.source, seq)
+        return record
+
+    def _save(self, path, seq):
+        """Keep the repo's copy of an adopted file, by hard link where possible."""
+        os.makedirs(self.saved_dir, exist_ok=True)
+        saved = os.path.join(self.saved_dir, str(seq))
+        try:
+            os.link(path, saved)
+        except OSError:
+            copy_file(path, saved)
+            shutil.copymode(path, saved)
+        return saved
+
+    def apply_package(self, package, actions, perform):
+        """Journal, then perform, one package's actions as a unit.
+
+        Returns (done, failure). On failure, (action, error), everything
+        this package did has been undone and done is empty.
+        """
+        records = []
+        try:
+            for action in actions:
+                records.append(self._prepare(package, action))
+        except OSError as e:
+            return [], (action, e)
+        self._append(records, sync=True)
+        performed = 0
+        try:
+            for action in actions:
+                performed += 1
+                perform(action)
+        except OSError as e:
+            # The failed action changed nothing, except an adopt that can
+            # fail halfway across devices. Undoing a mkdir that hit EEXIST
+            # would remove a directory this run didn't create.
+            failed = records[performed - 1]
+            undo_records = records[:performed - 1] + ([failed] if failed["op"] == "adopt" else [])
+            for record in reversed(undo_records):
+                _undo_record(record)
+            self._append([{"op": "abort", "package": package}], sync=True)
+            return [], (actions[performed - 1], e)
+        self._append([{"op": "commit", "package": package}], sync=False)
+        return list(actions), None
+
+    def close(self):
+        self._append([{"op": "end", "time": time.time()}], sync=True)
+        self._file.close()
+
+
+def read_records(directory, run):
+    try:
+        with open(os.path.join(directory, run + ".jsonl")) as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return []
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            break  # torn final write
+    return records
+
+
+def runs(directory=None):
+    """Journaled runs, oldest first."""
+    directory = directory or journal_dir()
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(n[:-len(".jsonl")] for n in names if n.endswith(".jsonl"))
+
+
+def _alive(run):
+    try:
+        pid = int(run.rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def unfinished(directory=None):
+    """Runs with no end record whose process is gone."""
+    directory = directory or journal_dir()
+    return [
+        run for run in runs(directory)
+        if not any(r["op"] == "end" for r in read_records(directory, run)) and not _alive(run)
+    ]
+
+
+def undo(directory, run, committed=True):
+    """Replay run's actions in reverse; committed=False leaves committed packages alone.
+
+    Packages that aborted were already undone when they failed. The run
+    is marked so it isn't recovered (or, once fully undone, rolled back)
+    again.
+    """
+    records = read_records(directory, run)
+    if committed and any(r["op"] == "rolled-back" for r in records):
+        return Undo(run, 0, 0)
+    finished = {r["package"]: r["op"] for r in records if r["op"] in ("commit", "abort")}
+    undone = skipped = 0
+    for record in reversed(records):
+        if "path" not in record:
+            continue
+        state = finished.get(record["package"])
+        if state == "abort" or (state == "commit" and not committed):
+            continue
+        if _undo_record(record):
+            undone += 1
+        else:
+            skipped += 1
+    with open(os.path.join(directory, run + ".jsonl"), "a") as f:
+        f.write(json.dumps({"op": "rolled-back" if committed else "recovered", "time": time.time()}) + "\n")
+        if not any(r["op"] == "end" for r in records):
+            f.write(json.dumps({"op": "end", "time": time.time()}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    if committed:
+        shutil.rmtree(os.path.join(directory, run + ".saved"), ignore_errors=True)
+    return Undo(run, undone, skipped)
+
+
+def rollback(run=None, directory=None):
+    """Undo a whole run (default: the newest one with actions); returns an Undo or None."""
+    directory = directory or journal_dir()
+    if run is None:
+        candidates = [
+            r for r in runs(directory)
+            if any("path" in rec for rec in read_records(directory, r))
+            and not any(rec["op"] == "rolled-back" for rec in read_records(directory, r))
+        ]
+        if not candidates:
+            return None
+        run = candidates[-1]
+    elif run not in runs(directory):
+        return None
+    return undo(directory, run)
+
+
+def prune(directory, keep=KEEP_JOURNALS):
+    """Delete all but the newest keep finished journals."""
+    finished = [r for r in runs(directory) if any(rec["op"] == "end" for rec in read_records(directory, r))]
+    for run in finished[:-keep] if keep else finished:
+        try:
+            os.unlink(os.path.join(directory, run + ".jsonl"))
+        except FileNotFoundError:
+            pass
+        shutil.rmtree(os.path.join(directory, run + ".saved"), ignore_errors=True)
+
+
+def _points_at(path, source):
+    try:
+        dest = os.readlink(path)
+    except OSError:
+        return False
+    return os.path.normpath(os.path.join(os.path.dirname(path), dest)) == os.path.normpath(source)
+
+
+def _undo_record(record):
+    """Reverse one action if the filesystem still shows it; returns True if anything changed."""
+    op, path = record["op"], record["path"]
+    if op == "link":
+        if _points_at(path, record["source"]):
+            os.unlink(path)
+            return True
+    elif op == "mkdir":
+        try:
+            os.rmdir(path)
+            return True
+        except OSError as e:
+            if e.errno not in (errno.ENOENT, errno.ENOTEMPTY, errno.EEXIST, errno.ENOTDIR):
+                raise
+    elif op == "unlink":
+        if not os.path.lexists(path):
+            os.symlink(record["dest"], path)
+            return True
+    elif op == "adopt":
+        changed = False
+        if not os.path.lexists(path) and os.path.lexists(record["source"]):
+            shutil.move(record["source"], path)
+            changed = True
+        if os.path.lexists(record["saved"]):
+            os.replace(record["saved"], record["source"])
+            changed = True
+        return changed
+    return False
+
+
+def rollback_links(run=None, directory=None):
+    """Roll back run (or the latest one) and report it; returns False if there was nothing to undo."""
+    result = rollback(run, directory)
+    if result is None:
+        print(f"[WARN] No journaled run {run} to roll back." if run else "[WARN] No journaled run to roll back.")
+        return False
+    print(f"[INFO] Rolled back {result.undone} actions from run {result.run}"
+          + (f" ({result.skipped} already reverted or changed since)." if result.skipped else "."))
+    return True
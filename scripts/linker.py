@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+import errno
+import os
+import re
+import shutil
+import stat
+from collections import namedtuple
+
+from parallel import run_packages
+
+LOCAL_IGNORE_FILE = ".stow-local-ignore"
+
+# GNU stow's built-in ignore list, used when a package has no local one.
+DEFAULT_IGNORE = [
+    "RCS",
+    ".+,v",
+    "CVS",
+    r"\.\#.+",
+    r"\.cvsignore",
+    r"\.svn",
+    "_darcs",
+    r"\.hg",
+    r"\.git",
+    r"\.gitignore",
+    r"\.gitmodules",
+    ".+~",
+    r"\#.*\#",
+    "^/README.*",
+    "^/LICENSE.*",
+    "^/COPYING",
+]
+
+# op is one of: mkdir, link, unlink, adopt, conflict.
+Action = namedtuple("Action", ["op", "package", "path", "source", "reason"], defaults=(None, None))
+
+
+class IgnoreRules:
+    """Stow-compatible ignore matching for one package.
+
+    Patterns containing a slash match against the package-relative path
+    ("/dir/file"); all others must match a whole path segment.
+    """
+
+    def __init__(self, patterns):
+        path_patterns = [p for p in patterns if "/" in p]
+        segment_patterns = [p for p in patterns if "/" not in p]
+        self.path_regexp = (
+            re.compile("(^|/)(" + "|".join(path_patterns) + ")(/|$)") if path_patterns else None
+        )
+        self.segment_regexp = (
+            re.compile("^(" + "|".join(segment_patterns) + ")$") if segment_patterns else None
+        )
+
+    @classmethod
+    def for_package(cls, package_dir):
+        local = os.path.join(package_dir, LOCAL_IGNORE_FILE)
+        try:
+            with open(local) as f:
+                return cls(_parse_ignore_lines(f))
+        except FileNotFoundError:
+            return cls(DEFAULT_IGNORE)
+
+    def matches(self, rel_path, name):
+        # The ignore file itself is never linked into the target.
+        if rel_path == "/" + LOCAL_IGNORE_FILE:
+            return True
+        if self.path_regexp and self.path_regexp.search(rel_path):
+            return True
+        if self.segment_regexp and self.segment_regexp.search(name):
+            return True
+        return False
+
+
+def _parse_ignore_lines(lines):
+    patterns = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        line = re.sub(r"\s+#.+", "", line)
+        patterns.append(line.replace(r"\#", "#"))
+    return patterns
+
+
+class Linker:
+    """Pure-Python replacement for ``stow [--adopt] -t TARGET PACKAGE``.
+
+    ``plan`` walks every package once against a virtual view of the target
+    tree (so later packages see the links earlier ones will create) and
+    returns a list of Actions. ``apply`` executes them with plain
+    os.symlink/os.rename. Like stow, a package with any conflict is not
+    touched at all.
+
+    With a journal (see journal.py), each package is applied as a unit:
+    its actions are journaled before they run, and a failure undoes the
+    ones already performed.
+    """
+
+    def __init__(self, stow_dir, adopt=False, journal=None):
+        self.stow_dir = os.path.abspath(stow_dir)
+        self.adopt = adopt
+        self.journal = journal
+        self.actions = []
+        self.conflicts = []
+        self.errors = []
+        self.satisfied = []
+        self._overlay = {}
+        self._ignore_cache = {}
+
+    def plan(self, packages):
+        """Plan (package, target_dir) pairs and return the action list."""
+        for package, target_dir in packages:
+            self.plan_package(package, target_dir)
+        return self.actions
+
+    def plan_package(self, package, target_dir):
+        package_dir = os.path.join(self.stow_dir, package)
+        if not os.path.isdir(package_dir):
+            self.conflicts.append(Action("conflict", package, package_dir, reason="package not found"))
+            return []
+        target_dir = os.path.abspath(target_dir)
+        if not self._isdir(target_dir):
+            self.conflicts.append(Action("conflict", package, target_dir, reason="target directory does not exist"))
+            return []
+
+        saved_overlay = dict(self._overlay)
+        actions = []
+        conflicts = []
+        self._stow_contents(package, package_dir, target_dir, "", actions, conflicts)
+
+        if conflicts:
+            self._overlay = saved_overlay
+            self.conflicts.extend(conflicts)
+            return []
+        self.actions.extend(actions)
+        return actions
+
+    def _ignore_rules(self, package):
+        if package not in self._ignore_cache:
+            self._ignore_cache[package] = IgnoreRules.for_package(os.path.join(self.stow_dir, package))
+        return self._ignore_cache[package]
+
+    def _stow_contents(self, package, source_dir, target_dir, rel, actions, conflicts):
+        ignore = self._ignore_rules(package)
+        for name in sorted(os.listdir(source_dir)):
+            child_rel = f"{rel}/{name}"
+            if ignore.matches(child_rel, name):
+                continue
+            self._stow_node(
+                package,
+                os.path.join(source_dir, name),
+                os.path.join(target_dir, name),
+                child_rel,
+                actions,
+                conflicts,
+            )
+
+    def _stow_node(self, package, source, target, rel, actions, conflicts):
+        state, dest = self._state(target)
+
+        if state == "absent":
+            self._emit(actions, Action("link", package, target, source))
+            return
+
+        if state == "link":
+            if dest == source:
+                self.satisfied.append(Action("link", package, target, source))
+                return
+            if not self._owned(dest):
+                conflicts.append(Action("conflict", package, target, source, "existing symlink is not owned by stow"))
+                return
+            if not self._exists(dest):
+                self._emit(actions, Action("unlink", package, target))
+                self._emit(actions, Action("link", package, target, source))
+                return
+            if self._isdir(dest) and os.path.isdir(source):
+                self._unfold(package, target, dest, actions)
+                self._stow_contents(package, source, target, rel, actions, conflicts)
+                return
+            conflicts.append(Action("conflict", package, target, source, "existing target is stowed to a different package"))
+            return
+
+        if state == "dir":
+            if os.path.isdir(source) and not os.path.islink(source):
+                self._stow_contents(package, source, target, rel, actions, conflicts)
+            else:
+                conflicts.append(Action("conflict", package, target, source, "existing target is a directory"))
+            return
+
+        if self.adopt and os.path.isfile(source):
+            self._emit(actions, Action("adopt", package, target, source))
+            self._emit(actions, Action("link", package, target, source))
+            return
+        conflicts.append(Action("conflict", package, target, source, "existing target is not owned by stow"))
+
+    def _unfold(self, package, target, dest, actions):
+        """Replace a folded directory link with a real directory of links."""
+        owner = os.path.relpath(dest, self.stow_dir).split(os.sep)[0]
+        rel_in_owner = "/" + os.path.relpath(dest, os.path.join(self.stow_dir, owner))
+        ignore = self._ignore_rules(owner)
+
+        self._emit(actions, Action("unlink", package, target))
+        self._emit(actions, Action("mkdir", package, target))
+        for name in sorted(os.listdir(dest)):
+            if ignore.matches(f"{rel_in_owner}/{name}", name):
+                continue
+            self._emit(actions, Action("link", package, os.path.join(target, name), os.path.join(dest, name)))
+
+    def _emit(self, actions, action):
+        actions.append(action)
+        if action.op == "link":
+            self._overlay[action.path] = ("link", action.source)
+        elif action.op == "mkdir":
+            self._overlay[action.path] = ("dir", None)
+        elif action.op in ("unlink", "adopt"):
+            self._overlay[action.path] = ("absent", None)
+
+    def _state(self, path):
+        """Return (state, link_dest) for path, honouring planned actions."""
+        if path in self._overlay:
+            return self._overlay[path]
+        try:
+            st_mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            return "absent", None
+        if stat.S_ISLNK(st_mode):
+            link = os.readlink(path)
+            return "link", os.path.normpath(os.path.join(os.path.dirname(path), link))
+        if stat.S_ISDIR(st_mode):
+            return "dir", None
+        return "file", None
+
+    def _owned(self, dest):
+        return dest == self.stow_dir or dest.startswith(self.stow_dir + os.sep)
+
+    def _exists(self, path):
+        state = self._overlay.get(path)
+        if state is not None:
+            return state[0] != "absent"
+        return os.path.exists(path)
+
+    def _isdir(self, path):
+        state = self._overlay.get(path)
+        if state is not None:
+            return state[0] == "dir"
+        return os.path.isdir(path)
+
+    def apply(self, actions=None):
+        """Execute planned actions; returns the actions that were performed.
+
+        A failed action stops the rest of its package and is recorded in
+        self.errors as (action, exception). With a journal, the package's
+        earlier actions are undone as well.
+        """
+        if actions is None:
+            actions = self.actions
+        if self.journal is not None:
+            return self._apply_journaled(actions)
+        done = []
+        failed_packages = set()
+        for action in actions:
+            if action.op == "conflict" or action.package in failed_packages:
+                continue
+            try:
+                apply_action(action)
+            except OSError as e:
+                self.errors.append((action, e))
+                failed_packages.add(action.package)
+                continue
+            done.append(action)
+        return done
+
+    def _apply_journaled(self, actions):
+        by_package = {}
+        for action in actions:
+            if action.op != "conflict":
+                by_package.setdefault(action.package, []).append(action)
+        done = []
+        for package, package_actions in by_package.items():
+            performed, failure = self.journal.apply_package(package, package_actions, apply_action)
+            if failure is not None:
+                self.errors.append(failure)
+            done.extend(performed)
+        return done
+
+    def apply_parallel(self, jobs=1):
+        """Apply planned actions with one worker per independent package group.
+
+        Packages whose actions touch the same paths (for example one
+        unfolding a directory another links into) run in plan order within
+        one group. Returns a PackageResult per package, whose value is the
+        list of actions performed.
+        """
+        by_package = {}
+        for action in self.actions:
+            by_package.setdefault(action.package, []).append(action)
+
+        def work(package):
+            done = self.apply(by_package[package])
+            for action, error in self.errors:
+                if action.package == package:
+                    raise error
+            return done
+
+        roots = {package: [a.path for a in actions] for package, actions in by_package.items()}
+        return run_packages(by_package, work, roots, jobs, "link")
+
+    def adopted(self, actions=None):
+        """Return package paths whose contents were adopted from the target."""
+        return [a.source for a in (self.actions if actions is None else actions) if a.op == "adopt"]
+
+
+def apply_action(action):
+    """Perform a single non-conflict Action on the filesystem."""
+    if action.op == "link":
+        os.symlink(os.path.relpath(action.source, os.path.dirname(action.path)), action.path)
+    elif action.op == "mkdir":
+        os.mkdir(action.path)
+    elif action.op == "unlink":
+        os.unlink(action.path)
+    elif action.op == "adopt":
+        try:
+            os.rename(action.path, action.source)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(action.path, action.source)
+    else:
+        raise ValueError(f"Unknown action: {action.op}")
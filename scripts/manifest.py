@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Load packages.toml, the package manifest shared by backup and restore.
+
+The TOML is parsed once and compiled to a JSON cache next to the
+environment cache. The cache holds the package table plus an index from
+(os, distro, hostname) to the selected package names. It is reused for as
+long as the manifest's mtime and size are unchanged, so later runs resolve
+a host's packages with one dict lookup.
+"""
+
+import fnmatch
+import json
+import os
+import threading
+from collections import namedtuple
+
+from detect_env import get_environment
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "packages.toml")
+CACHE_VERSION = 1
+SELECTORS = ("os", "distro", "hosts")
+
+Package = namedtuple("Package", ["name", "target", "files", "os", "distro", "hosts"])
+
+
+class ManifestError(ValueError):
+    pass
+
+
+class Manifest:
+    """Package table plus a (os, distro, hostname) -> names index."""
+
+    def __init__(self, packages, index=None, cache=None, stamp=None):
+        self.packages = packages
+        self.index = index or {}
+        self.cache = cache
+        self.stamp = stamp
+        self.platforms = {os_type for package in packages.values() for os_type in package.os}
+        self.dirty = False
+
+    def names(self):
+        return list(self.packages)
+
+    def targets(self):
+        """Map each package to its target spec, e.g. {"bash": "~"}."""
+        return {name: package.target for name, package in self.packages.items()}
+
+    def resolve(self, os_type, distro=None, hostname=None):
+        """Packages selected for a host; None skips that selector."""
+        ignore_os = os_type not in self.platforms
+        selected = []
+        for name, package in self.packages.items():
+            if package.os and not ignore_os and os_type not in package.os:
+                continue
+            if package.distro and distro is not None and distro not in package.distro:
+                continue
+            if package.hosts and hostname is not None and not any(
+                fnmatch.fnmatchcase(hostname, pattern) for pattern in package.hosts
+            ):
+                continue
+            selected.append(name)
+        return selected
+
+    def select(self, env):
+        """Packages for an Environment, memoized in the index."""
+        key = f"{env.os}\t{env.distro}\t{env.hostname}"
+        names = self.index.get(key)
+        if names is None:
+            names = self.index[key] = self.resolve(env.os, env.distro, env.hostname)
+            self.dirty = True
+        return list(names)
+
+    def to_dict(self):
+        return {
+            "packages": [package._asdict() for package in self.packages.values()],
+            "index": self.index,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        packages = {}
+        for item in data["packages"]:
+            package = Package(**{field: item[field] for field in Package._fields})
+            packages[package.name] = package._replace(
+                files=tuple(package.files), os=tuple(package.os),
+                distro=tuple(package.distro), hosts=tuple(package.hosts),
+            )
+        return cls(packages, dict(data.get("index", {})))
+
+
+def parse_manifest(data, source="packages.toml"):
+    """Validate a parsed TOML document and return a Manifest."""
+    table = data.get("packages")
+    if not isinstance(table, dict) or not table:
+        raise ManifestError(f"{source}: no [packages.*] tables")
+    packages = {}
+    for name, spec in table.items():
+        unknown = set(spec) - {"target", "files", *SELECTORS}
+        if unknown:
+            raise ManifestError(f"{source}: packages.{name}: unknown key(s) {', '.join(sorted(unknown))}")
+        lists = {}
+        for key in ("files", *SELECTORS):
+            value = spec.get(key, [])
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                raise ManifestError(f"{source}: packages.{name}.{key} must be a list of strings")
+            lists[key] = tuple(value)
+        target = spec.get("target", "~")
+        if not isinstance(target, str):
+            raise ManifestError(f"{source}: packages.{name}.target must be a string")
+        packages[name] = Package(name, target, lists["files"], lists["os"], lists["distro"], lists["hosts"])
+    return Manifest(packages)
+
+
+def manifest_cache_path():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "dotfiles", "packages.json")
+
+
+def fingerprint(path):
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_mtime_ns, st.st_size]
+
+
+def read_cache(cache, stamp):
+    try:
+        with open(cache) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != CACHE_VERSION or data.get("source") != stamp:
+        return None
+    try:
+        return Manifest.from_dict(data)
+    except (KeyError, TypeError):
+        return None
+
+
+def write_cache(manifest, cache, stamp):
+    tmp = f"{cache}.{os.getpid()}"
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump({"version": CACHE_VERSION, "source": stamp, **manifest.to_dict()}, f)
+        os.replace(tmp, cache)
+        manifest.dirty = False
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def compile_manifest(path=MANIFEST_PATH, cache=None):
+    """Return the Manifest for path, from the cache when it is still current."""
+    cache = cache or manifest_cache_path()
+    stamp = fingerprint(path)
+    manifest = read_cache(cache, stamp)
+    if manifest is None:
+        with open(path, "rb") as f:
+            try:
+                data = tomllib.load(f)
+            except tomllib.TOMLDecodeError as e:
+                raise ManifestError(f"{path}: {e}") from None
+        manifest = parse_manifest(data, path)
+        write_cache(manifest, cache, stamp)
+    manifest.cache = cache
+    manifest.stamp = stamp
+    return manifest
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Return the process-wide Manifest for path, compiling it on first use."""
+    with _manifests_lock:
+        manifest = _manifests.get(path)
+        if manifest is None:
+            manifest = _manifests[path] = compile_manifest(path)
+        return manifest
+
+
+def packages_for(env, path=MANIFEST_PATH):
+    """Package names for env, recording a new host in the cached index."""
+    manifest = load_manifest(path)
+    names = manifest.select(env)
+    if manifest.dirty:
+        write_cache(manifest, manifest.cache, manifest.stamp)
+    return names
+
+
+def main():
+    env = get_environment()
+    manifest = load_manifest()
+    for name in packages_for(env):
+        package = manifest.packages[name]
+        print(f"{name:<10} {package.target:<10} {', '.join(package.files)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import span
+
+PackageResult = namedtuple("PackageResult", ["package", "ok", "value", "error", "duration"])
+
+
+def paths_overlap(a, b):
+    """Return True if a and b are the same path or one contains the other."""
+    a = os.path.normpath(a)
+    b = os.path.normpath(b)
+    if a == b:
+        return True
+    return a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep)
+
+
+def group_packages(packages, roots):
+    """Split packages into groups whose target roots never overlap.
+
+    roots maps package -> list of paths it writes under. Packages that
+    share (or nest) a root end up in the same group, in input order, so
+    they can be run one after another while groups run concurrently.
+    """
+    parent = {p: p for p in packages}
+
+    def find(p):
+        while parent[p] != p:
+            parent[p] = parent[parent[p]]
+            p = parent[p]
+        return p
+
+    # Sorting by path components puts every path directly after its
+    # ancestors, so each root only needs checking against the chain of
+    # open ancestors rather than against every other root.
+    owned = sorted(
+        (os.path.normpath(root).split(os.sep), os.path.normpath(root), p)
+        for p in packages
+        for root in roots.get(p, [])
+    )
+    open_roots = []
+    for _, root, package in owned:
+        while open_roots and not paths_overlap(open_roots[-1][0], root):
+            open_roots.pop()
+        for _, other in open_roots:
+            parent[find(other)] = find(package)
+        open_roots.append((root, package))
+
+    groups = {}
+    for package in packages:
+        groups.setdefault(find(package), []).append(package)
+    return list(groups.values())
+
+
+def _run_group(group, work, label):
+    results = []
+    for package in group:
+        start = time.perf_counter()
+        try:
+            with span(package, label):
+                value = work(package)
+        except Exception as e:
+            results.append(PackageResult(package, False, None, e, time.perf_counter() - start))
+            continue
+        results.append(PackageResult(package, True, value, None, time.perf_counter() - start))
+    return results
+
+
+def run_packages(packages, work, roots=None, jobs=1, label="package"):
+    """Run work(package) for every package, jobs groups at a time.
+
+    Returns PackageResults in the order of packages. Exceptions are
+    captured per package rather than aborting the run. When tracing, each
+    package is a span in category label.
+    """
+    packages = list(packages)
+    groups = group_packages(packages, roots or {})
+
+    if jobs <= 1 or len(groups) <= 1:
+        results = []
+        for group in groups:
+            results.extend(_run_group(group, work, label))
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_run_group, group, work, label) for group in groups]
+            results = [r for future in futures for r in future.result()]
+
+    order = {p: i for i, p in enumerate(packages)}
+    return sorted(results, key=lambda r: order[r.package])
+
+
+def print_summary(title, results):
+    """Print one line per package plus totals; returns the failed results."""
+    failed = [r for r in results if not r.ok]
+    print(f"[INFO] {title}: {len(results) - len(failed)} ok, {len(failed)} failed")
+    for r in results:
+        status = "ok" if r.ok else f"FAILED: {r.error}"
+        print(f"[INFO]   {r.package:<10} {r.duration * 1000:8.1f} ms  {status}")
+    return failed
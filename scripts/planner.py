@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+
+from tracing import span
+
+
+def _run_phase(phase, runner, pending):
+    with span(phase, "phase", steps=len(pending)):
+        runner(pending)
+
+
+class Step:
+    """One node of the action graph."""
+
+    def __init__(self, id, phase, kind, target, package=None, detail="", satisfied=False, depends_on=()):
+        self.id = id
+        self.phase = phase
+        self.kind = kind
+        self.target = target
+        self.package = package
+        self.detail = detail
+        self.satisfied = satisfied
+        self.depends_on = list(depends_on)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "phase": self.phase,
+            "kind": self.kind,
+            "target": self.target,
+            "package": self.package,
+            "detail": self.detail,
+            "satisfied": self.satisfied,
+            "depends_on": self.depends_on,
+        }
+
+
+class Plan:
+    """Action graph built once, then printed (--plan) or executed (--apply).
+
+    Steps are grouped into phases that run in the order they were first
+    added. Each phase has a runner that receives only its pending steps,
+    so anything the plan already proved satisfied costs nothing on apply.
+    Steps whose kind is "conflict" are reported but never executed.
+    """
+
+    def __init__(self):
+        self.steps = []
+        self._phases = []
+        self._runners = {}
+
+    def add(self, phase, kind, target, package=None, detail="", satisfied=False, depends_on=()):
+        step = Step(len(self.steps) + 1, phase, kind, target, package, detail, satisfied, depends_on)
+        self.steps.append(step)
+        if phase not in self._phases:
+            self._phases.append(phase)
+        return step
+
+    def on_apply(self, phase, runner):
+        """Register runner(pending_steps) to execute a phase."""
+        if phase not in self._phases:
+            self._phases.append(phase)
+        self._runners[phase] = runner
+
+    def phase_steps(self, phase):
+        return [s for s in self.steps if s.phase == phase]
+
+    def pending(self, phase=None):
+        return [
+            s for s in self.steps
+            if not s.satisfied and s.kind != "conflict" and (phase is None or s.phase == phase)
+        ]
+
+    def conflicts(self):
+        return [s for s in self.steps if s.kind == "conflict"]
+
+    def format(self):
+        lines = []
+        for phase in self._phases:
+            steps = self.phase_steps(phase)
+            if not steps:
+                continue
+            done = sum(1 for s in steps if s.satisfied)
+            lines.append(f"{phase} ({len(steps) - done} pending, {done} satisfied)")
+            for s in steps:
+                mark = "=" if s.satisfied else ("!" if s.kind == "conflict" else "+")
+                package = f"[{s.package}] " if s.package else ""
+                detail = f"  ({s.detail})" if s.detail else ""
+                after = f"  after #{', #'.join(str(d) for d in s.depends_on)}" if s.depends_on else ""
+                lines.append(f"  {mark} #{s.id} {s.kind:<8} {package}{s.target}{detail}{after}")
+        pending = len(self.pending())
+        lines.append(f"{pending} pending steps, {len(self.conflicts())} conflicts")
+        return "\n".join(lines)
+
+    def to_json(self):
+        return json.dumps({"steps": [s.to_dict() for s in self.steps]}, indent=2)
+
+    def phase_dependencies(self, phase):
+        """Earlier phases that some step of phase depends on."""
+        owner = {s.id: s.phase for s in self.steps}
+        earlier = self._phases[:self._phases.index(phase)]
+        deps = {owner.get(d) for s in self.phase_steps(phase) for d in s.depends_on}
+        return [p for p in earlier if p in deps]
+
+    def apply(self, concurrent=False):
+        """Run each phase's runner with its pending steps.
+
+        With concurrent, a phase starts as soon as the phases its steps
+        depend on have finished, so independent phases (a Brewfile dump
+        and the file backup, say) run side by side in worker threads. If
+        a phase fails, the phases that depend on it are skipped and the
+        first error is raised once the rest finish.
+
+        Returns the list of phases that actually ran, in phase order.
+        """
+        if concurrent:
+            return asyncio.run(self._apply_concurrently())
+        ran = []
+        for phase in self._phases:
+            runner = self._runners.get(phase)
+            if runner is None:
+                continue
+            pending = self.pending(phase)
+            if not pending:
+                continue
+            _run_phase(phase, runner, pending)
+            ran.append(phase)
+        return ran
+
+    async def _apply_concurrently(self):
+        tasks = {}
+        ran = set()
+
+        async def run_phase(phase, runner, pending, deps):
+            for dep in deps:
+                await tasks[dep]
+            if runner is not None and pending:
+                # run_in_executor rather than asyncio.to_thread, which needs Python 3.9.
+                await asyncio.get_running_loop().run_in_executor(None, _run_phase, phase, runner, pending)
+                ran.add(phase)
+
+        for phase in self._phases:
+            tasks[phase] = asyncio.ensure_future(run_phase(
+                phase, self._runners.get(phase), self.pending(phase), self.phase_dependencies(phase)
+            ))
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return [phase for phase in self._phases if phase in ran]
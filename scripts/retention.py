@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Retention policy for the snapshot store.
+
+A policy keeps the newest keep_last snapshots plus the newest snapshot of
+each of the last N hours, days and ISO weeks, then drops the oldest
+survivors until the store fits under max_size. Every manifest is read
+once to build a reference count per object. An object is freed only when
+no kept snapshot references it, so shared content is never deleted while
+something still points at it.
+"""
+
+import os
+import re
+from collections import Counter, namedtuple
+from datetime import datetime
+
+BUCKETS = (
+    ("hourly", "%Y-%m-%d %H"),
+    ("daily", "%Y-%m-%d"),
+    ("weekly", "%G-W%V"),
+)
+SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", re.IGNORECASE)
+NAME_TIME_RE = re.compile(r"(\d{8}_\d{6})")
+
+Policy = namedtuple("Policy", ["keep_last", "hourly", "daily", "weekly", "max_size"], defaults=(0, 0, 0, 0, None))
+RetentionPlan = namedtuple(
+    "RetentionPlan",
+    ["keep", "remove", "reasons", "doomed", "freed", "size_before", "size_after"],
+)
+
+
+def parse_size(text):
+    """Parse "500M", "2G", "1.5GiB" or a plain byte count."""
+    match = SIZE_RE.match(text)
+    if not match:
+        raise ValueError(f"invalid size: {text!r}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMGT".index(unit.upper() or " "))
+
+
+def snapshot_time(name, manifest):
+    created = manifest.get("created")
+    if created:
+        try:
+            return datetime.fromisoformat(created)
+        except ValueError:
+            pass
+    match = NAME_TIME_RE.search(name)
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+    return datetime.min
+
+
+def select(snapshots, policy):
+    """Return {name: [reasons]} for the snapshots policy keeps.
+
+    snapshots is [(name, datetime)], newest first. A policy with no rules
+    keeps everything.
+    """
+    if not (policy.keep_last or policy.hourly or policy.daily or policy.weekly):
+        return {name: ["all"] for name, _ in snapshots}
+    reasons = {}
+    for name, _ in snapshots[:policy.keep_last]:
+        reasons.setdefault(name, []).append("last")
+    for rule, fmt in BUCKETS:
+        limit = getattr(policy, rule)
+        seen = []
+        for name, when in snapshots:
+            if len(seen) >= limit:
+                break
+            bucket = when.strftime(fmt)
+            if bucket not in seen:
+                seen.append(bucket)
+                reasons.setdefault(name, []).append(rule)
+    return reasons
+
+
+def plan_retention(store, policy):
+    """Work out what policy removes from store, without touching anything."""
+    manifests = {name: store.load_snapshot(name) for name in store.snapshot_names()}
+    snapshots = sorted(
+        ((name, snapshot_time(name, m)) for name, m in manifests.items()),
+        key=lambda item: (item[1], item[0]),
+        reverse=True,
+    )
+    reasons = select(snapshots, policy)
+
+    sizes = {}
+    digests = {}
+    own_bytes = {}
+    for name, manifest in manifests.items():
+        digests[name] = set()
+        own_bytes[name] = _file_size(os.path.join(store.snapshots_dir, f"{name}.json"))
+        archive = manifest.get("archive")
+        if archive:
+            own_bytes[name] += _file_size(os.path.join(store.archives_dir, archive["file"]))
+        for entry in manifest.get("entries", []):
+            digest = entry.get("digest")
+            if digest:
+                digests[name].add(digest)
+                sizes[digest] = entry.get("size", 0)
+
+    kept = [name for name, _ in snapshots if name in reasons]
+    refs = Counter(d for name in kept for d in digests[name])
+    size_before = sum(own_bytes.values()) + sum(sizes.values())
+    size_after = sum(own_bytes[name] for name in kept) + sum(sizes[d] for d in refs)
+
+    if policy.max_size is not None:
+        # Oldest first; the newest snapshot is never dropped for size.
+        for name in reversed(kept[1:]):
+            if size_after <= policy.max_size:
+                break
+            kept.remove(name)
+            del reasons[name]
+            size_after -= own_bytes[name]
+            for digest in digests[name]:
+                refs[digest] -= 1
+                if not refs[digest]:
+                    del refs[digest]
+                    size_after -= sizes[digest]
+
+    remove = [name for name, _ in snapshots if name not in reasons]
+    doomed = {d for name in remove for d in digests[name]} - set(refs)
+    return RetentionPlan(kept, remove, reasons, doomed, size_before - size_after, size_before, size_after)
+
+
+def apply_retention(store, plan):
+    """Delete the plan's snapshots and the objects only they referenced."""
+    for name in plan.remove:
+        store.delete_snapshot(name)
+    prefixes = set()
+    for digest in plan.doomed:
+        try:
+            os.unlink(store.object_path(digest))
+        except FileNotFoundError:
+            continue
+        prefixes.add(os.path.dirname(store.object_path(digest)))
+    for prefix in prefixes:
+        try:
+            os.rmdir(prefix)
+        except OSError:
+            pass
+    if plan.doomed and store.index is not None:
+        store.index.forget_digests(plan.doomed)
+        store.index.save()
+
+
+def format_report(plan, dry_run=False):
+    lines = []
+    for name in plan.keep:
+        lines.append(f"keep    {name}  ({', '.join(plan.reasons[name])})")
+    for name in plan.remove:
+        lines.append(f"remove  {name}")
+    verb = "Would free" if dry_run else "Freed"
+    lines.append(
+        f"{verb} {plan.freed} bytes: {len(plan.remove)} snapshots, {len(plan.doomed)} objects "
+        f"({plan.size_before} -> {plan.size_after} bytes)"
+    )
+    return "\n".join(lines)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""asyncio subprocess runner shared by the backup and restore scripts.
+
+Commands are argv lists, never shell strings. Each run returns a
+CommandResult with the exit code, captured output and duration, instead
+of None on failure. A command that outlives its timeout is killed and
+reported with timed_out set; with detach=True it runs in its own session
+and the whole process group is killed, so children left holding the
+output pipes (ssh under git fetch) can't keep it waiting. stdout and stderr are read concurrently, so
+output can be streamed line by line as it arrives.
+
+    result = run(["brew", "bundle", "dump", "--force"], timeout=300)
+    results = run_all([["brew", "update"], ["git", "-C", repo, "fetch"]])
+"""
+
+import asyncio
+import os
+import signal
+import sys
+import time
+from collections import namedtuple
+
+from tracing import span
+
+LINE_LIMIT = 1024 * 1024
+
+CommandResult = namedtuple(
+    "CommandResult", ["argv", "ok", "returncode", "stdout", "stderr", "duration", "timed_out"]
+)
+
+
+class CommandError(Exception):
+    def __init__(self, result):
+        self.result = result
+        if result.timed_out:
+            reason = f"timed out after {result.duration:.0f}s"
+        elif result.returncode is None:
+            reason = result.stderr
+        else:
+            reason = f"exited {result.returncode}"
+        detail = result.stderr.strip().splitlines()[-1:] if result.stderr else []
+        super().__init__(f"{' '.join(result.argv)}: {reason}" + (f": {detail[0]}" if detail else ""))
+
+
+def echo(prefix=""):
+    """A stream callback that prints each line, stderr to stderr."""
+    def write(line, is_stderr):
+        print(f"{prefix}{line}", file=sys.stderr if is_stderr else sys.stdout, flush=True)
+    return write
+
+
+async def _pump(reader, sink, callback, is_stderr):
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        text = line.decode(errors="replace")
+        sink.append(text)
+        if callback:
+            callback(text.rstrip("\n"), is_stderr)
+
+
+def command_name(argv):
+    """"brew bundle dump --force" -> "brew bundle": the span name for a command.
+
+    Leading long options are skipped, so "git --no-optional-locks status"
+    is "git status"; a short option may take a value, so it ends the name.
+    """
+    words = [os.path.basename(argv[0])]
+    for arg in argv[1:]:
+        if arg.startswith("--"):
+            continue
+        if not arg.startswith("-"):
+            words.append(arg)
+        break
+    return " ".join(words)
+
+
+async def run_async(argv, timeout=None, cwd=None, env=None, stream=None, input=None, interactive=False,
+                    detach=False):
+    """Run argv and return a CommandResult.
+
+    stream is an optional callback(line, is_stderr), called as output
+    arrives; everything is captured either way. stdin is /dev/null unless
+    input is given or interactive inherits the terminal. A missing
+    executable is a failed result (returncode None), not an exception.
+    detach starts a new session with no controlling terminal.
+    """
+    argv = [os.fspath(arg) for arg in argv]
+    with span(command_name(argv), "command"):
+        return await _run(argv, timeout, cwd, env, stream, input, interactive, detach)
+
+
+def _kill(proc, detach):
+    if not detach:
+        proc.kill()
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def _run(argv, timeout, cwd, env, stream, input, interactive, detach):
+    start = time.perf_counter()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *argv, cwd=cwd, env=env,
+            stdin=asyncio.subprocess.PIPE if input is not None else (None if interactive else asyncio.subprocess.DEVNULL),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            limit=LINE_LIMIT, start_new_session=detach,
+        )
+    except OSError as e:
+        return CommandResult(argv, False, None, "", str(e), time.perf_counter() - start, False)
+
+    stdout, stderr = [], []
+
+    async def communicate():
+        if input is not None:
+            proc.stdin.write(input.encode())
+            await proc.stdin.drain()
+            proc.stdin.close()
+        await asyncio.gather(
+            _pump(proc.stdout, stdout, stream, False),
+            _pump(proc.stderr, stderr, stream, True),
+        )
+        return await proc.wait()
+
+    timed_out = False
+    try:
+        returncode = await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        _kill(proc, detach)
+        returncode = await proc.wait()
+    duration = time.perf_counter() - start
+    return CommandResult(
+        argv, returncode == 0 and not timed_out, returncode, "".join(stdout), "".join(stderr), duration, timed_out
+    )
+
+
+def run(argv, timeout=None, cwd=None, env=None, stream=None, input=None, interactive=False, check=False,
+        detach=False):
+    """Synchronous wrapper around run_async; raises CommandError if check fails."""
+    result = asyncio.run(run_async(argv, timeout, cwd, env, stream, input, interactive, detach))
+    if check and not result.ok:
+        raise CommandError(result)
+    return result
+
+
+async def run_all_async(commands, timeout=None, limit=None, stream=None):
+    semaphore = asyncio.Semaphore(limit or len(commands) or 1)
+
+    async def one(argv):
+        async with semaphore:
+            return await run_async(argv, timeout, stream=stream)
+
+    return await asyncio.gather(*(one(argv) for argv in commands))
+
+
+def run_all(commands, timeout=None, limit=None, stream=None):
+    """Run independent commands concurrently (at most limit at once).
+
+    Returns CommandResults in input order.
+    """
+    return asyncio.run(run_all_async(commands, timeout, limit, stream))
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+from datetime import datetime
+
+from backup_archive import CODECS, ArchiveWriter, default_codec, extract_member
+from fastcopy import copy_file
+from stat_index import StatIndex
+
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """Return the sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SnapshotStore:
+    """Content-addressed object store with one JSON manifest per snapshot.
+
+    Layout under ``root``::
+
+        objects/ab/cdef...     file contents, named by sha256
+        snapshots/<name>.json  manifest listing every backed-up entry
+        archives/<name>.tar.*  a snapshot written with archive() instead
+
+    Unchanged files cost only a manifest entry; object bytes are written
+    once per distinct content. ``index.json`` caches stat tuples so a
+    repeat run only hashes files that are new or modified.
+    """
+
+    def __init__(self, root, use_index=True):
+        self.root = root
+        self.index = StatIndex(os.path.join(root, "index.json")) if use_index else None
+        self.objects_dir = os.path.join(root, "objects")
+        self.snapshots_dir = os.path.join(root, "snapshots")
+        self.archives_dir = os.path.join(root, "archives")
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def has_object(self, digest):
+        return os.path.exists(self.object_path(digest))
+
+    def put_file(self, path):
+        """Store a file's contents, returning (digest, bytes_written).
+
+        The file is copied first and the copy is hashed, so the digest
+        always matches the stored bytes even if the file is being written
+        meanwhile (as under --watch), and the source is read only once.
+        """
+        os.makedirs(self.objects_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, prefix=".tmp-")
+        os.close(fd)
+        try:
+            copy_file(path, tmp_path)
+            digest = hash_file(tmp_path)
+            object_path = self.object_path(digest)
+            if os.path.exists(object_path):
+                os.unlink(tmp_path)
+                return digest, 0
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, object_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest, os.path.getsize(object_path)
+
+    def _file_entry(self, package, target_dir, rel_path, abs_path, st):
+        digest = self.index.lookup(abs_path, st) if self.index is not None else None
+        written = 0
+        if digest is None:
+            digest, written = self.put_file(abs_path)
+            if self.index is not None:
+                self.index.update(abs_path, st, digest)
+        entry = {
+            "package": package,
+            "target_dir": target_dir,
+            "path": rel_path,
+            "type": "file",
+            "digest": digest,
+            "size": st.st_size,
+            "mode": st.st_mode & 0o7777,
+            "mtime": st.st_mtime,
+        }
+        return entry, written
+
+    def collect(self, package, target_dir, rel_path, st=None):
+        """Store everything under target_dir/rel_path.
+
+        Returns (entries, bytes_written). Symlinks are recorded as links
+        rather than followed. Files whose stat matches the index are not
+        read at all.
+        """
+        entries = []
+        written = 0
+        for rel, abs_path, node_st in self._walk(target_dir, rel_path, st):
+            try:
+                if stat.S_ISLNK(node_st.st_mode):
+                    entries.append(self._link_entry(package, target_dir, rel, abs_path))
+                    continue
+                entry, n = self._file_entry(package, target_dir, rel, abs_path, node_st)
+            except OSError as e:
+                print(f"[WARN] Failed to backup {abs_path}: {e}")
+                continue
+            entries.append(entry)
+            written += n
+        return entries, written
+
+    def is_unchanged(self, target_dir, rel_path, previous, st=None):
+        """Return True if target_dir/rel_path matches previous without hashing.
+
+        previous maps relative path -> manifest entry (from the latest
+        snapshot). Every file must hit the stat index with the same digest
+        and the set of paths must be identical.
+        """
+        if self.index is None:
+            return False
+        remaining = set(previous)
+        for rel, abs_path, node_st in self._walk(target_dir, rel_path, st):
+            entry = previous.get(rel)
+            if entry is None:
+                return False
+            remaining.discard(rel)
+            if stat.S_ISLNK(node_st.st_mode):
+                if entry.get("type") != "symlink" or entry.get("link") != os.readlink(abs_path):
+                    return False
+            elif entry.get("digest") is None or self.index.lookup(abs_path, node_st) != entry["digest"]:
+                # Archive entries have no digest to compare against.
+                return False
+        return not remaining
+
+    def archive(self, name, sources, codec=None):
+        """Stream sources into one compressed archive for snapshot name.
+
+        sources yields (package, target_dir, rel_path, lstat) roots. Returns
+        (entries, archive) where archive is the manifest's "archive" record:
+        file name, codec and per-package frame offsets. Entries locate their
+        member by frame and offset instead of by digest.
+        """
+        codec = codec or default_codec()
+        path = os.path.join(self.archives_dir, name + CODECS[codec])
+        with ArchiveWriter(path, codec) as writer:
+            entries = []
+            for package, target_dir, rel_path, st in sources:
+                entries.extend(writer.add(package, target_dir, self._walk(target_dir, rel_path, st)))
+        return entries, {
+            "file": os.path.basename(path),
+            "codec": codec,
+            "frames": writer.frames,
+        }
+
+    def _walk(self, target_dir, rel_path, st=None):
+        """Yield (rel, abs_path, lstat) for files and symlinks under a root."""
+        root_path = os.path.join(target_dir, rel_path)
+        if st is None:
+            st = os.lstat(root_path)
+        if stat.S_ISLNK(st.st_mode) or stat.S_ISREG(st.st_mode):
+            yield rel_path, root_path, st
+            return
+        if not stat.S_ISDIR(st.st_mode):
+            return
+
+        prefix_len = len(os.path.join(target_dir, ""))
+        stack = [root_path]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    children = sorted(it, key=lambda e: e.name, reverse=True)
+            except OSError as e:
+                print(f"[WARN] Failed to read {current}: {e}")
+                continue
+            files = []
+            for child in children:
+                if child.is_dir(follow_symlinks=False):
+                    stack.append(child.path)
+                else:
+                    files.append(child)
+            for child in reversed(files):
+                try:
+                    child_st = child.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if stat.S_ISLNK(child_st.st_mode) or stat.S_ISREG(child_st.st_mode):
+                    yield child.path[prefix_len:], child.path, child_st
+
+    def _link_entry(self, package, target_dir, rel_path, abs_path):
+        return {
+            "package": package,
+            "target_dir": target_dir,
+            "path": rel_path,
+            "type": "symlink",
+            "link": os.readlink(abs_path),
+        }
+
+    def write_snapshot(self, name, entries, metadata=None):
+        """Write a snapshot manifest atomically and return its path."""
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "name": name,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "entries": entries,
+        }
+        if metadata:
+            manifest.update(metadata)
+
+        path = os.path.join(self.snapshots_dir, f"{name}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+        return path
+
+    def load_snapshot(self, name):
+        with open(os.path.join(self.snapshots_dir, f"{name}.json")) as f:
+            return json.load(f)
+
+    def snapshot_names(self):
+        """Return snapshot names, oldest first."""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        names = [f[:-5] for f in os.listdir(self.snapshots_dir) if f.endswith(".json")]
+        return sorted(names)
+
+    def list_snapshots(self):
+        """Return a summary dict for every snapshot, oldest first."""
+        summaries = []
+        for name in self.snapshot_names():
+            manifest = self.load_snapshot(name)
+            entries = manifest.get("entries", [])
+            summaries.append({
+                "name": name,
+                "created": manifest.get("created", ""),
+                "distro": manifest.get("distro", ""),
+                "files": len(entries),
+                "size": sum(e.get("size", 0) for e in entries),
+                "packages": sorted({e["package"] for e in entries}),
+                "archive": manifest.get("archive", {}).get("file"),
+            })
+        return summaries
+
+    def latest_snapshot(self):
+        names = self.snapshot_names()
+        return names[-1] if names else None
+
+    def carried_entries(self, packages):
+        """Latest snapshot's entries outside packages, or None if they can't be reused.
+
+        Entries of an archive snapshot point into its archive rather than
+        the object store, so a plain snapshot can't carry them forward.
+        """
+        latest = self.latest_snapshot()
+        if latest is None:
+            return []
+        manifest = self.load_snapshot(latest)
+        if manifest.get("archive"):
+            return None
+        return [e for e in manifest["entries"] if e["package"] not in packages]
+
+    def same_as_latest(self, entries):
+        """Return the latest snapshot name if its entries equal entries."""
+        latest = self.latest_snapshot()
+        if latest is None:
+            return None
+        if self.load_snapshot(latest).get("entries") == entries:
+            return latest
+        return None
+
+    def save_index(self, roots=None, seen=None):
+        if self.index is None:
+            return
+        if roots is not None:
+            self.index.prune(roots, seen or set())
+        self.index.save()
+
+    def delete_snapshot(self, name):
+        archive = self.load_snapshot(name).get("archive")
+        os.unlink(os.path.join(self.snapshots_dir, f"{name}.json"))
+        if archive:
+            try:
+                os.unlink(os.path.join(self.archives_dir, archive["file"]))
+            except FileNotFoundError:
+                pass
+
+    def referenced_digests(self):
+        digests = set()
+        for name in self.snapshot_names():
+            for entry in self.load_snapshot(name).get("entries", []):
+                if entry.get("digest"):
+                    digests.add(entry["digest"])
+        return digests
+
+    def gc(self):
+        """Delete objects no snapshot references. Returns (count, bytes)."""
+        if not os.path.isdir(self.objects_dir):
+            return 0, 0
+        live = self.referenced_digests()
+        removed = 0
+        freed = 0
+        dead = set()
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue  # a put_file copy in progress
+            for name in os.listdir(prefix_dir):
+                if prefix + name in live:
+                    continue
+                path = os.path.join(prefix_dir, name)
+                freed += os.path.getsize(path)
+                os.unlink(path)
+                dead.add(prefix + name)
+                removed += 1
+            if not os.listdir(prefix_dir):
+                os.rmdir(prefix_dir)
+        if dead and self.index is not None:
+            self.index.forget_digests(dead)
+            self.index.save()
+        return removed, freed
+
+    def restore(self, name, dest=None, packages=None):
+        """Restore a snapshot's entries and return how many were written.
+
+        With dest, entries land under dest/<package>/<path> (the same layout
+        as the old backup_<timestamp> trees); otherwise they go back to
+        their original location.
+        """
+        manifest = self.load_snapshot(name)
+        archive = manifest.get("archive")
+        restored = 0
+        for entry in manifest.get("entries", []):
+            if packages and entry["package"] not in packages:
+                continue
+            if dest:
+                out_path = os.path.join(dest, entry["package"], entry["path"])
+            else:
+                if _has_linked_parent(entry["target_dir"], entry["path"]):
+                    print(f"[WARN] Skipping {entry['path']}: a parent directory is a symlink")
+                    continue
+                out_path = os.path.join(entry["target_dir"], entry["path"])
+            self._restore_entry(entry, out_path, archive)
+            restored += 1
+        return restored
+
+    def _restore_entry(self, entry, out_path, archive=None):
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        tmp_path = f"{out_path}.restore-tmp"
+        if entry["type"] == "symlink":
+            if os.path.lexists(tmp_path):
+                os.unlink(tmp_path)
+            os.symlink(entry["link"], tmp_path)
+        else:
+            if archive:
+                with open(tmp_path, "wb") as out:
+                    extract_member(os.path.join(self.archives_dir, archive["file"]), archive["codec"],
+                                   archive["frames"][entry["frame"]], entry["offset"], out)
+            elif entry.get("digest"):
+                copy_file(self.object_path(entry["digest"]), tmp_path)
+            else:
+                raise ValueError(f"{entry['path']} in {entry['package']} has no stored contents "
+                                 "(an archive entry in a snapshot without an archive)")
+            os.chmod(tmp_path, entry.get("mode", 0o644))
+            mtime = entry.get("mtime")
+            if mtime is not None:
+                os.utime(tmp_path, (mtime, mtime))
+        if os.path.isdir(out_path) and not os.path.islink(out_path):
+            shutil.rmtree(out_path)
+        os.replace(tmp_path, out_path)
+
+
+def _has_linked_parent(target_dir, rel_path):
+    """Return True if any directory between target_dir and rel_path is a symlink."""
+    parts = os.path.normpath(rel_path).split(os.sep)[:-1]
+    current = target_dir
+    for part in parts:
+        current = os.path.join(current, part)
+        if os.path.islink(current):
+            return True
+    return False
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+
+INDEX_VERSION = 1
+
+
+class StatIndex:
+    """Persistent map of path -> (mtime_ns, size, inode, digest).
+
+    A file whose stat tuple matches its index entry is assumed unchanged,
+    so its digest is reused without reading the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION:
+            self._entries = data.get("entries", {})
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, path, st):
+        """Return the cached digest for path if st matches, else None."""
+        cached = self._entries.get(path)
+        if cached is None:
+            return None
+        mtime_ns, size, ino, digest = cached
+        if mtime_ns == st.st_mtime_ns and size == st.st_size and ino == st.st_ino:
+            return digest
+        return None
+
+    def update(self, path, st, digest):
+        with self._lock:
+            self._entries[path] = [st.st_mtime_ns, st.st_size, st.st_ino, digest]
+            self._dirty = True
+
+    def forget_digests(self, digests):
+        """Drop entries pointing at objects that no longer exist."""
+        with self._lock:
+            stale = [p for p, v in self._entries.items() if v[3] in digests]
+            for path in stale:
+                del self._entries[path]
+            if stale:
+                self._dirty = True
+
+    def prune(self, roots, seen):
+        """Drop entries under roots that were not seen during the last walk."""
+        prefixes = tuple(os.path.join(root, "") for root in roots)
+        with self._lock:
+            stale = [
+                p for p in self._entries
+                if p not in seen and (p in roots or p.startswith(prefixes))
+            ]
+            for path in stale:
+                del self._entries[path]
+            if stale:
+                self._dirty = True
+
+    def save(self):
+        """Write the index atomically if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"version": INDEX_VERSION, "entries": self._entries}, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Render a bplate project template in one pass.
+
+Each template file is compiled once into a token list, i.e. its bytes
+split on placeholders:
+
+    b"# {PROJECT_NAME} by {AUTHOR}\n" -> [b"# ", "PROJECT_NAME", b" by ", "AUTHOR", b"\n"]
+
+Odd positions are placeholder names and even positions are literal
+bytes, so rendering is one join over the list. A value that happens to
+contain "{YEAR}" is never substituted again. Relative paths are compiled
+the same way (src/{PROJECT_NAME_KEBAB}/ and so on). Files that aren't
+UTF-8 text are a single literal and are copied as-is. Directories are
+created first, then files are written from a thread pool.
+
+Compiled templates are packed into ~/.cache/dotfiles/templates/<type>.pack:
+
+    "BPLTPACK" | version u32 | index length u32 | index (JSON) | file bytes
+
+The index lists every file's path tokens, mode, offset and size, plus
+the byte ranges of its placeholders. It also holds an (mtime_ns, size)
+stamp for every directory and file of the template. The pack is used
+while all the stamps match. Otherwise it is rebuilt from the tree.
+Loading a pack is one sequential read. The tokens are slices of that
+buffer, and the file bytes are never tokenized again.
+
+    template_render.py --name my-app --author "A. Dev" --license MIT \\
+        --license-file ~/.config/fish/licenses/MIT templates/python ./my-app
+"""
+
+import argparse
+import json
+import os
+import re
+import struct
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+PLACEHOLDERS = (
+    "PROJECT_NAME_KEBAB", "PROJECT_NAME", "AUTHOR", "LICENSE_TYPE", "YEAR", "MONTH", "DAY", "TODAY",
+)
+PLACEHOLDER_RE = re.compile(r"\{(" + "|".join(PLACEHOLDERS) + r")\}")
+PLACEHOLDER_BYTES_RE = re.compile(PLACEHOLDER_RE.pattern.encode())
+SKIP_DIRS = {".git", "__pycache__"}
+SKIP_SUFFIXES = (".pyc", ".pyo")
+DEFAULT_JOBS = 8
+
+PACK_MAGIC = b"BPLTPACK"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<8sII")
+
+Template = namedtuple("Template", ["root", "files", "stamp"])
+TemplateFile = namedtuple("TemplateFile", ["path", "mode", "tokens"])
+
+_compiled = {}
+
+
+def tokenize(text):
+    """Split str or bytes into alternating literals and placeholder names (str)."""
+    if isinstance(text, str):
+        return PLACEHOLDER_RE.split(text)
+    tokens = PLACEHOLDER_BYTES_RE.split(text)
+    tokens[1::2] = [name.decode() for name in tokens[1::2]]
+    return tokens
+
+
+def render_tokens(tokens, values):
+    """Join tokens with values; str tokens give str, byte literals give bytes."""
+    parts = list(tokens)
+    if isinstance(tokens[0], str):
+        parts[1::2] = [values[name] for name in tokens[1::2]]
+        return "".join(parts)
+    parts[1::2] = [values[name].encode("utf-8") for name in tokens[1::2]]
+    return b"".join(parts)
+
+
+def kebab_case(name):
+    """Same rules as bplate: lowercase, _/space -> -, drop the rest."""
+    name = re.sub(r"[_\s]", "-", name).lower()
+    return re.sub(r"[^a-z0-9-]", "", name).strip("-")
+
+
+def placeholder_values(project_name, author, license_type, today=None):
+    today = today or date.today()
+    return {
+        "PROJECT_NAME": project_name,
+        "PROJECT_NAME_KEBAB": kebab_case(project_name),
+        "AUTHOR": author,
+        "LICENSE_TYPE": license_type,
+        "YEAR": f"{today.year:04d}",
+        "MONTH": f"{today.month:02d}",
+        "DAY": f"{today.day:02d}",
+        "TODAY": today.isoformat(),
+    }
+
+
+def _stamp(st):
+    return [st.st_mtime_ns, st.st_size]
+
+
+def compile_file(path, rel_path, st=None):
+    """A TemplateFile; files that aren't UTF-8 text are one literal."""
+    st = st or os.stat(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        data.decode("utf-8")
+        tokens = tokenize(data)
+    except UnicodeDecodeError:
+        tokens = [data]
+    return TemplateFile(tokenize(rel_path), st.st_mode & 0o777, tokens)
+
+
+def compile_template(root):
+    """Walk root once and compile every file, skipping VCS and bytecode."""
+    files = []
+    stamp = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        stamp[os.path.relpath(dirpath, root)] = _stamp(os.stat(dirpath))
+        for name in sorted(filenames):
+            if name.endswith(SKIP_SUFFIXES):
+                continue
+            path = os.path.join(dirpath, name)
+            rel_path = os.path.relpath(path, root)
+            st = os.stat(path)
+            stamp[rel_path] = _stamp(st)
+            files.append(compile_file(path, rel_path, st))
+    return Template(root, files, stamp)
+
+
+def is_fresh(template):
+    """True while every directory and file the template was built from is unchanged."""
+    for rel_path, recorded in template.stamp.items():
+        try:
+            if _stamp(os.stat(os.path.join(template.root, rel_path))) != recorded:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def pack_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "dotfiles", "templates")
+
+
+def pack_path(root, cache_dir=None):
+    return os.path.join(cache_dir or pack_dir(), os.path.basename(os.path.normpath(root)) + ".pack")
+
+
+def write_pack(template, path):
+    """Write template as a pack: fixed header, JSON index, then the raw file bytes."""
+    index = {"root": template.root, "stamp": template.stamp, "files": []}
+    chunks = []
+    offset = 0
+    for f in template.files:
+        holes = []
+        position = 0
+        for i, token in enumerate(f.tokens):
+            if i % 2:
+                end = position + len(token) + 2
+                holes.append([position, end, token])
+                chunks.append(b"{" + token.encode() + b"}")
+                position = end
+            else:
+                chunks.append(token)
+                position += len(token)
+        index["files"].append({"path": f.path, "mode": f.mode, "offset": offset, "size": position, "holes": holes})
+        offset += position
+    header = json.dumps(index, separators=(",", ":")).encode()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}"
+    try:
+        with open(tmp, "wb") as out:
+            out.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(header)))
+            out.write(header)
+            out.writelines(chunks)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def read_pack(path):
+    """Load a pack with one read; returns a Template, or None if it's missing or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, length = PACK_HEADER.unpack_from(data)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            return None
+        start = PACK_HEADER.size + length
+        index = json.loads(data[PACK_HEADER.size:start])
+    except (OSError, struct.error, ValueError):
+        return None
+    body = memoryview(data)[start:]
+    files = []
+    for entry in index["files"]:
+        base = entry["offset"]
+        tokens = []
+        position = 0
+        for hole_start, hole_end, name in entry["holes"]:
+            tokens += [body[base + position:base + hole_start], name]
+            position = hole_end
+        tokens.append(body[base + position:base + entry["size"]])
+        files.append(TemplateFile(entry["path"], entry["mode"], tokens))
+    return Template(index["root"], files, index["stamp"])
+
+
+def load_template(root, cache_dir=None):
+    """The compiled template for root, from memory, its pack, or the tree, in that order."""
+    root = os.path.abspath(root)
+    template = _compiled.get(root)
+    if template is None or not is_fresh(template):
+        path = pack_path(root, cache_dir)
+        template = read_pack(path)
+        if template is None or template.root != root or not is_fresh(template):
+            template = compile_template(root)
+            try:
+                write_pack(template, path)
+            except OSError:
+                pass
+        _compiled[root] = template
+    return template
+
+
+def rendered_paths(template, values):
+    return [render_tokens(f.path, values) for f in template.files]
+
+
+def _write(path, mode, tokens, values):
+    with open(path, "wb") as f:
+        f.write(render_tokens(tokens, values))
+    os.chmod(path, mode)
+
+
+def render(template, values, dest, license_file=None, jobs=DEFAULT_JOBS):
+    """Write template (and license_file as LICENSE) under dest; returns the paths written."""
+    files = [(os.path.join(dest, render_tokens(f.path, values)), f.mode, f.tokens) for f in template.files]
+    if license_file:
+        license = compile_file(license_file, "LICENSE")
+        files.append((os.path.join(dest, "LICENSE"), 0o644, license.tokens))
+    for directory in sorted({os.path.dirname(path) for path, _, _ in files}):
+        os.makedirs(directory, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(files)))) as pool:
+        for future in [pool.submit(_write, path, mode, tokens, values) for path, mode, tokens in files]:
+            future.result()
+    return [path for path, _, _ in files]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render a bplate project template.")
+    parser.add_argument("template", help="template directory, e.g. ~/.config/fish/templates/python")
+    parser.add_argument("dest", help="project directory to write into")
+    parser.add_argument("--name", required=True, help="project name ({PROJECT_NAME})")
+    parser.add_argument("--author", default="Your Name", help="{AUTHOR}")
+    parser.add_argument("--license", default="GPL-3.0", help="{LICENSE_TYPE}")
+    parser.add_argument("--license-file", help="license text to render as LICENSE")
+    parser.add_argument("--date", type=date.fromisoformat, help="YYYY-MM-DD for {YEAR}/{TODAY} (default: today)")
+    parser.add_argument("--list", action="store_true", help="print the files that would be written, write nothing")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS, metavar="N", help="write up to N files at once")
+    parser.add_argument("--cache-dir", help=f"where template packs are kept (default: {pack_dir()})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.isdir(args.template):
+        print(f"[ERROR] Template not found: {args.template}", file=sys.stderr)
+        return 1
+    template = load_template(args.template, args.cache_dir)
+    values = placeholder_values(args.name, args.author, args.license, args.date)
+    if args.list:
+        for path in rendered_paths(template, values) + (["LICENSE"] if args.license_file else []):
+            print(path)
+        return 0
+    try:
+        render(template, values, args.dest, args.license_file, args.jobs)
+    except OSError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Span timings for the backup and restore runs.
+
+    with tracing.span("backup", "phase"):
+        ...
+
+Spans are recorded only inside a tracing session (`--trace FILE`).
+Outside one, span() returns a shared no-op context manager, so
+instrumented code pays for one function call and nothing else.
+
+At the end of a session the spans are written to FILE, and a per-span
+summary sorted by total time is printed. A FILE ending in .jsonl gets
+one JSON object per span. Any other name gets Chrome trace format, which
+chrome://tracing or https://ui.perfetto.dev can open.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+Event = namedtuple("Event", ["name", "category", "start", "duration", "thread", "args"])
+Total = namedtuple("Total", ["name", "category", "count", "total", "longest"])
+
+_NULL = contextlib.nullcontext()
+_tracer = None
+
+
+class Tracer:
+    """Collects Events; times are perf_counter_ns relative to the start."""
+
+    def __init__(self):
+        self.origin = time.perf_counter_ns()
+        self.events = []
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, category, start, end, args):
+        thread = threading.current_thread()
+        with self._lock:
+            tid = self.threads.setdefault(thread.ident, (len(self.threads) + 1, thread.name))[0]
+            self.events.append(Event(name, category, start - self.origin, end - start, tid, args))
+
+    def elapsed(self):
+        return time.perf_counter_ns() - self.origin
+
+    def totals(self):
+        """One Total per (name, category), longest total first."""
+        totals = {}
+        for e in self.events:
+            count, total, longest = totals.get((e.name, e.category), (0, 0, 0))
+            totals[(e.name, e.category)] = (count + 1, total + e.duration, max(longest, e.duration))
+        return sorted(
+            (Total(name, category, *values) for (name, category), values in totals.items()),
+            key=lambda t: (-t.total, t.name),
+        )
+
+    def format_summary(self):
+        lines = [f"[INFO] Timing ({len(self.events)} spans, {self.elapsed() / 1e6:.1f} ms wall):"]
+        for t in self.totals():
+            lines.append(
+                f"[INFO]   {t.category:<8} {t.name:<24} {t.count:>4}x {t.total / 1e6:9.1f} ms"
+                f"  (max {t.longest / 1e6:.1f} ms)"
+            )
+        return "\n".join(lines)
+
+    def to_jsonl(self):
+        return "".join(
+            json.dumps({
+                "name": e.name, "cat": e.category, "start_ms": e.start / 1e6,
+                "duration_ms": e.duration / 1e6, "thread": e.thread, "args": e.args,
+            }) + "\n"
+            for e in self.events
+        )
+
+    def to_chrome(self):
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self.threads.values()
+        ]
+        events.extend(
+            {
+                "name": e.name, "cat": e.category, "ph": "X", "pid": pid, "tid": e.thread,
+                "ts": e.start / 1e3, "dur": e.duration / 1e3, "args": e.args,
+            }
+            for e in self.events
+        )
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+
+    def write(self, path):
+        text = self.to_jsonl() if path.endswith(".jsonl") else self.to_chrome()
+        with open(path, "w") as f:
+            f.write(text)
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "category", "args", "start")
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.category, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+
+def span(name, category="phase", **args):
+    """Time a block as one span; a no-op unless a session is active."""
+    tracer = _tracer
+    if tracer is None:
+        return _NULL
+    return _Span(tracer, name, category, args)
+
+
+def active():
+    return _tracer
+
+
+def start():
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop():
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+@contextlib.contextmanager
+def session(path):
+    """Trace the block into path and print the summary; does nothing if path is None."""
+    if not path:
+        yield None
+        return
+    tracer = start()
+    try:
+        with span("total", "run"):
+            yield tracer
+    finally:
+        stop()
+        try:
+            tracer.write(path)
+        except OSError as e:
+            print(f"[WARN] Could not write trace {path}: {e}")
+        else:
+            print(tracer.format_summary())
+            print(f"[INFO] Trace written to {path}")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Check that the home directory still matches what the linker set up.
+
+Only the expected link set is walked. Each package's tree in the repo is
+listed with os.scandir. Its counterpart in the target is checked with
+one lstat per expected entry, or one scandir for the directories the
+package owns (at or below its manifest paths). A folded directory link
+that points at the package is accepted as a whole, without descending.
+
+Every expected path gets one status:
+
+    ok         the link points at the package
+    missing    nothing there
+    broken     a link into the repo whose destination is gone
+    foreign    a link elsewhere, or a file/directory of the wrong kind
+    modified   a plain file whose contents differ from the package's copy
+    unlinked   a plain file identical to the package's copy (link replaced by a copy)
+    unmanaged  an entry in a package-owned directory that the package doesn't have
+
+Exit status is 0 when nothing drifted and 1 otherwise, so the check can
+run from a prompt hook or cron:
+
+    python3 ~/.dotfiles/scripts/verify_links.py --quiet || echo "dotfiles drifted"
+"""
+
+import argparse
+import filecmp
+import json
+import os
+import stat
+import sys
+import time
+from collections import Counter, namedtuple
+
+from detect_env import get_environment
+from linker import IgnoreRules
+from manifest import MANIFEST_PATH, load_manifest, packages_for
+
+STATUSES = ("ok", "missing", "broken", "foreign", "modified", "unlinked", "unmanaged")
+
+Finding = namedtuple("Finding", ["status", "package", "path", "detail"])
+Report = namedtuple("Report", ["findings", "counts", "packages", "duration"])
+
+
+class Verifier:
+    """Compares package trees under stow_dir with their targets, read-only."""
+
+    def __init__(self, stow_dir):
+        self.stow_dir = os.path.abspath(stow_dir)
+        self.findings = []
+        self.counts = Counter()
+
+    def verify(self, packages):
+        """Check (package, target_dir, roots) triples; roots are the manifest's relative paths."""
+        start = time.perf_counter()
+        checked = []
+        for package, target_dir, roots in packages:
+            package_dir = os.path.join(self.stow_dir, package)
+            target_dir = os.path.abspath(os.path.expanduser(target_dir))
+            if not os.path.isdir(package_dir) or not os.path.isdir(target_dir):
+                continue
+            owned = {"/" + root.strip("/") for root in roots}
+            self._walk(package, IgnoreRules.for_package(package_dir), package_dir, target_dir, "", owned, False)
+            for root in sorted(owned):
+                # Links to manifest paths the package no longer has.
+                if not os.path.lexists(package_dir + root):
+                    self._check_stale(package, target_dir + root)
+            checked.append(package)
+        return Report(self.findings, dict(self.counts), checked, time.perf_counter() - start)
+
+    def _record(self, status, package, path, detail=""):
+        self.counts[status] += 1
+        if status != "ok":
+            self.findings.append(Finding(status, package, path, detail))
+
+    def _walk(self, package, ignore, source_dir, target_dir, rel, roots, owned):
+        with os.scandir(source_dir) as it:
+            sources = {e.name: e for e in it if not ignore.matches(f"{rel}/{e.name}", e.name)}
+        targets = None
+        if owned:
+            targets = _scan(target_dir)
+            for name in sorted(targets.keys() - sources.keys()):
+                if not ignore.matches(f"{rel}/{name}", name):
+                    path = os.path.join(target_dir, name)
+                    if not self._check_stale(package, path):
+                        self._record("unmanaged", package, path)
+        for name in sorted(sources):
+            self._check(package, ignore, sources[name], os.path.join(target_dir, name), f"{rel}/{name}",
+                        roots, owned, targets)
+
+    def _check(self, package, ignore, source, target, rel, roots, parent_owned, targets):
+        owned = parent_owned or rel in roots
+        kind = _kind(target, targets.get(source.name) if targets is not None else None, targets is not None)
+        source_is_dir = source.is_dir(follow_symlinks=False)
+        if kind == "absent":
+            self._record("missing", package, target, os.path.relpath(source.path, self.stow_dir))
+        elif kind == "link":
+            dest = os.path.normpath(os.path.join(os.path.dirname(target), os.readlink(target)))
+            if dest == source.path:
+                self._record("ok", package, target)
+            elif not os.path.exists(dest):
+                self._record("broken", package, target, f"-> {dest}")
+            elif self._owned(dest) and source_is_dir and os.path.isdir(dest):
+                # Folded by another package that shares this directory.
+                self._walk(package, ignore, source.path, target, rel, roots, False)
+            else:
+                self._record("foreign", package, target, f"-> {dest}")
+        elif kind == "dir":
+            if source_is_dir:
+                self._walk(package, ignore, source.path, target, rel, roots, owned)
+            else:
+                self._record("foreign", package, target, "directory where a file is expected")
+        elif source_is_dir:
+            self._record("foreign", package, target, "file where a directory is expected")
+        elif filecmp.cmp(target, source.path, shallow=False):
+            self._record("unlinked", package, target, "identical copy")
+        else:
+            self._record("modified", package, target, f"differs from {os.path.relpath(source.path, self.stow_dir)}")
+
+    def _check_stale(self, package, path):
+        """Record path as broken if it's a link into the repo that no longer resolves."""
+        try:
+            dest = os.path.normpath(os.path.join(os.path.dirname(path), os.readlink(path)))
+        except OSError:
+            return False
+        if self._owned(dest) and not os.path.exists(dest):
+            self._record("broken", package, path, f"-> {dest}")
+            return True
+        return False
+
+    def _owned(self, dest):
+        return dest.startswith(self.stow_dir + os.sep)
+
+
+def _scan(path):
+    with os.scandir(path) as it:
+        return {e.name: e for e in it}
+
+
+def _kind(path, entry, listed):
+    """absent/link/dir/file, from a scandir entry when the parent was listed."""
+    if listed:
+        if entry is None:
+            return "absent"
+        if entry.is_symlink():
+            return "link"
+        return "dir" if entry.is_dir(follow_symlinks=False) else "file"
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return "absent"
+    if stat.S_ISLNK(mode):
+        return "link"
+    return "dir" if stat.S_ISDIR(mode) else "file"
+
+
+def verify(stow_dir, packages):
+    return Verifier(stow_dir).verify(packages)
+
+
+def manifest_packages(env, names=None):
+    """(package, target, files) for the platform's packages (or just names) from packages.toml."""
+    manifest = load_manifest()
+    return [
+        (name, manifest.packages[name].target, manifest.packages[name].files)
+        for name in (names or packages_for(env))
+    ]
+
+
+def format_report(report):
+    lines = []
+    for f in report.findings:
+        detail = f"  ({f.detail})" if f.detail else ""
+        lines.append(f"[WARN] {f.status:<9} {f.package:<10} {f.path}{detail}")
+    drifted = len(report.findings)
+    lines.append(
+        f"[INFO] Verified {sum(report.counts.values())} entries in {len(report.packages)} packages "
+        f"in {report.duration * 1000:.1f} ms: " + (f"{drifted} drifted." if drifted else "no drift.")
+    )
+    return "\n".join(lines)
+
+
+def to_json(report):
+    return json.dumps({
+        "ok": not report.findings,
+        "duration_ms": round(report.duration * 1000, 3),
+        "packages": report.packages,
+        "counts": {status: report.counts.get(status, 0) for status in STATUSES},
+        "findings": [f._asdict() for f in report.findings],
+    }, indent=2)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Report drift between the home directory and the dotfiles repo.")
+    parser.add_argument("--stow-dir", default=os.path.dirname(MANIFEST_PATH),
+                        help="the dotfiles repo (default: the one this script is in)")
+    parser.add_argument("--package", action="append", dest="packages", metavar="PKG",
+                        help="check only PKG (repeatable; default: this platform's packages)")
+    parser.add_argument("--json", action="store_true", help="print a machine-readable report")
+    parser.add_argument("--quiet", action="store_true", help="print nothing; only set the exit status")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = verify(args.stow_dir, manifest_packages(get_environment(), args.packages))
+    if args.json:
+        print(to_json(report))
+    elif not args.quiet:
+        print(format_report(report))
+    return 1 if report.findings else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
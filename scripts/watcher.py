@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""Wait for filesystem changes without polling.
+
+On Linux, InotifyWatcher uses inotify through ctypes. wait() blocks in
+select() until the kernel reports an event, so an idle watcher costs no
+CPU. Other platforms get PollingWatcher, which compares lstat() results
+every few seconds.
+
+Directories are watched, not files. Editors usually save by writing a
+new file and renaming it over the old one, which would silently end a
+watch on the old inode. Events for a directory's children are reported
+as full paths. A recursive watch follows directories created later.
+
+run_debounced() turns the event stream into batches: a batch is handed
+to on_change once no event arrived for `debounce` seconds.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+
+# IN_MODIFY is left out on purpose: IN_CLOSE_WRITE covers in-place writes
+# once the writer is done, instead of once per write() call.
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW
+)
+EVENT = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+POLL_INTERVAL = 2.0
+
+
+class WatchError(OSError):
+    pass
+
+
+def _libc():
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+class _Waker:
+    """Self-pipe so stop() can interrupt a blocking select()."""
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+        try:
+            os.write(self.write_fd, b"x")
+        except OSError:
+            pass
+
+    def drain(self):
+        try:
+            while os.read(self.read_fd, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        for fd in (self.read_fd, self.write_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class InotifyWatcher:
+    """Directory watches on one inotify instance."""
+
+    def __init__(self):
+        self.libc = _libc()
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise WatchError(e, f"inotify_init1: {os.strerror(e)}")
+        self.dirs = {}
+        self.recursive = set()
+        self.waker = _Waker()
+
+    @property
+    def stopped(self):
+        return self.waker.stopped
+
+    def watch(self, path, recursive=False):
+        """Watch directory path (and, if recursive, every directory below it)."""
+        path = os.path.abspath(path)
+        if recursive:
+            self.recursive.add(path)
+            for dirpath, dirnames, _ in os.walk(path):
+                self._add(dirpath)
+        else:
+            self._add(path)
+
+    def _add(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            e = ctypes.get_errno()
+            if e in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise WatchError(e, f"inotify_add_watch {path}: {os.strerror(e)}")
+        self.dirs[wd] = path
+
+    def _is_recursive(self, path):
+        return any(path == root or path.startswith(root + os.sep) for root in self.recursive)
+
+    def wait(self, timeout=None):
+        """Block until events arrive (or timeout/stop); returns the changed paths."""
+        ready, _, _ = select.select([self.fd, self.waker.read_fd], [], [], timeout)
+        if self.waker.read_fd in ready:
+            self.waker.drain()
+        if self.fd not in ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            changed |= self._parse(data)
+        return changed
+
+    def _parse(self, data):
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b"\0")
+            offset += EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped: report everything watched.
+                changed |= set(self.dirs.values())
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.dirs[wd]
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            changed.add(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and self._is_recursive(path):
+                self.watch(path, recursive=True)
+                changed |= _tree(path)
+        return changed
+
+    def stop(self):
+        self.waker.stop()
+
+    def close(self):
+        os.close(self.fd)
+        self.waker.close()
+
+
+class PollingWatcher:
+    """Same interface as InotifyWatcher, by comparing lstat() results."""
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.roots = {}
+        self.state = {}
+        self.waker = _Waker()
+
+    @property
+    def stopped(self):
+        return self.waker.stopped
+
+    def watch(self, path, recursive=False):
+        self.roots[os.path.abspath(path)] = recursive
+        self.state = self._scan()
+
+    def _scan(self):
+        state = {}
+        for root, recursive in self.roots.items():
+            paths = _tree(root) if recursive else {root} | {os.path.join(root, n) for n in _listdir(root)}
+            for path in paths:
+                try:
+                    st = os.lstat(path)
+                except OSError:
+                    continue
+                state[path] = (st.st_mtime_ns, st.st_size, st.st_ino, st.st_mode)
+        return state
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.stopped:
+            interval = self.interval if deadline is None else min(self.interval, max(0, deadline - time.monotonic()))
+            ready, _, _ = select.select([self.waker.read_fd], [], [], interval)
+            if ready:
+                self.waker.drain()
+                return set()
+            state = self._scan()
+            changed = {p for p in state.keys() | self.state.keys() if state.get(p) != self.state.get(p)}
+            self.state = state
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+        return set()
+
+    def stop(self):
+        self.waker.stop()
+
+    def close(self):
+        self.waker.close()
+
+
+def make_watcher():
+    """InotifyWatcher where available, else PollingWatcher."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher()
+
+
+def run_debounced(watcher, on_change, debounce=2.0, quiet=None, on_quiet=None, max_delay=None, accept=None):
+    """Feed watcher events to on_change(paths) in debounced batches until stopped.
+
+    With accept, paths for which accept(path) is false are dropped before
+    they reach a batch, so they neither flush nor delay one.
+
+    A batch is flushed once no event arrived for debounce seconds (or
+    max_delay after its first event, so a steady stream still flushes).
+    With quiet and on_quiet, on_quiet() runs once quiet seconds pass
+    after the last flush without another event. A batch still pending
+    when the watcher is stopped is flushed before returning.
+    """
+    max_delay = max_delay or debounce * 10
+    pending = set()
+    first = last = flushed = None
+    while not watcher.stopped:
+        now = time.monotonic()
+        if pending:
+            timeout = max(0, min(last + debounce, first + max_delay) - now)
+        elif flushed is not None:
+            timeout = max(0, flushed + quiet - now)
+        else:
+            timeout = None
+        changed = watcher.wait(timeout)
+        if accept is not None:
+            changed = {p for p in changed if accept(p)}
+        now = time.monotonic()
+        if changed:
+            if not pending:
+                first = now
+            pending |= changed
+            last = now
+            if now - first < max_delay:
+                continue
+        if pending and (now - last >= debounce or now - first >= max_delay):
+            batch, pending = pending, set()
+            on_change(batch)
+            flushed = now if on_quiet else None
+        elif not pending and flushed is not None and now - flushed >= quiet:
+            flushed = None
+            on_quiet()
+    if pending:
+        on_change(pending)
+
+
+def _listdir(path):
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
+
+
+def _tree(root):
+    paths = {root}
+    for dirpath, dirnames, filenames in os.walk(root):
+        paths.update(os.path.join(dirpath, n) for n in dirnames + filenames)
+    return paths
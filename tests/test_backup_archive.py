@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+import importlib.util
+import io
+import os
+import sys
+import tarfile
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import backup_archive
+from backup_archive import ArchiveWriter, extract_member
+from manifest import Manifest, Package
+from snapshot_store import SnapshotStore
+
+
+def load_backup_script():
+    path = os.path.join(os.path.dirname(__file__), "..", "backup-dotfiles.py")
+    spec = importlib.util.spec_from_file_location("backup_dotfiles", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.home = os.path.join(self.tmp.name, "home")
+        os.makedirs(os.path.join(self.home, ".config", "fish", "conf.d"))
+        self._write(".bashrc", "export FOO=1\n")
+        self._write(".config/fish/config.fish", "set -gx EDITOR nvim\n" * 200)
+        self._write(".config/fish/conf.d/00-env.fish", "set -gx LANG en_US.UTF-8\n")
+        os.symlink("config.fish", os.path.join(self.home, ".config/fish/alias.fish"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, rel, content):
+        with open(os.path.join(self.home, rel), "w") as f:
+            f.write(content)
+
+    def _read(self, path):
+        with open(path) as f:
+            return f.read()
+
+
+class TestArchiveWriter(ArchiveTestCase):
+    def write_archive(self, codec="xz"):
+        store = SnapshotStore(os.path.join(self.tmp.name, "unused"))
+        path = os.path.join(self.tmp.name, "out.tar")
+        with ArchiveWriter(path, codec) as writer:
+            bash = writer.add("bash", self.home, store._walk(self.home, ".bashrc"))
+            fish = writer.add("fish", self.home, store._walk(self.home, ".config/fish"))
+        return path, writer.frames, bash + fish
+
+    def test_whole_archive_is_a_plain_tar(self):
+        path, frames, _ = self.write_archive()
+        self.assertEqual([f["package"] for f in frames], ["bash", "fish"])
+        with tarfile.open(path, "r:xz") as tar:
+            names = sorted(tar.getnames())
+            link = tar.getmember("fish/.config/fish/alias.fish")
+        self.assertEqual(names, [
+            "bash/.bashrc",
+            "fish/.config/fish/alias.fish",
+            "fish/.config/fish/conf.d/00-env.fish",
+            "fish/.config/fish/config.fish",
+        ])
+        self.assertEqual(link.linkname, "config.fish")
+
+    def test_extract_one_member_from_its_frame(self):
+        path, frames, entries = self.write_archive()
+        entry = next(e for e in entries if e["path"].endswith("00-env.fish"))
+        self.assertEqual(entry["frame"], 1)
+        out = io.BytesIO()
+        info = extract_member(path, "xz", frames[entry["frame"]], entry["offset"], out)
+        self.assertEqual(info.name, "fish/.config/fish/conf.d/00-env.fish")
+        self.assertEqual(out.getvalue(), b"set -gx LANG en_US.UTF-8\n")
+
+    def test_failure_leaves_no_archive(self):
+        path = os.path.join(self.tmp.name, "out.tar.xz")
+        with self.assertRaises(RuntimeError):
+            with ArchiveWriter(path, "xz"):
+                raise RuntimeError("boom")
+        self.assertEqual(os.listdir(self.tmp.name), ["home"])
+
+    @unittest.skipUnless(backup_archive.zstandard, "zstandard not installed")
+    def test_zstd_round_trip(self):
+        path, frames, entries = self.write_archive("zstd")
+        out = io.BytesIO()
+        extract_member(path, "zstd", frames[0], entries[0]["offset"], out)
+        self.assertEqual(out.getvalue(), b"export FOO=1\n")
+
+
+class TestArchivedSnapshots(ArchiveTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = SnapshotStore(os.path.join(self.tmp.name, "backup"))
+        sources = [
+            ("bash", self.home, ".bashrc", None),
+            ("fish", self.home, ".config/fish", None),
+        ]
+        entries, archive = self.store.archive("snap", sources, "xz")
+        self.store.write_snapshot("snap", entries, {"archive": archive})
+
+    def test_no_loose_objects(self):
+        self.assertFalse(os.path.exists(self.store.objects_dir))
+        self.assertEqual(os.listdir(self.store.archives_dir), ["snap.tar.xz"])
+        self.assertEqual(self.store.list_snapshots()[0]["archive"], "snap.tar.xz")
+
+    def test_restore_to_directory(self):
+        dest = os.path.join(self.tmp.name, "restored")
+        self.assertEqual(self.store.restore("snap", dest=dest, packages=["fish"]), 3)
+        restored = os.path.join(dest, "fish", ".config/fish/config.fish")
+        self.assertEqual(self._read(restored), "set -gx EDITOR nvim\n" * 200)
+        self.assertEqual(os.readlink(os.path.join(dest, "fish", ".config/fish/alias.fish")), "config.fish")
+
+    def test_restore_in_place(self):
+        self._write(".bashrc", "clobbered\n")
+        self.store.restore("snap", packages=["bash"])
+        self.assertEqual(self._read(os.path.join(self.home, ".bashrc")), "export FOO=1\n")
+
+    def test_archive_entries_never_count_as_unchanged(self):
+        previous = {e["path"]: e for e in self.store.load_snapshot("snap")["entries"] if e["package"] == "bash"}
+        self.assertFalse(self.store.is_unchanged(self.home, ".bashrc", previous))
+        self.assertIsNone(self.store.carried_entries(["bash"]))
+
+
+class TestBackupAfterArchive(ArchiveTestCase):
+    """backup-dotfiles.py's plan and partial backups when the latest snapshot is an archive."""
+
+    def setUp(self):
+        super().setUp()
+        self.backup = load_backup_script()
+        self.repo = os.path.join(self.tmp.name, "repo")
+        os.makedirs(os.path.join(self.repo, "bash"))
+        os.makedirs(os.path.join(self.repo, "fish", ".config", "fish"))
+        with open(os.path.join(self.repo, "bash", ".bashrc"), "w") as f:
+            f.write("repo bashrc\n")
+        with open(os.path.join(self.repo, "fish", ".config", "fish", "config.fish"), "w") as f:
+            f.write("repo fish\n")
+        manifest = Manifest({
+            "bash": Package("bash", self.home, [".bashrc"], [], [], []),
+            "fish": Package("fish", self.home, [".config/fish"], [], [], []),
+        })
+        backup_dir = os.path.join(self.tmp.name, "backup")
+        for name, value in {
+            "BACKUP_DIR": backup_dir,
+            "DOTFILES_DIR": self.repo,
+            "load_manifest": lambda: manifest,
+            "get_platform_specific_packages": lambda env: ["bash", "fish"],
+        }.items():
+            patcher = mock.patch.object(self.backup, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.env = SimpleNamespace(os="linux", distro="test", hostname="host")
+        self.store = SnapshotStore(backup_dir)
+        sources = [("bash", self.home, ".bashrc", None), ("fish", self.home, ".config/fish", None)]
+        entries, archive = self.store.archive("backup_20000101_000000_test", sources, "xz")
+        self.store.write_snapshot("backup_20000101_000000_test", entries, {"archive": archive})
+
+    def test_prune_is_keep_last_and_removes_the_archive(self):
+        entries, _ = self.store.collect("bash", self.home, ".bashrc")
+        self.store.write_snapshot("backup_20000102_000000_test", entries)
+        args = self.backup.parse_args(["--prune", "1"])
+        self.assertEqual(args.keep_last, 1)
+        with mock.patch("sys.stdout", io.StringIO()):
+            self.backup.update(args)
+        self.assertEqual(self.store.snapshot_names(), ["backup_20000102_000000_test"])
+        self.assertEqual(os.listdir(self.store.archives_dir), [])
+
+    def test_plan_after_archive_backs_up_modified_file(self):
+        self._write(".bashrc", "edited after the archive\n")
+        plan = self.backup.build_plan(self.env)
+        snapshots = {s.package: s for s in plan.steps if s.phase == "backup"}
+        self.assertFalse(snapshots["bash"].satisfied)
+        self.assertNotIn("unchanged", snapshots["bash"].detail)
+
+    def test_partial_backup_after_archive_restores(self):
+        name = self.backup.backup_existing_files(self.env, packages={"bash"})
+        self.assertIsNotNone(name)
+        self.assertIsNone(self.store.load_snapshot(name).get("archive"))
+        self.assertEqual({e["package"] for e in self.store.load_snapshot(name)["entries"]}, {"bash", "fish"})
+
+        self._write(".bashrc", "clobbered\n")
+        self._write(".config/fish/config.fish", "clobbered\n")
+        self.assertTrue(self.backup.restore_snapshot(name))
+        self.assertEqual(self._read(os.path.join(self.home, ".bashrc")), "export FOO=1\n")
+        self.assertEqual(self._read(os.path.join(self.home, ".config/fish/config.fish")), "set -gx EDITOR nvim\n" * 200)
+
+    def test_restore_rejects_entries_without_contents(self):
+        entry = dict(self.store.load_snapshot("backup_20000101_000000_test")["entries"][0])
+        self.store.write_snapshot("backup_20000101_000001_test", [entry])
+        self.assertFalse(self.backup.restore_snapshot("backup_20000101_000001_test"))
+        with self.assertRaisesRegex(ValueError, "no stored contents"):
+            self.store.restore("backup_20000101_000001_test", dest=os.path.join(self.tmp.name, "out"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import bench_shell_startup
+from bench_shell_startup import (bench_shell, compare, parse_args, parse_bash_xtrace, parse_fish_profile,
+                                 parse_zprof, percentile, print_report)
+
+
+class TestBenchShellStartup(unittest.TestCase):
+    def test_percentile_nearest_rank(self):
+        samples = [5, 1, 4, 2, 3, 10, 9, 8, 7, 6]
+        self.assertEqual(percentile(samples, 50), 5)
+        self.assertEqual(percentile(samples, 95), 10)
+        self.assertEqual(percentile([3.0], 95), 3.0)
+
+    def test_parse_fish_profile(self):
+        text = (
+            "Time\tSum\tCommand\n"
+            "100\t5000\t> builtin source /home/u/.config/fish/config.fish\n"
+            "4000\t4000\t-> command -v bat\n"
+            "900\t900\t-> source /home/u/.dotfiles/scripts/detect-env.fish\n"
+        )
+        profile = parse_fish_profile(text)
+        self.assertEqual(profile["lines"][0], {"location": "command -v bat", "ms": 4.0})
+        self.assertEqual(profile["files"][0], {"location": "/home/u/.config/fish/config.fish", "ms": 5.0})
+
+    def test_parse_bash_xtrace(self):
+        text = (
+            "+1700000000.000000 /h/.bashrc:3 export A=1\n"
+            "++1700000000.010000 /h/.bashrc:4 command -v bat\n"
+            "some output\n"
+            "+1700000000.011000 /h/lib.sh:1 true\n"
+            "+1700000000.012000 /h/.bashrc:9 set +x\n"
+        )
+        profile = parse_bash_xtrace(text)
+        self.assertEqual(profile["lines"][0]["location"], "/h/.bashrc:3")
+        self.assertAlmostEqual(profile["lines"][0]["ms"], 10.0, places=2)
+        self.assertAlmostEqual(profile["files"][0]["ms"], 11.0, places=2)
+
+    def test_parse_zprof(self):
+        text = (
+            "num  calls                time                       self            name\n"
+            "-----------------------------------------------------------------------------------\n"
+            " 1)    1          12.50    12.50   62.50%     10.00    10.00   50.00%  compinit\n"
+            " 2)    2           7.50     3.75   37.50%      7.50     3.75   37.50%  nvm_load\n"
+        )
+        profile = parse_zprof(text)
+        self.assertEqual([i["location"] for i in profile["lines"]], ["compinit", "nvm_load"])
+        self.assertEqual(profile["lines"][0]["ms"], 10.0)
+
+    def test_compare_flags_regression(self):
+        baseline = {"shells": {"bash": {"p50_ms": 10.0, "p95_ms": 12.0}}}
+        slower = {"shells": {"bash": {"p50_ms": 12.0, "p95_ms": 14.0}}}
+        faster = {"shells": {"bash": {"p50_ms": 9.0, "p95_ms": 11.0}}}
+        self.assertTrue(compare(slower, baseline, 10.0))
+        self.assertFalse(compare(faster, baseline, 10.0))
+
+    def test_hanging_shell_is_reported_not_fatal(self):
+        with tempfile.TemporaryDirectory() as home, \
+                mock.patch.dict(bench_shell_startup.SHELLS, {"hang": ["sleep", "5"]}), \
+                mock.patch.object(bench_shell_startup, "TIMEOUT", 0.1):
+            result = bench_shell("hang", home, 3)
+        self.assertTrue(result["timed_out"])
+        results = {"shells": {"hang": result}}
+        print_report(results)
+        baseline = {"shells": {"hang": {"p50_ms": 10.0, "p95_ms": 12.0}}}
+        self.assertFalse(compare(results, baseline, 10.0))
+
+    def test_failing_shell_is_reported_not_timed(self):
+        argv = [sys.executable, "-c", "import sys; sys.exit('config.fish: syntax error')"]
+        with tempfile.TemporaryDirectory() as home, mock.patch.dict(bench_shell_startup.SHELLS, {"broken": argv}):
+            result = bench_shell("broken", home, 3)
+        self.assertEqual(result["failed"], "exited 1: config.fish: syntax error")
+        self.assertEqual(result["samples_ms"], [])
+        results = {"shells": {"broken": result}}
+        print_report(results)
+        baseline = {"shells": {"broken": {"p50_ms": 10.0, "p95_ms": 12.0}}}
+        self.assertFalse(compare(results, baseline, 10.0))
+
+    def test_runs_must_be_positive(self):
+        self.assertEqual(parse_args(["-n", "1"]).runs, 1)
+        with mock.patch("sys.stderr"), self.assertRaises(SystemExit):
+            parse_args(["-n", "0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from brewfile import BrewInventory, apply_diff, diff_inventory, parse_brewfile, read_brewfile, tap_url
+
+REPO_BREWFILE = os.path.join(os.path.dirname(__file__), "..", "brew", "Brewfile")
+
+# Just enough of brew for the diff: installs are directories under the prefix.
+FAKE_BREW = textwrap.dedent("""\
+    #!{python}
+    import os, sys
+    prefix = {prefix!r}
+    args = sys.argv[1:]
+    with open(os.path.join(prefix, "calls.log"), "a") as log:
+        log.write(" ".join(args) + "\\n")
+    if args[0] in ("--prefix", "--repository"):
+        print(prefix)
+    elif args[0] in ("install", "uninstall"):
+        root = "Caskroom" if args[1] == "--cask" else "Cellar"
+        for name in args[2:]:
+            path = os.path.join(prefix, root, name.rsplit("/", 1)[-1])
+            os.makedirs(path, exist_ok=True) if args[0] == "install" else os.rmdir(path)
+    elif args[0] == "tap":
+        user, repo = args[1].split("/")
+        os.makedirs(os.path.join(prefix, "Library", "Taps", user, "homebrew-" + repo))
+    elif args[0] == "bundle":
+        with open(args[1].split("=", 1)[1]) as f, open(os.path.join(prefix, "calls.log"), "a") as log:
+            log.write(f.read())
+    elif args[0] == "leaves":
+        with open(os.path.join(prefix, "requested")) as f:
+            print(f.read())
+    else:
+        sys.exit("fake brew: unsupported " + " ".join(args))
+""")
+
+BREWFILE = textwrap.dedent("""\
+    # comment
+    tap "felixkratz/formulae"
+    tap "kde-mac/kde", "https://invent.kde.org/packaging/homebrew-kde.git"
+    brew "bat"
+    brew "cmake", link: false
+    brew "felixkratz/formulae/sketchybar"
+    cask "ghostty"
+    vscode "vscodevim.vim"
+""")
+
+
+class TestParse(unittest.TestCase):
+    def test_entries_and_options(self):
+        entries = parse_brewfile(BREWFILE)
+        self.assertEqual([e.kind for e in entries], ["tap", "tap", "brew", "brew", "brew", "cask", "vscode"])
+        self.assertEqual(entries[3].options, "link: false")
+        self.assertEqual(tap_url(entries[1]), "https://invent.kde.org/packaging/homebrew-kde.git")
+        self.assertIsNone(tap_url(entries[0]))
+
+    def test_repo_brewfile(self):
+        entries = read_brewfile(REPO_BREWFILE)
+        with open(REPO_BREWFILE) as f:
+            lines = [l for l in f.read().splitlines() if l.strip() and not l.startswith("#")]
+        self.assertEqual(len(entries), len(lines))
+
+
+class TestInventory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.prefix = os.path.join(self.tmp.name, "homebrew")
+        os.makedirs(os.path.join(self.prefix, "Cellar", "bat"))
+        os.makedirs(os.path.join(self.prefix, "Cellar", "htop"))
+        os.makedirs(os.path.join(self.prefix, "Caskroom"))
+        os.makedirs(os.path.join(self.prefix, "Library", "Taps", "homebrew", "homebrew-core"))
+        self.brew = os.path.join(self.tmp.name, "brew")
+        with open(self.brew, "w") as f:
+            f.write(FAKE_BREW.format(python=sys.executable, prefix=self.prefix))
+        os.chmod(self.brew, 0o755)
+        self.brewfile = os.path.join(self.tmp.name, "Brewfile")
+        with open(self.brewfile, "w") as f:
+            f.write(BREWFILE)
+        self.cache = os.path.join(self.tmp.name, "cache", "brew-inventory.json")
+        self.vscode = os.path.join(self.tmp.name, "vscode", "extensions")
+        os.makedirs(self.vscode)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def inventory(self):
+        return BrewInventory(self.cache, self.brew, {"vscode": [self.vscode]})
+
+    def calls(self):
+        try:
+            with open(os.path.join(self.prefix, "calls.log")) as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def test_reads_directories_not_brew(self):
+        inventory = self.inventory().load()
+        self.assertEqual(inventory.formulae, {"bat", "htop"})
+        self.assertEqual(inventory.taps, {"homebrew/core"})
+        self.assertEqual(self.calls(), ["--prefix", "--repository"])
+
+        # The cached prefix is reused: no brew call at all on a later run.
+        os.makedirs(os.path.join(self.prefix, "Cellar", "jq"))
+        self.assertIn("jq", self.inventory().load().formulae)
+        self.assertEqual(len(self.calls()), 2)
+
+    def test_installs_only_the_difference(self):
+        entries = read_brewfile(self.brewfile)
+        brew_diff = diff_inventory(entries, self.inventory().load())
+        self.assertEqual([e.name for e in brew_diff.taps], ["felixkratz/formulae", "kde-mac/kde"])
+        self.assertEqual(brew_diff.formulae, ["cmake", "felixkratz/formulae/sketchybar"])
+        self.assertEqual(brew_diff.casks, ["ghostty"])
+        self.assertEqual([e.kind for e in brew_diff.unmanaged], ["vscode"])
+
+        results = apply_diff(brew_diff, self.brew)
+        self.assertTrue(all(r.ok for r in results))
+        self.assertIn("install --formula cmake felixkratz/formulae/sketchybar", self.calls())
+        self.assertIn("tap kde-mac/kde https://invent.kde.org/packaging/homebrew-kde.git", self.calls())
+        # The vscode entry goes to brew bundle in a Brewfile of its own.
+        self.assertEqual(self.calls()[-1], 'vscode "vscodevim.vim"')
+
+        again = diff_inventory(entries, self.inventory().load())
+        self.assertEqual((again.taps, again.formulae, again.casks), ([], [], []))
+
+    def test_cleanup_removes_unlisted_leaves(self):
+        with open(os.path.join(self.prefix, "requested"), "w") as f:
+            f.write("bat\nhtop\n")
+        inventory = self.inventory()
+        brew_diff = diff_inventory(read_brewfile(self.brewfile), inventory.load(), inventory.leaves())
+        self.assertEqual(brew_diff.remove_formulae, ["htop"])
+        apply_diff(brew_diff, self.brew)
+        self.assertNotIn("htop", self.inventory().load().formulae)
+
+    def test_dump_only_after_changes(self):
+        inventory = self.inventory()
+        self.assertTrue(inventory.needs_dump(self.brewfile))
+        inventory.record_dump(self.brewfile)
+        self.assertFalse(self.inventory().needs_dump(self.brewfile))
+
+        os.makedirs(os.path.join(self.prefix, "Caskroom", "wezterm"))
+        self.assertTrue(self.inventory().needs_dump(self.brewfile))
+
+    def test_extension_changes_trigger_a_dump(self):
+        inventory = self.inventory()
+        inventory.record_dump(self.brewfile)
+        self.assertFalse(self.inventory().needs_dump(self.brewfile))
+        os.makedirs(os.path.join(self.vscode, "ms-python.python-2026.1.0"))
+        os.utime(self.vscode, (1, 1))
+        self.assertTrue(self.inventory().needs_dump(self.brewfile))
+
+    def test_kinds_without_a_stamp_always_dump(self):
+        with open(self.brewfile, "a") as f:
+            f.write('whalebrew "whalebrew/wget"\n')
+        inventory = self.inventory()
+        inventory.record_dump(self.brewfile)
+        self.assertTrue(self.inventory().needs_dump(self.brewfile))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from bench_shell_startup import make_home, shell_env
+from compile_fish_init import LOADER_FLAGS, Compiler, compile_init, is_fresh, parse, tokenize
+from detect_env import Environment
+
+ENV = Environment("linux", "arch", "siku")
+
+
+def guarded(text):
+    return "if not set -q __dotfiles_compiled\n" + textwrap.indent(text, "    ") + "end\n"
+
+
+class CompileFishInitTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.home = os.path.join(self.root, "home")
+        self.fish_dir = os.path.join(self.home, ".config", "fish")
+        self.bin = os.path.join(self.root, "bin")
+        self.cache = os.path.join(self.root, "cache")
+        os.makedirs(os.path.join(self.fish_dir, "conf.d"))
+        os.makedirs(self.bin)
+        self.write(os.path.join(self.fish_dir, "config.fish"), "")
+        patcher = patch.dict(os.environ, {"HOME": self.home})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text, mode=0o644):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        os.chmod(path, mode)
+        return path
+
+    def tool(self, name, script="exit 0\n"):
+        return self.write(os.path.join(self.bin, name), "#!/bin/sh\n" + script, 0o755)
+
+    def compile(self, text, name="config.fish"):
+        self.write(os.path.join(self.fish_dir, name), guarded(text))
+        compiler = Compiler(ENV, self.home, [self.bin], self.fish_dir, os.path.join(self.home, ".dotfiles"))
+        return compiler.compile(), compiler
+
+
+class TestTokenize(unittest.TestCase):
+    def test_quotes_and_substitutions(self):
+        tokens = tokenize("set -l x 'a b' \"$HOME/c\" (command -v bat)")
+        self.assertEqual([t.raw for t in tokens], ["set", "-l", "x", "'a b'", '"$HOME/c"', "(command -v bat)"])
+        self.assertEqual(tokens[5].parts, [("cmd", "command -v bat")])
+
+    def test_pipes_are_not_modelled(self):
+        self.assertIsNone(tokenize("foo | bar"))
+        self.assertIsNone(tokenize("foo > /dev/null"))
+
+    def test_parse_if_branches(self):
+        nodes = parse(["if test -d /a", "    echo a", "else if test -d /b", "    echo b", "else", "    echo c", "end"])
+        self.assertEqual(nodes[0][0], "if")
+        self.assertEqual([b[0] for b in nodes[0][1]], ["test -d /a", "test -d /b", None])
+
+
+class TestCompiler(CompileFishInitTestCase):
+    def test_resolves_command_probes(self):
+        self.tool("bat")
+        out, _ = self.compile(
+            "if command -v bat > /dev/null\n    alias cat bat\nend\n"
+            "if command -v nope > /dev/null\n    alias nope x\nend\n"
+        )
+        self.assertIn("alias cat bat", out)
+        self.assertNotIn("alias nope x", out)
+        self.assertFalse(any(line.startswith("if") for line in out))
+
+    def test_resolves_platform_branches(self):
+        out, _ = self.compile(
+            'if test "$DOTFILES_OS" = "darwin"\n    set -gx A mac\n'
+            'else if test "$DOTFILES_DISTRO" = "arch"\n    set -gx A arch\nend\n'
+        )
+        self.assertIn("set -gx A arch", out)
+        self.assertNotIn("set -gx A mac", out)
+
+    def test_unresolvable_condition_is_kept(self):
+        out, _ = self.compile("if status is-interactive\n    set -g x 1\nend\n")
+        self.assertEqual(out[1:], ["if status is-interactive", "    set -g x 1", "end"])
+
+    def test_path_changes_affect_later_probes(self):
+        extra = os.path.join(self.home, ".local", "bin")
+        self.write(os.path.join(extra, "just"), "#!/bin/sh\n", 0o755)
+        out, compiler = self.compile(
+            "set -gx PATH $HOME/.local/bin $PATH\n"
+            "if command -v just > /dev/null\n    alias j just\nend\n"
+        )
+        self.assertIn("alias j just", out)
+        self.assertIn(extra, compiler.extras)
+
+    def test_set_substitutes_command_path(self):
+        python = self.tool("python3")
+        out, _ = self.compile('set -l py (command -v python3)\nif test -n "$py"\n    alias python "$py"\nend\n')
+        self.assertIn(f"set -l py {python}", out)
+        self.assertIn('alias python "$py"', out)
+
+    def test_inlines_init_generators(self):
+        starship = self.tool("starship", 'if [ "$3" = "--print-full-init" ]; then\n'
+                                         "echo 'function fish_prompt'; echo '    echo ok'; echo 'end'\n"
+                                         'else echo "source ($0 init fish --print-full-init | psub)"; fi\n')
+        out, compiler = self.compile("starship init fish | source\n")
+        self.assertIn("function fish_prompt", out)
+        self.assertNotIn("psub", "\n".join(out))
+        self.assertIn(starship, compiler.extras)
+
+    def test_failing_generator_is_kept_verbatim(self):
+        self.tool("zoxide", "exit 1\n")
+        out, _ = self.compile("zoxide init fish | source\n")
+        self.assertIn("zoxide init fish | source", out)
+
+    def test_inlines_sourced_files_and_detect_env(self):
+        shared = self.write(os.path.join(self.home, ".dotfiles", "shared", "env.fish"), "set -gx SHARED 1\n")
+        out, compiler = self.compile(
+            "source ~/.dotfiles/scripts/detect-env.fish\nsource ~/.dotfiles/shared/env.fish\n"
+        )
+        self.assertIn("set -gx DOTFILES_DISTRO arch", out)
+        self.assertIn("set -gx SHARED 1", out)
+        self.assertIn(shared, compiler.extras)
+
+    def test_guard_and_conf_d_loop_are_flattened(self):
+        self.write(os.path.join(self.fish_dir, "conf.d", "00-compiled-init.fish"), "set -g loader 1\n")
+        self.write(os.path.join(self.fish_dir, "conf.d", "10-a.fish"),
+                   "if not set -q __dotfiles_compiled\n    set -gx A 1\nend\n")
+        out, _ = self.compile(
+            "for f in ~/.config/fish/conf.d/*.fish\n    source $f\nend\n"
+            "if set -q __dotfiles_startup_path; and command -v python3 > /dev/null\n    rebuild &\nend\n"
+        )
+        self.assertIn("set -gx A 1", out)
+        self.assertNotIn("set -g loader 1", out)
+        self.assertFalse(any("source $f" in line or "rebuild" in line for line in out))
+
+    def test_unguarded_conf_d_files_are_left_to_fish(self):
+        self.write(os.path.join(self.fish_dir, "conf.d", "fisher-plugin.fish"), "set -g plugin 1\n")
+        out, _ = self.compile("set -gx A 1\n")
+        self.assertIn("set -gx A 1", out)
+        self.assertFalse(any("plugin" in line for line in out))
+
+    @unittest.skipUnless(shutil.which("fish"), "fish not installed")
+    def test_repo_config_compiles_to_valid_fish(self):
+        repo_fish = os.path.join(os.path.dirname(__file__), "..", "fish", ".config", "fish")
+        shutil.rmtree(self.fish_dir)
+        shutil.copytree(repo_fish, self.fish_dir)
+        init, _ = compile_init(self.fish_dir, [self.bin, "/usr/bin", "/bin"], self.cache, env=ENV)
+        result = subprocess.run(["fish", "-n", init], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class TestFreshness(CompileFishInitTestCase):
+    def test_fresh_until_inputs_change(self):
+        secret = os.path.join(self.root, "secret.fish")
+        config = self.write(os.path.join(self.fish_dir, "config.fish"),
+                            guarded(f"if test -f {secret}\n    source {secret}\nend\n"))
+        hostname = socket.gethostname()
+        compile_init(self.fish_dir, [self.bin], self.cache, env=ENV)
+        self.assertTrue(is_fresh(self.fish_dir, [self.bin], hostname, self.cache))
+        self.assertFalse(is_fresh(self.fish_dir, [self.bin, "/usr/bin"], hostname, self.cache))
+
+        os.utime(self.bin, (1, 1))
+        self.assertFalse(is_fresh(self.fish_dir, [self.bin], hostname, self.cache))
+
+        compile_init(self.fish_dir, [self.bin], self.cache, env=ENV)
+        self.write(secret, "set -gx TOKEN x\n")
+        self.assertFalse(is_fresh(self.fish_dir, [self.bin], hostname, self.cache))
+
+        compile_init(self.fish_dir, [self.bin], self.cache, env=ENV)
+        os.utime(config, (2, 2))
+        self.assertFalse(is_fresh(self.fish_dir, [self.bin], hostname, self.cache))
+
+
+@unittest.skipUnless(shutil.which("fish"), "fish not installed")
+class TestCompiledStartup(unittest.TestCase):
+    """The repo's fish config, started with and without the compiled init."""
+
+    SEPARATOR = "--8<--"
+    PROBE = f"echo {SEPARATOR}; set -x; echo {SEPARATOR}; set -g -n; echo {SEPARATOR}; functions -a -n; echo {SEPARATOR}; abbr --list"
+
+    def setUp(self):
+        repo = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+        self.tmp = make_home(repo)
+        self.home = self.tmp.name
+        self.cache = os.path.join(self.home, ".cache")
+        self.path = os.environ.get("PATH", "/usr/bin:/bin")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def startup_state(self, compiled):
+        env = shell_env(self.home)
+        env.pop("DOTFILES_COMPILED_INIT", None)
+        env.update({"PATH": self.path, "XDG_CACHE_HOME": self.cache})
+        if compiled:
+            env["DOTFILES_COMPILED_INIT"] = "1"
+        result = subprocess.run(["fish", "-i", "-c", self.PROBE], env=env, cwd=self.home,
+                                stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        sections = result.stdout.split(self.SEPARATOR + "\n")[-4:]
+        exported, names, functions, abbrs = (section.splitlines() for section in sections)
+        exported = sorted(line for line in exported if not line.startswith("DOTFILES_COMPILED_INIT "))
+        # fish's own bookkeeping (__fish_*) depends on what happened to autoload.
+        names = {name for name in names if not name.startswith("__fish")}
+        return exported, names, sorted(functions), sorted(abbrs)
+
+    def test_compiled_init_matches_normal_startup(self):
+        normal = self.startup_state(compiled=False)
+        fish_dir = os.path.join(self.home, ".config", "fish")
+        with patch.dict(os.environ, {"HOME": self.home}):
+            compile_init(fish_dir, self.path.split(os.pathsep), os.path.join(self.cache, "dotfiles", "fish"))
+        compiled = self.startup_state(compiled=True)
+
+        # Otherwise a stale key would compare the normal startup with itself.
+        self.assertIn("__dotfiles_compiled", compiled[1])
+        self.assertEqual(compiled[0], normal[0])
+        self.assertEqual(compiled[1] - set(LOADER_FLAGS), normal[1] - set(LOADER_FLAGS))
+        self.assertEqual(compiled[2], normal[2])
+        self.assertEqual(compiled[3], normal[3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,25 @@
 #!/usr/bin/env python3
 
 import os
+import subprocess
 import sys
 import tempfile
+import time
 import unittest
 from unittest.mock import patch, MagicMock, mock_open
 from pathlib import Path
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
 
-from detect_env import EnvironmentDetector
+import detect_env
+from detect_env import (
+    Environment,
+    EnvironmentDetector,
+    get_environment,
+    read_env_cache,
+    set_environment,
+    write_env_cache,
+)
 
 
 class TestEnvironmentDetector(unittest.TestCase):
@@ -64,13 +74,29 @@ class TestEnvironmentDetector(unittest.TestCase):
             with patch.object(self.detector, "detect_os", return_value="linux"):
                 self.assertEqual(self.detector.detect_distro(), "unknown")
 
+    def test_detect_hostname_uses_gethostname(self):
+        with patch("socket.gethostname", return_value="my-computer"):
+            with patch("subprocess.run") as run:
+                self.assertEqual(self.detector.detect_hostname(), "my-computer")
+                run.assert_not_called()
+
+    def test_detect_hostname_strips_domain(self):
+        with patch("socket.gethostname", return_value="klaxon.local"):
+            self.assertEqual(self.detector.detect_hostname(), "klaxon")
+
+    def test_detect_hostname_falls_back_to_uname(self):
+        uname = MagicMock(nodename="siku.lan")
+        with patch("socket.gethostname", side_effect=OSError):
+            with patch("os.uname", return_value=uname):
+                self.assertEqual(self.detector.detect_hostname(), "siku")
+
     def test_detect_hostname_success(self):
         mock_result = MagicMock()
         mock_result.returncode = 0
         mock_result.stdout = "my-computer\n"
         
         with patch("subprocess.run", return_value=mock_result):
-            self.assertEqual(self.detector.detect_hostname(), "my-computer")
+            self.assertEqual(self.detector._hostname_from_command(), "my-computer")
 
     def test_detect_hostname_fallback(self):
         mock_result_fail = MagicMock()
@@ -82,7 +108,7 @@ class TestEnvironmentDetector(unittest.TestCase):
         mock_result_success.stdout = "fallback-hostname\n"
         
         with patch("subprocess.run", side_effect=[mock_result_fail, mock_result_success]):
-            self.assertEqual(self.detector.detect_hostname(), "fallback-hostname")
+            self.assertEqual(self.detector._hostname_from_command(), "fallback-hostname")
 
     def test_detect_hostname_failure(self):
         mock_result = MagicMock()
@@ -90,11 +116,11 @@ class TestEnvironmentDetector(unittest.TestCase):
         mock_result.stdout = ""
         
         with patch("subprocess.run", return_value=mock_result):
-            self.assertEqual(self.detector.detect_hostname(), "unknown")
+            self.assertEqual(self.detector._hostname_from_command(), "unknown")
 
     def test_detect_hostname_exception(self):
         with patch("subprocess.run", side_effect=Exception("Test exception")):
-            self.assertEqual(self.detector.detect_hostname(), "unknown")
+            self.assertEqual(self.detector._hostname_from_command(), "unknown")
 
     def test_detect_all_macos(self):
         with patch.object(self.detector, "detect_os", return_value="darwin"):
@@ -147,6 +173,99 @@ class TestEnvironmentDetector(unittest.TestCase):
                         detector.detect()
 
 
+class TestEnvCache(unittest.TestCase):
+    ENV = {"DOTFILES_OS": "linux", "DOTFILES_DISTRO": "arch", "DOTFILES_HOSTNAME": "siku"}
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = os.path.join(self.tmp.name, "dotfiles", "env")
+        self.os_release = os.path.join(self.tmp.name, "os-release")
+        Path(self.os_release).write_text("ID=arch\n")
+        os.utime(self.os_release, (1000, 1000))
+        patcher = patch.object(detect_env, "OS_RELEASE_PATH", self.os_release)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        write_env_cache(self.ENV, self.cache, key="boot:siku")
+        self.assertEqual(read_env_cache(self.cache, key="boot:siku"), self.ENV)
+
+    def test_missing_cache(self):
+        self.assertIsNone(read_env_cache(self.cache, key="boot:siku"))
+
+    def test_other_boot_or_host_invalidates(self):
+        write_env_cache(self.ENV, self.cache, key="boot:siku")
+        self.assertIsNone(read_env_cache(self.cache, key="reboot:siku"))
+
+    def test_newer_os_release_invalidates(self):
+        write_env_cache(self.ENV, self.cache, key="boot:siku")
+        os.utime(self.cache, (2000, 2000))
+        os.utime(self.os_release, (3000, 3000))
+        self.assertIsNone(read_env_cache(self.cache, key="boot:siku"))
+
+    def test_incomplete_cache_is_ignored(self):
+        os.makedirs(os.path.dirname(self.cache))
+        Path(self.cache).write_text("DOTFILES_CACHE_KEY=boot:siku\nDOTFILES_OS=linux\n")
+        self.assertIsNone(read_env_cache(self.cache, key="boot:siku"))
+
+    def test_cached_env_refresh_rewrites(self):
+        with patch.object(detect_env, "env_cache_path", return_value=self.cache):
+            write_env_cache(self.ENV, self.cache)
+            with patch.object(EnvironmentDetector, "to_env_dict") as detect:
+                self.assertEqual(detect_env.cached_env(), self.ENV)
+                detect.assert_not_called()
+                detect.return_value = dict(self.ENV, DOTFILES_HOSTNAME="klaxon")
+                self.assertEqual(detect_env.cached_env(refresh=True)["DOTFILES_HOSTNAME"], "klaxon")
+            self.assertEqual(read_env_cache(self.cache)["DOTFILES_HOSTNAME"], "klaxon")
+
+    def test_shell_script_reads_python_cache(self):
+        script = os.path.join(os.path.dirname(__file__), "..", "scripts", "detect-env.sh")
+        if os.path.exists("/etc/os-release") and os.stat("/etc/os-release").st_mtime > time.time():
+            self.skipTest("/etc/os-release has a future mtime")
+        cache_home = os.path.dirname(os.path.dirname(self.cache))
+        write_env_cache(dict(self.ENV, DOTFILES_HOSTNAME="from-cache"), self.cache)
+        result = subprocess.run(
+            ["bash", "-c", f'source "{script}"; echo "$DOTFILES_HOSTNAME"'],
+            capture_output=True, text=True, env=dict(os.environ, XDG_CACHE_HOME=cache_home),
+        )
+        self.assertEqual(result.stdout.strip(), "from-cache")
+
+
+class TestSharedEnvironment(unittest.TestCase):
+    def setUp(self):
+        self.previous = set_environment(None)
+
+    def tearDown(self):
+        set_environment(self.previous)
+
+    def test_environment_is_immutable(self):
+        env = Environment("linux", "arch", "siku")
+        with self.assertRaises(AttributeError):
+            env.os = "darwin"
+        self.assertFalse(hasattr(env, "__dict__"))
+        self.assertEqual(env.to_env_dict()["DOTFILES_DISTRO"], "arch")
+
+    def test_detects_once(self):
+        with patch.object(EnvironmentDetector, "detect", return_value=("linux", "arch", "siku")) as detect:
+            first = get_environment()
+            self.assertIs(get_environment(), first)
+            detect.assert_called_once()
+
+    def test_detect_os_called_once_per_detect(self):
+        detector = EnvironmentDetector()
+        with patch.object(detector, "detect_os", return_value="darwin") as detect_os:
+            self.assertEqual(detector.environment().distro, "macos")
+            detect_os.assert_called_once()
+
+    def test_override_hook(self):
+        env = Environment("darwin", "macos", "klaxon")
+        set_environment(env)
+        self.assertIs(get_environment(), env)
+
+
 class TestEnvironmentDetectorIntegration(unittest.TestCase):
     def test_detect_current_system(self):
         detector = EnvironmentDetector()
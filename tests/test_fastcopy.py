@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import errno
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import fastcopy
+from fastcopy import copy_file
+
+
+def unsupported(src_fd, dst_fd, size):
+    os.write(dst_fd, b"partial")
+    raise OSError(errno.EOPNOTSUPP, "not here")
+
+
+class TestCopyFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch.dict(fastcopy._unsupported, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def make(self, name, data):
+        with open(self.path(name), "wb") as f:
+            f.write(data)
+        return self.path(name)
+
+    def read(self, name):
+        with open(self.path(name), "rb") as f:
+            return f.read()
+
+    def test_copies_contents_of_any_size(self):
+        for size in (0, 1, 4096, 3 * 1024 * 1024 + 7):
+            data = os.urandom(size)
+            src = self.make(f"src{size}", data)
+            method = copy_file(src, self.path(f"dst{size}"))
+            self.assertIn(method, [name for name, _ in fastcopy.METHODS])
+            self.assertEqual(self.read(f"dst{size}"), data)
+
+    def test_overwrites_existing_destination(self):
+        src = self.make("src", b"short")
+        self.make("dst", b"a much longer previous content")
+        copy_file(src, self.path("dst"))
+        self.assertEqual(self.read("dst"), b"short")
+
+    def test_unsupported_methods_fall_back_and_are_remembered(self):
+        calls = []
+
+        def counting(src_fd, dst_fd, size):
+            calls.append(size)
+            unsupported(src_fd, dst_fd, size)
+
+        methods = [("clone", counting), ("userspace", fastcopy._userspace)]
+        src = self.make("src", b"data\n" * 1000)
+        with patch.object(fastcopy, "METHODS", methods):
+            self.assertEqual(copy_file(src, self.path("a")), "userspace")
+            self.assertEqual(copy_file(src, self.path("b")), "userspace")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.read("a"), b"data\n" * 1000)
+
+    def test_real_errors_are_raised(self):
+        def full(src_fd, dst_fd, size):
+            raise OSError(errno.ENOSPC, "disk full")
+
+        src = self.make("src", b"x")
+        with patch.object(fastcopy, "METHODS", [("clone", full), ("userspace", fastcopy._userspace)]):
+            with self.assertRaises(OSError):
+                copy_file(src, self.path("dst"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from fleet import FleetTarget, home_path, provision, read_targets
+
+PACKAGE_TARGETS = {"bash": "~", "fish": "~/.config"}
+
+
+class FleetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dotfiles = os.path.join(self.tmp.name, "dotfiles")
+        self.make("bash/.bashrc")
+        self.make("fish/fish/config.fish")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make(self, rel, content="x\n"):
+        path = os.path.join(self.dotfiles, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def home(self, name):
+        return os.path.join(self.tmp.name, "homes", name)
+
+    def resolve(self, profile):
+        if profile == "minimal":
+            return ["bash"]
+        if profile in (None, "full"):
+            return ["bash", "fish"]
+        raise ValueError(f"unknown profile {profile}")
+
+
+class TestFleet(FleetTestCase):
+    def test_read_targets(self):
+        path = os.path.join(self.tmp.name, "fleet.txt")
+        with open(path, "w") as f:
+            f.write("# home profile\n/srv/a minimal\n\n'/srv/with space'\n")
+        self.assertEqual(read_targets(path), [FleetTarget("/srv/a", "minimal"), FleetTarget("/srv/with space", None)])
+
+    def test_home_path(self):
+        self.assertEqual(home_path("~", "/h"), "/h")
+        self.assertEqual(home_path("~/.config", "/h"), "/h/.config")
+
+    def test_links_every_home_concurrently(self):
+        targets = [FleetTarget(self.home(f"u{n}"), "full" if n % 2 else "minimal") for n in range(6)]
+        reports = provision(self.dotfiles, targets, self.resolve, PACKAGE_TARGETS, jobs=4)
+        self.assertTrue(all(r.ok for r in reports))
+        self.assertEqual([r.home for r in reports], [t.home for t in targets])
+        for target in targets:
+            self.assertTrue(os.path.islink(os.path.join(target.home, ".bashrc")))
+            self.assertEqual(os.path.realpath(os.path.join(target.home, ".dotfiles")), os.path.realpath(self.dotfiles))
+            fish = os.path.join(target.home, ".config", "fish", "config.fish")
+            self.assertEqual(os.path.isfile(fish), target.profile == "full")
+
+    def test_failures_are_reported_per_target(self):
+        os.makedirs(self.home("busy"))
+        with open(os.path.join(self.home("busy"), ".bashrc"), "w") as f:
+            f.write("local\n")
+        targets = [
+            FleetTarget(self.home("ok"), "minimal"),
+            FleetTarget(self.home("busy"), "minimal"),
+            FleetTarget(self.home("bad"), "nope"),
+        ]
+        reports = provision(self.dotfiles, targets, self.resolve, PACKAGE_TARGETS, jobs=2)
+        self.assertEqual([r.ok for r in reports], [True, False, False])
+        self.assertEqual(reports[1].conflicts, 1)
+        self.assertIn("unknown profile", str(reports[2].error))
+
+    def test_second_run_is_a_no_op(self):
+        targets = [FleetTarget(self.home("a"), None)]
+        provision(self.dotfiles, targets, self.resolve, PACKAGE_TARGETS)
+        reports = provision(self.dotfiles, targets, self.resolve, PACKAGE_TARGETS)
+        self.assertTrue(reports[0].ok)
+        self.assertEqual(reports[0].actions, 0)
+
+    def test_duplicate_homes_are_rejected(self):
+        with self.assertRaises(ValueError):
+            provision(self.dotfiles, [FleetTarget("/a", None), FleetTarget("/a", "x")], self.resolve, PACKAGE_TARGETS)
+
+
+@unittest.skipUnless(hasattr(os, "geteuid") and os.geteuid() == 0, "needs root to own other users' homes")
+class TestFleetAsRoot(FleetTestCase):
+    UID = GID = 54321
+
+    def user_home(self, name):
+        home = self.home(name)
+        os.makedirs(home)
+        os.chown(home, self.UID, self.GID)
+        return home
+
+    def test_created_entries_belong_to_the_home_owner(self):
+        os.chmod(self.tmp.name, 0o755)
+        home = self.user_home("alice")
+        reports = provision(self.dotfiles, [FleetTarget(home, "full")], self.resolve, PACKAGE_TARGETS)
+        self.assertTrue(reports[0].ok, reports[0].error)
+        for rel in (".dotfiles", ".bashrc", ".config", ".config/fish"):
+            st = os.lstat(os.path.join(home, rel))
+            self.assertEqual((st.st_uid, st.st_gid), (self.UID, self.GID), rel)
+
+    def test_unreadable_checkout_fails_the_target(self):
+        os.chmod(self.tmp.name, 0o700)
+        home = self.user_home("bob")
+        reports = provision(self.dotfiles, [FleetTarget(home, "minimal")], self.resolve, PACKAGE_TARGETS)
+        self.assertFalse(reports[0].ok)
+        self.assertIn("not readable by uid 54321", str(reports[0].error))
+        self.assertEqual(os.listdir(home), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import tracing
+from git_ops import GitError, GitRepo, clone, parse_porcelain_z
+
+
+class TestParsePorcelain(unittest.TestCase):
+    def test_modified_and_untracked(self):
+        output = " M bash/.bashrc\0?? fish/new file.fish\0"
+        self.assertEqual(
+            parse_porcelain_z(output),
+            [(" M", "bash/.bashrc"), ("??", "fish/new file.fish")],
+        )
+
+    def test_rename_reports_both_paths(self):
+        output = "R  zsh/.zshrc2\0zsh/.zshrc\0 D tmux/.tmux.conf\0"
+        self.assertEqual(
+            parse_porcelain_z(output),
+            [("R ", "zsh/.zshrc2"), ("R ", "zsh/.zshrc"), (" D", "tmux/.tmux.conf")],
+        )
+
+    def test_empty(self):
+        self.assertEqual(parse_porcelain_z(""), [])
+
+
+class TestGitRepo(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name
+        self.repo = GitRepo(self.path)
+        self.repo.run("init", "-q")
+        self.repo.run("config", "user.email", "test@example.com")
+        self.repo.run("config", "user.name", "Test")
+        self.write("bash/.bashrc", "a\n")
+        self.write("zsh/.zshrc", "a\n")
+        self.repo.run("add", ".")
+        self.repo.run("commit", "-q", "-m", "init")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel, content):
+        path = os.path.join(self.path, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def log(self):
+        return self.repo.run("log", "--format=%s").stdout.split("\n")[0]
+
+    def test_status_limited_to_paths(self):
+        self.write("bash/.bashrc", "b\n")
+        self.write("zsh/.zshrc", "b\n")
+        self.assertEqual(self.repo.status(["bash"]), [(" M", "bash/.bashrc")])
+
+    def test_empty_pathspec_list_reports_nothing(self):
+        self.write("bash/.bashrc", "b\n")
+        self.assertEqual(self.repo.status([]), [])
+
+    def test_commit_paths_leaves_other_changes_alone(self):
+        self.write("bash/.bashrc", "b\n")
+        self.write("zsh/.zshrc", "b\n")
+        changed = self.repo.commit_paths(["bash"], "Update bash")
+        self.assertEqual(changed, ["bash/.bashrc"])
+        self.assertEqual(self.log(), "Update bash")
+        self.assertEqual(self.repo.status(), [(" M", "zsh/.zshrc")])
+
+    def test_commit_paths_adds_untracked_files(self):
+        self.write("bash/.bash_functions", "f\n")
+        self.repo.commit_paths(["bash"], "Add functions")
+        self.assertEqual(self.repo.status(), [])
+
+    def test_commit_message_is_not_shell_interpreted(self):
+        self.write("bash/.bashrc", "b\n")
+        message = "Update dotfiles (arch): it's $HOME `date`"
+        self.repo.commit_paths(["bash"], message)
+        self.assertEqual(self.log(), message)
+
+    def test_nothing_to_commit(self):
+        self.assertEqual(self.repo.commit_paths(["bash"], "noop"), [])
+        self.assertEqual(self.log(), "init")
+
+    def test_errors_raise(self):
+        with self.assertRaises(GitError):
+            self.repo.run("not-a-command")
+
+    def test_no_terminal_input(self):
+        # cat would wait on an inherited terminal; it must see /dev/null.
+        result = self.repo.run("-c", 'alias.ask=!cat; printf %s "$GIT_TERMINAL_PROMPT"', "ask")
+        self.assertEqual(result.stdout, "0")
+
+    def test_hung_command_times_out(self):
+        start = time.perf_counter()
+        with self.assertRaisesRegex(GitError, "timed out"):
+            self.repo.run("-c", "alias.hang=!sleep 30", "hang", timeout=0.5)
+        self.assertLess(time.perf_counter() - start, 10)
+
+    def test_spans_are_named_after_the_subcommand(self):
+        self.write("bash/.bashrc", "b\n")
+        self.write("bash/.bash_functions", "f\n")
+        tracer = tracing.start()
+        try:
+            self.repo.commit_paths(["bash"], "Update bash")
+        finally:
+            tracing.stop()
+        names = [e.name for e in tracer.events if e.category == "git"]
+        self.assertEqual(names, ["git status", "git add", "git commit"])
+
+
+class TestClone(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.upstream = GitRepo(os.path.join(self.tmp.name, "upstream"))
+        os.makedirs(self.upstream.path)
+        self.upstream.run("init", "-q", "-b", "main")
+        self.upstream.run("config", "user.email", "test@example.com")
+        self.upstream.run("config", "user.name", "Test")
+        self.upstream.run("config", "uploadpack.allowFilter", "true")
+        for n in range(3):
+            self.commit(f"bash/.bashrc", f"{n}\n")
+            self.commit(f"zsh/.zshrc", f"{n}\n")
+        self.url = "file://" + self.upstream.path
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def commit(self, rel, content):
+        path = os.path.join(self.upstream.path, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+        self.upstream.run("add", rel)
+        self.upstream.run("commit", "-q", "-m", f"update {rel}")
+
+    def dest(self, name="clone"):
+        return os.path.join(self.tmp.name, name)
+
+    def test_shallow_clone_and_update_stay_shallow(self):
+        repo = clone(self.url, self.dest(), depth=1)
+        self.assertTrue(repo.is_shallow())
+        self.assertEqual(repo.run("rev-list", "--count", "HEAD").stdout.strip(), "1")
+        self.commit("bash/.bashrc", "new\n")
+        before = repo.object_bytes()
+        repo.update()
+        self.assertTrue(repo.is_shallow())
+        self.assertEqual(repo.run("rev-list", "--count", "HEAD").stdout.strip(), "2")
+        self.assertGreater(repo.object_bytes(), before)
+        with open(os.path.join(repo.path, "bash", ".bashrc")) as f:
+            self.assertEqual(f.read(), "new\n")
+
+    def test_sparse_clone_checks_out_selected_dirs(self):
+        repo = clone(self.url, self.dest(), blob_filter="blob:none", sparse=True)
+        repo.sparse_checkout(["bash"])
+        self.assertTrue(repo.is_sparse())
+        self.assertTrue(os.path.exists(os.path.join(repo.path, "bash", ".bashrc")))
+        self.assertFalse(os.path.exists(os.path.join(repo.path, "zsh")))
+
+    def test_clone_failure_raises(self):
+        with self.assertRaises(GitError):
+            clone("file://" + self.dest("missing"), self.dest())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import linker as linker_module
+from journal import Journal, read_records, rollback, runs, undo, unfinished
+from linker import Action, Linker
+
+
+def write(path, text="x\n"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def snapshot(root):
+    """Every path under root with its link destination or file contents."""
+    state = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root)
+            if os.path.islink(path):
+                state[rel] = ("link", os.readlink(path))
+            elif os.path.isdir(path):
+                state[rel] = ("dir",)
+            else:
+                state[rel] = ("file", read(path))
+    return state
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.repo = os.path.join(self.tmp.name, "repo")
+        self.home = os.path.join(self.tmp.name, "home")
+        self.journals = os.path.join(self.tmp.name, "journal")
+        write(os.path.join(self.repo, "bash", ".bashrc"), "repo bashrc\n")
+        write(os.path.join(self.repo, "git", ".gitconfig"), "repo gitconfig\n")
+        write(os.path.join(self.repo, "nvim", ".config", "nvim", "init.lua"), "init\n")
+        write(os.path.join(self.repo, "fish", ".config", "fish", "config.fish"), "fish\n")
+        write(os.path.join(self.home, ".bashrc"), "local bashrc\n")
+        os.makedirs(os.path.join(self.home, ".config"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def linker(self, packages=("bash", "git", "nvim", "fish")):
+        linker = Linker(self.repo, adopt=True, journal=Journal.start(self.journals))
+        linker.plan((p, self.home) for p in packages)
+        return linker
+
+    def test_apply_then_rollback_restores_home_and_repo(self):
+        home_before, repo_before = snapshot(self.home), snapshot(self.repo)
+        linker = self.linker()
+        done = linker.apply()
+        linker.journal.close()
+        self.assertEqual(linker.errors, [])
+        self.assertIn(os.path.join(self.repo, "bash", ".bashrc"), linker.adopted(done))
+        self.assertEqual(read(os.path.join(self.repo, "bash", ".bashrc")), "local bashrc\n")
+        self.assertTrue(os.path.islink(os.path.join(self.home, ".bashrc")))
+
+        result = rollback(directory=self.journals)
+        self.assertEqual(result.run, linker.journal.run)
+        self.assertEqual(result.undone, len(done))
+        self.assertEqual(snapshot(self.home), home_before)
+        self.assertEqual(snapshot(self.repo), repo_before)
+        self.assertFalse(os.path.exists(linker.journal.saved_dir))
+        # Already rolled back: nothing left to undo.
+        self.assertIsNone(rollback(directory=self.journals))
+
+    def test_failed_package_is_undone_and_others_kept(self):
+        real = linker_module.apply_action
+
+        def flaky(action):
+            if action.package == "nvim" and action.op == "link":
+                raise PermissionError(13, "Permission denied", action.path)
+            return real(action)
+
+        # nvim and fish share ~/.config, so nvim's links come after fish's unfold.
+        linker = self.linker()
+        with mock.patch.object(linker_module, "apply_action", flaky):
+            done = linker.apply()
+        linker.journal.close()
+        self.assertEqual([a.package for a, _ in linker.errors], ["nvim"])
+        self.assertNotIn("nvim", {a.package for a in done})
+        self.assertFalse(os.path.lexists(os.path.join(self.home, ".config", "nvim")))
+        self.assertTrue(os.path.islink(os.path.join(self.home, ".gitconfig")))
+        ops = [r["op"] for r in read_records(self.journals, linker.journal.run)]
+        self.assertIn("abort", ops)
+        self.assertEqual(ops.count("commit"), 3)
+
+    def test_failed_mkdir_keeps_a_directory_it_did_not_create(self):
+        journal = Journal.start(self.journals)
+        made = os.path.join(self.home, ".local")
+        existing = os.path.join(self.home, ".config")
+        actions = [Action("mkdir", "local", made), Action("mkdir", "local", existing)]
+        done, failure = journal.apply_package("local", actions, linker_module.apply_action)
+        journal.close()
+        self.assertEqual(done, [])
+        self.assertEqual(failure[0], actions[1])
+        self.assertIsInstance(failure[1], FileExistsError)
+        self.assertFalse(os.path.exists(made))
+        self.assertTrue(os.path.isdir(existing))
+
+    def test_interrupted_run_is_recovered_on_next_start(self):
+        home_before, repo_before = snapshot(self.home), snapshot(self.repo)
+        linker = self.linker(["bash"])
+        actions = list(linker.actions)
+        journal = linker.journal
+
+        def crash(action):
+            linker_module.apply_action(action)
+            if action.op == "adopt":
+                raise KeyboardInterrupt
+
+        # Simulate a kill after the adopt: no commit, no end record.
+        with self.assertRaises(KeyboardInterrupt):
+            journal.apply_package("bash", actions, crash)
+        journal._file.close()
+        self.assertFalse(os.path.lexists(os.path.join(self.home, ".bashrc")))
+
+        with mock.patch("journal._alive", return_value=False):
+            self.assertEqual(unfinished(self.journals), [journal.run])
+            Journal.start(self.journals).close()
+            self.assertEqual(unfinished(self.journals), [])
+        self.assertEqual(snapshot(self.home), home_before)
+        self.assertEqual(snapshot(self.repo), repo_before)
+
+    def test_undo_skips_paths_changed_since(self):
+        linker = self.linker(["git"])
+        linker.apply()
+        linker.journal.close()
+        link = os.path.join(self.home, ".gitconfig")
+        os.unlink(link)
+        write(link, "replaced by hand\n")
+        result = undo(self.journals, linker.journal.run)
+        self.assertEqual((result.undone, result.skipped), (0, 1))
+        self.assertEqual(read(link), "replaced by hand\n")
+
+    def test_intents_are_written_before_actions(self):
+        linker = self.linker(["git"])
+        seen = []
+        journal = linker.journal
+
+        def check(action):
+            records = read_records(self.journals, journal.run)
+            seen.append([r["op"] for r in records if r.get("path") == action.path])
+            linker_module.apply_action(action)
+
+        journal.apply_package("git", linker.actions, check)
+        journal.close()
+        self.assertEqual(seen, [["link"]])
+        with open(journal.path) as f:
+            self.assertEqual([json.loads(line)["op"] for line in f], ["begin", "link", "commit", "end"])
+        self.assertEqual(runs(self.journals), [journal.run])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from linker import IgnoreRules, Linker, DEFAULT_IGNORE
+
+
+class LinkerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.stow_dir = os.path.join(self.tmp.name, "dotfiles")
+        self.home = os.path.join(self.tmp.name, "home")
+        os.makedirs(self.stow_dir)
+        os.makedirs(self.home)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make(self, root, rel, content="x\n"):
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def stow(self, *packages, adopt=False):
+        linker = Linker(self.stow_dir, adopt=adopt)
+        linker.plan((p, self.home) for p in packages)
+        linker.apply()
+        return linker
+
+    def home_path(self, rel):
+        return os.path.join(self.home, rel)
+
+
+class TestLinker(LinkerTestCase):
+    def test_links_top_level_file_relatively(self):
+        self.make(self.stow_dir, "bash/.bashrc")
+        self.stow("bash")
+        link = self.home_path(".bashrc")
+        self.assertTrue(os.path.islink(link))
+        self.assertEqual(os.readlink(link), os.path.join("..", "dotfiles", "bash", ".bashrc"))
+
+    def test_folds_missing_directory(self):
+        self.make(self.stow_dir, "fish/.config/fish/config.fish")
+        self.stow("fish")
+        self.assertTrue(os.path.islink(self.home_path(".config")))
+
+    def test_descends_into_existing_directory(self):
+        os.makedirs(self.home_path(".config"))
+        self.make(self.stow_dir, "fish/.config/fish/config.fish")
+        self.stow("fish")
+        self.assertFalse(os.path.islink(self.home_path(".config")))
+        self.assertTrue(os.path.islink(self.home_path(".config/fish")))
+
+    def test_unfolds_directory_shared_by_two_packages(self):
+        self.make(self.stow_dir, "fish/.config/fish/config.fish")
+        self.make(self.stow_dir, "nushell/.config/nushell/config.nu")
+        linker = self.stow("fish", "nushell")
+        self.assertEqual(linker.conflicts, [])
+        self.assertFalse(os.path.islink(self.home_path(".config")))
+        self.assertTrue(os.path.islink(self.home_path(".config/fish")))
+        self.assertTrue(os.path.islink(self.home_path(".config/nushell")))
+        self.assertTrue(os.path.isfile(self.home_path(".config/fish/config.fish")))
+
+    def test_unfolds_links_from_previous_run(self):
+        self.make(self.stow_dir, "fish/.config/fish/config.fish")
+        self.make(self.stow_dir, "nushell/.config/nushell/config.nu")
+        self.stow("fish")
+        self.assertTrue(os.path.islink(self.home_path(".config")))
+        self.stow("nushell")
+        self.assertFalse(os.path.islink(self.home_path(".config")))
+        self.assertTrue(os.path.isfile(self.home_path(".config/fish/config.fish")))
+        self.assertTrue(os.path.isfile(self.home_path(".config/nushell/config.nu")))
+
+    def test_second_run_is_a_no_op(self):
+        self.make(self.stow_dir, "bash/.bashrc")
+        self.make(self.stow_dir, "fish/.config/fish/config.fish")
+        self.stow("bash", "fish")
+        linker = Linker(self.stow_dir)
+        self.assertEqual(linker.plan([("bash", self.home), ("fish", self.home)]), [])
+        self.assertEqual(len(linker.satisfied), 2)
+
+    def test_conflict_on_existing_file_skips_whole_package(self):
+        self.make(self.stow_dir, "bash/.bashrc")
+        self.make(self.stow_dir, "bash/.bash_profile")
+        self.make(self.home, ".bashrc", "local\n")
+        linker = self.stow("bash")
+        self.assertEqual(len(linker.conflicts), 1)
+        self.assertEqual(linker.conflicts[0].path, self.home_path(".bashrc"))
+        self.assertFalse(os.path.lexists(self.home_path(".bash_profile")))
+
+    def test_foreign_symlink_is_a_conflict(self):
+        self.make(self.stow_dir, "bash/.bashrc")
+        os.symlink("/etc/hostname", self.home_path(".bashrc"))
+        linker = self.stow("bash")
+        self.assertEqual(linker.conflicts[0].reason, "existing symlink is not owned by stow")
+
+    def test_adopt_moves_target_into_package(self):
+        source = self.make(self.stow_dir, "bash/.bashrc", "repo\n")
+        self.make(self.home, ".bashrc", "local\n")
+        linker = self.stow("bash", adopt=True)
+        self.assertEqual(linker.conflicts, [])
+        self.assertEqual(linker.adopted(), [source])
+        self.assertTrue(os.path.islink(self.home_path(".bashrc")))
+        with open(source) as f:
+            self.assertEqual(f.read(), "local\n")
+
+    def test_stale_owned_link_is_replaced(self):
+        self.make(self.stow_dir, "bash/.bashrc")
+        os.symlink(os.path.join(self.stow_dir, "bash", ".gone"), self.home_path(".bashrc"))
+        linker = self.stow("bash")
+        self.assertEqual(linker.conflicts, [])
+        self.assertTrue(os.path.isfile(self.home_path(".bashrc")))
+
+    def test_missing_package_is_reported(self):
+        linker = self.stow("nope")
+        self.assertEqual(linker.conflicts[0].reason, "package not found")
+
+    def test_apply_parallel_matches_serial_layout(self):
+        self.make(self.stow_dir, "bash/.bashrc")
+        self.make(self.stow_dir, "fish/.config/fish/config.fish")
+        self.make(self.stow_dir, "nushell/.config/nushell/config.nu")
+        linker = Linker(self.stow_dir)
+        linker.plan((p, self.home) for p in ("bash", "fish", "nushell"))
+        results = linker.apply_parallel(jobs=3)
+        self.assertTrue(all(r.ok for r in results))
+        self.assertTrue(os.path.islink(self.home_path(".bashrc")))
+        self.assertFalse(os.path.islink(self.home_path(".config")))
+        self.assertTrue(os.path.isfile(self.home_path(".config/fish/config.fish")))
+        self.assertTrue(os.path.isfile(self.home_path(".config/nushell/config.nu")))
+
+    def test_missing_target_directory_is_reported(self):
+        self.make(self.stow_dir, "fish/.config/fish/config.fish")
+        linker = Linker(self.stow_dir)
+        linker.plan([("fish", self.home_path(".config"))])
+        self.assertEqual(linker.actions, [])
+        self.assertEqual(linker.conflicts[0].reason, "target directory does not exist")
+
+    def test_local_ignore_file(self):
+        self.make(self.stow_dir, "tmux/.tmux.conf")
+        self.make(self.stow_dir, "tmux/.DS_Store")
+        self.make(self.stow_dir, "tmux/.stow-local-ignore", "# macOS\n\\.DS_Store\n")
+        self.stow("tmux")
+        self.assertTrue(os.path.islink(self.home_path(".tmux.conf")))
+        self.assertFalse(os.path.lexists(self.home_path(".DS_Store")))
+        self.assertFalse(os.path.lexists(self.home_path(".stow-local-ignore")))
+
+
+class TestIgnoreRules(unittest.TestCase):
+    def test_default_ignores(self):
+        rules = IgnoreRules(DEFAULT_IGNORE)
+        self.assertTrue(rules.matches("/.git", ".git"))
+        self.assertTrue(rules.matches("/README.md", "README.md"))
+        self.assertTrue(rules.matches("/a/b~", "b~"))
+        self.assertFalse(rules.matches("/docs/README.md", "README.md"))
+        self.assertFalse(rules.matches("/.bashrc", ".bashrc"))
+
+    def test_segment_patterns_match_whole_name(self):
+        rules = IgnoreRules([r"\.git"])
+        self.assertTrue(rules.matches("/.git", ".git"))
+        self.assertFalse(rules.matches("/.gitconfig", ".gitconfig"))
+
+
+if __name__ == "__main__":
+    unittest.main()
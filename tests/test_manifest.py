@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import manifest as manifest_module
+from detect_env import Environment
+from manifest import MANIFEST_PATH, ManifestError, compile_manifest, packages_for, parse_manifest
+
+REPO_ROOT = os.path.dirname(MANIFEST_PATH)
+
+
+class TestShippedManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest = compile_manifest(MANIFEST_PATH, os.path.join(self.tmp.name, "packages.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_platform_package_sets(self):
+        self.assertEqual(
+            self.manifest.select(Environment("darwin", "macos", "mac")),
+            ["bash", "zsh", "tmux", "wezterm", "brew", "starship", "neovim", "opencode", "fish", "ghostty", "vscodium"],
+        )
+        self.assertEqual(
+            self.manifest.select(Environment("linux", "arch", "siku")),
+            ["bash", "zsh", "tmux", "starship", "neovim", "opencode", "fish", "nushell"],
+        )
+
+    def test_unknown_os_gets_every_package(self):
+        self.assertEqual(self.manifest.select(Environment("freebsd", "unknown", "bsd")), self.manifest.names())
+
+    def test_files_exist_in_packages(self):
+        for package in self.manifest.packages.values():
+            for file in package.files:
+                path = os.path.join(REPO_ROOT, package.name, file)
+                self.assertTrue(os.path.lexists(path), f"{package.name}: {file} is not in the package")
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "packages.toml")
+        self.cache = os.path.join(self.tmp.name, "cache", "packages.json")
+        self.write(
+            '[packages.bash]\nfiles = [".bashrc"]\n'
+            '[packages.brew]\nos = ["darwin"]\n'
+            '[packages.lab]\nhosts = ["lab-*"]\ndistro = ["ubuntu"]\n'
+            '[packages.nu]\nos = ["linux"]\n'
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text):
+        with open(self.path, "w") as f:
+            f.write(text)
+
+    def test_selectors(self):
+        manifest = compile_manifest(self.path, self.cache)
+        self.assertEqual(manifest.select(Environment("linux", "ubuntu", "lab-3")), ["bash", "lab", "nu"])
+        self.assertEqual(manifest.select(Environment("linux", "arch", "lab-3")), ["bash", "nu"])
+        self.assertEqual(manifest.select(Environment("darwin", "macos", "mac")), ["bash", "brew"])
+        self.assertEqual(manifest.resolve("linux"), ["bash", "lab", "nu"])
+        self.assertEqual(manifest.resolve("freebsd"), ["bash", "brew", "lab", "nu"])
+        self.assertEqual(manifest.targets(), {"bash": "~", "brew": "~", "lab": "~", "nu": "~"})
+
+    def test_cache_is_reused_until_the_manifest_changes(self):
+        compile_manifest(self.path, self.cache)
+        with patch.object(manifest_module.tomllib, "load", side_effect=AssertionError("parsed again")):
+            compile_manifest(self.path, self.cache)
+
+        self.write('[packages.zsh]\nfiles = [".zshrc"]\n')
+        os.utime(self.path, ns=(1, 1))
+        self.assertEqual(compile_manifest(self.path, self.cache).names(), ["zsh"])
+
+    def test_host_lookups_are_persisted(self):
+        env = Environment("linux", "ubuntu", "lab-1")
+        with patch.object(manifest_module, "manifest_cache_path", return_value=self.cache), \
+                patch.dict(manifest_module._manifests, clear=True):
+            self.assertEqual(packages_for(env, self.path), ["bash", "lab", "nu"])
+        with open(self.cache) as f:
+            self.assertEqual(json.load(f)["index"], {"linux\tubuntu\tlab-1": ["bash", "lab", "nu"]})
+
+    def test_invalid_manifests(self):
+        with self.assertRaises(ManifestError):
+            parse_manifest({})
+        with self.assertRaises(ManifestError):
+            parse_manifest({"packages": {"bash": {"file": [".bashrc"]}}})
+        with self.assertRaises(ManifestError):
+            parse_manifest({"packages": {"bash": {"os": "linux"}}})
+        self.write("[packages.bash\n")
+        with self.assertRaises(ManifestError):
+            compile_manifest(self.path, self.cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from parallel import group_packages, paths_overlap, run_packages
+
+
+class TestPathsOverlap(unittest.TestCase):
+    def test_same_path(self):
+        self.assertTrue(paths_overlap("/h/.config", "/h/.config/"))
+
+    def test_nested_paths(self):
+        self.assertTrue(paths_overlap("/h/.config", "/h/.config/fish"))
+        self.assertTrue(paths_overlap("/h/.config/fish", "/h/.config"))
+
+    def test_sibling_prefix_is_not_overlap(self):
+        self.assertFalse(paths_overlap("/h/.config/fish", "/h/.config/fish2"))
+
+
+class TestGroupPackages(unittest.TestCase):
+    def test_disjoint_packages_get_own_groups(self):
+        roots = {"bash": ["/h/.bashrc"], "zsh": ["/h/.zshrc"], "fish": ["/h/.config/fish"]}
+        self.assertEqual(group_packages(["bash", "zsh", "fish"], roots), [["bash"], ["zsh"], ["fish"]])
+
+    def test_shared_root_is_serialized(self):
+        roots = {
+            "ghostty": ["/h/Library/Application Support"],
+            "vscodium": ["/h/Library/Application Support"],
+            "bash": ["/h/.bashrc"],
+        }
+        groups = group_packages(["ghostty", "bash", "vscodium"], roots)
+        self.assertIn(["ghostty", "vscodium"], groups)
+        self.assertIn(["bash"], groups)
+
+    def test_nested_roots_with_spaced_sibling(self):
+        roots = {
+            "a": ["/h/Library/Application Support"],
+            "b": ["/h/Library/Application Support 2"],
+            "c": ["/h/Library/Application Support/VSCodium/User"],
+        }
+        groups = group_packages(["a", "b", "c"], roots)
+        self.assertIn(["a", "c"], groups)
+        self.assertIn(["b"], groups)
+
+    def test_transitive_overlap(self):
+        roots = {"a": ["/h/x"], "b": ["/h/x/y", "/h/z"], "c": ["/h/z/w"]}
+        self.assertEqual(group_packages(["a", "b", "c"], roots), [["a", "b", "c"]])
+
+    def test_packages_without_roots(self):
+        self.assertEqual(group_packages(["a", "b"], {}), [["a"], ["b"]])
+
+
+class TestRunPackages(unittest.TestCase):
+    def test_results_in_input_order(self):
+        results = run_packages(["c", "a", "b"], str.upper, jobs=3)
+        self.assertEqual([r.package for r in results], ["c", "a", "b"])
+        self.assertEqual([r.value for r in results], ["C", "A", "B"])
+
+    def test_errors_are_collected(self):
+        def work(package):
+            if package == "bad":
+                raise RuntimeError("boom")
+            return package
+
+        results = run_packages(["good", "bad"], work, jobs=2)
+        self.assertTrue(results[0].ok)
+        self.assertFalse(results[1].ok)
+        self.assertEqual(str(results[1].error), "boom")
+
+    def test_independent_groups_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+        results = run_packages(["a", "b"], lambda p: barrier.wait(), jobs=2)
+        self.assertTrue(all(r.ok for r in results))
+
+    def test_overlapping_packages_run_serially(self):
+        lock = threading.Lock()
+        active = []
+
+        def work(package):
+            with lock:
+                active.append(package)
+                concurrent = len(active)
+            threading.Event().wait(0.02)
+            with lock:
+                active.remove(package)
+            return concurrent
+
+        roots = {"ghostty": ["/h/Library"], "vscodium": ["/h/Library/VSCodium"]}
+        results = run_packages(["ghostty", "vscodium"], work, roots, jobs=2)
+        self.assertEqual([r.value for r in results], [1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
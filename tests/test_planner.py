@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from planner import Plan
+
+
+class TestPlan(unittest.TestCase):
+    def setUp(self):
+        self.plan = Plan()
+        self.calls = []
+        self.plan.on_apply("backup", lambda steps: self.calls.append(("backup", [s.target for s in steps])))
+        self.plan.on_apply("link", lambda steps: self.calls.append(("link", [s.target for s in steps])))
+
+    def test_apply_passes_only_pending_steps(self):
+        self.plan.add("backup", "snapshot", "~/.bashrc", "bash")
+        self.plan.add("backup", "snapshot", "~/.zshrc", "zsh", satisfied=True)
+        self.plan.apply()
+        self.assertEqual(self.calls, [("backup", ["~/.bashrc"])])
+
+    def test_fully_satisfied_phase_is_skipped(self):
+        self.plan.add("backup", "snapshot", "~/.bashrc", "bash", satisfied=True)
+        self.plan.add("link", "link", "~/.bashrc", "bash")
+        self.assertEqual(self.plan.apply(), ["link"])
+        self.assertEqual(self.calls, [("link", ["~/.bashrc"])])
+
+    def test_conflicts_are_never_executed(self):
+        self.plan.add("link", "conflict", "~/.bashrc", "bash", "existing target is not owned by stow")
+        self.assertEqual(self.plan.apply(), [])
+        self.assertEqual(len(self.plan.conflicts()), 1)
+
+    def test_phases_run_in_first_added_order(self):
+        plan = Plan()
+        order = []
+        plan.add("git", "commit", "repo")
+        plan.add("brew", "dump", "Brewfile")
+        plan.on_apply("brew", lambda steps: order.append("brew"))
+        plan.on_apply("git", lambda steps: order.append("git"))
+        plan.apply()
+        self.assertEqual(order, ["git", "brew"])
+
+    def test_format_marks_step_states(self):
+        first = self.plan.add("backup", "snapshot", "~/.bashrc", "bash")
+        self.plan.add("link", "link", "~/.bashrc", "bash", depends_on=[first.id])
+        self.plan.add("link", "link", "~/.zshrc", "zsh", satisfied=True)
+        self.plan.add("link", "conflict", "~/.tmux.conf", "tmux", "existing target is a directory")
+        text = self.plan.format()
+        self.assertIn("+ #1 snapshot [bash] ~/.bashrc", text)
+        self.assertIn("after #1", text)
+        self.assertIn("= #3", text)
+        self.assertIn("! #4", text)
+        self.assertIn("2 pending steps, 1 conflicts", text)
+
+    def test_to_json(self):
+        self.plan.add("backup", "snapshot", "~/.bashrc", "bash")
+        data = json.loads(self.plan.to_json())
+        self.assertEqual(data["steps"][0]["kind"], "snapshot")
+        self.assertFalse(data["steps"][0]["satisfied"])
+
+
+
+class TestConcurrentApply(unittest.TestCase):
+    def test_independent_phases_overlap(self):
+        plan = Plan()
+        plan.add("brew", "dump", "Brewfile")
+        plan.add("backup", "snapshot", "~/.bashrc", "bash")
+        both_running = threading.Barrier(2, timeout=5)
+        plan.on_apply("brew", lambda steps: both_running.wait())
+        plan.on_apply("backup", lambda steps: both_running.wait())
+        self.assertEqual(plan.apply(concurrent=True), ["brew", "backup"])
+
+    def test_dependent_phase_waits(self):
+        plan = Plan()
+        order = []
+        backup = plan.add("backup", "snapshot", "~/.bashrc", "bash")
+        plan.add("link", "link", "~/.bashrc", "bash", depends_on=[backup.id])
+        plan.on_apply("backup", lambda steps: (time.sleep(0.2), order.append("backup")))
+        plan.on_apply("link", lambda steps: order.append("link"))
+        self.assertEqual(plan.phase_dependencies("link"), ["backup"])
+        plan.apply(concurrent=True)
+        self.assertEqual(order, ["backup", "link"])
+
+    def test_failure_skips_dependents(self):
+        plan = Plan()
+        calls = []
+        repo = plan.add("repo", "clone", "~/.dotfiles")
+        plan.add("link", "stow", "~", depends_on=[repo.id])
+        plan.add("brew", "install", "homebrew")
+
+        def fail(steps):
+            raise RuntimeError("clone failed")
+
+        plan.on_apply("repo", fail)
+        plan.on_apply("link", lambda steps: calls.append("link"))
+        plan.on_apply("brew", lambda steps: calls.append("brew"))
+        with self.assertRaises(RuntimeError):
+            plan.apply(concurrent=True)
+        self.assertEqual(calls, ["brew"])
+
+if __name__ == "__main__":
+    unittest.main()
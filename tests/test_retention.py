@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from retention import Policy, apply_retention, parse_size, plan_retention, select
+from snapshot_store import SnapshotStore
+
+START = datetime(2025, 3, 10, 12, 0)
+
+
+class TestSelect(unittest.TestCase):
+    def snapshots(self, hours):
+        return [(f"s{h:03d}", START - timedelta(hours=h)) for h in hours]
+
+    def test_no_rules_keeps_everything(self):
+        snaps = self.snapshots([0, 1, 2])
+        self.assertEqual(sorted(select(snaps, Policy())), ["s000", "s001", "s002"])
+
+    def test_keep_last_and_buckets(self):
+        # Every 6 hours for 10 days, newest first.
+        snaps = self.snapshots(range(0, 240, 6))
+        kept = select(snaps, Policy(keep_last=2, daily=3, weekly=2))
+        self.assertEqual(kept["s000"], ["last", "daily", "weekly"])
+        self.assertEqual(kept["s006"], ["last"])
+        # Newest of 2025-03-09 and 2025-03-08; the 9th is a Sunday, which
+        # also makes s018 the newest of the previous ISO week.
+        self.assertEqual(kept["s018"], ["daily", "weekly"])
+        self.assertEqual(kept["s042"], ["daily"])
+        self.assertEqual(len(kept), 4)
+
+    def test_hourly(self):
+        snaps = [("a", START + timedelta(minutes=30)), ("b", START + timedelta(minutes=10)), ("c", START - timedelta(hours=1))]
+        self.assertEqual(sorted(select(snaps, Policy(hourly=5))), ["a", "c"])
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("512"), 512)
+        self.assertEqual(parse_size("2K"), 2048)
+        self.assertEqual(parse_size("1.5GiB"), 1536 * 1024 ** 2)
+        with self.assertRaises(ValueError):
+            parse_size("lots")
+
+
+class TestPlanRetention(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.home = os.path.join(self.tmp.name, "home")
+        os.makedirs(self.home)
+        self.store = SnapshotStore(os.path.join(self.tmp.name, "backup"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def snapshot(self, name, days_ago, files):
+        entries = []
+        for rel, content in files.items():
+            with open(os.path.join(self.home, rel), "w") as f:
+                f.write(content)
+            collected, _ = self.store.collect("bash", self.home, rel)
+            entries.extend(collected)
+        created = (START - timedelta(days=days_ago)).isoformat(timespec="seconds")
+        self.store.write_snapshot(name, entries, {"created": created})
+        return {e["path"]: e["digest"] for e in entries}
+
+    def test_shared_objects_survive(self):
+        old = self.snapshot("old", 2, {".bashrc": "shared\n", ".inputrc": "old only\n"})
+        new = self.snapshot("new", 1, {".bashrc": "shared\n"})
+        plan = plan_retention(self.store, Policy(keep_last=1))
+        self.assertEqual(plan.keep, ["new"])
+        self.assertEqual(plan.remove, ["old"])
+        self.assertEqual(plan.doomed, {old[".inputrc"]})
+
+        apply_retention(self.store, plan)
+        self.assertEqual(self.store.snapshot_names(), ["new"])
+        self.assertTrue(self.store.has_object(new[".bashrc"]))
+        self.assertFalse(self.store.has_object(old[".inputrc"]))
+
+    def test_max_size_drops_oldest_but_never_newest(self):
+        self.snapshot("a", 3, {".bashrc": "a" * 1000})
+        self.snapshot("b", 2, {".bashrc": "b" * 1000})
+        self.snapshot("c", 1, {".bashrc": "c" * 1000})
+        total = plan_retention(self.store, Policy()).size_before
+        plan = plan_retention(self.store, Policy(max_size=total - 1))
+        self.assertEqual(plan.remove, ["a"])
+        self.assertLess(plan.size_after, total)
+
+        plan = plan_retention(self.store, Policy(max_size=10))
+        self.assertEqual(plan.keep, ["c"])
+        self.assertEqual(plan.freed, plan.size_before - plan.size_after)
+
+    def test_dry_run_changes_nothing(self):
+        self.snapshot("old", 2, {".bashrc": "1\n"})
+        self.snapshot("new", 1, {".bashrc": "2\n"})
+        plan = plan_retention(self.store, Policy(keep_last=1))
+        self.assertGreater(plan.freed, 0)
+        self.assertEqual(self.store.snapshot_names(), ["new", "old"])
+
+    def test_archived_snapshots_free_their_archive(self):
+        with open(os.path.join(self.home, ".bashrc"), "w") as f:
+            f.write("x\n")
+        entries, archive = self.store.archive("old", [("bash", self.home, ".bashrc", None)], "xz")
+        created = (START - timedelta(days=5)).isoformat(timespec="seconds")
+        self.store.write_snapshot("old", entries, {"archive": archive, "created": created})
+        self.snapshot("new", 1, {".bashrc": "y\n"})
+
+        plan = plan_retention(self.store, Policy(keep_last=1))
+        self.assertEqual(plan.remove, ["old"])
+        archive_path = os.path.join(self.store.archives_dir, archive["file"])
+        self.assertGreaterEqual(plan.freed, os.path.getsize(archive_path))
+        apply_retention(self.store, plan)
+        self.assertFalse(os.path.exists(archive_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
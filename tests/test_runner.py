@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from runner import CommandError, run, run_all
+
+PY = sys.executable
+
+
+class TestRun(unittest.TestCase):
+    def test_success_captures_output(self):
+        result = run([PY, "-c", "print('out'); import sys; print('err', file=sys.stderr)"])
+        self.assertTrue(result.ok)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, "out\n")
+        self.assertEqual(result.stderr, "err\n")
+        self.assertGreater(result.duration, 0)
+
+    def test_failure_keeps_stderr(self):
+        result = run([PY, "-c", "import sys; sys.exit('broken')"])
+        self.assertFalse(result.ok)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("broken", result.stderr)
+        with self.assertRaises(CommandError) as ctx:
+            run([PY, "-c", "import sys; sys.exit('broken')"], check=True)
+        self.assertIn("exited 1: broken", str(ctx.exception))
+
+    def test_timeout_kills_the_command(self):
+        start = time.perf_counter()
+        result = run([PY, "-c", "print('started', flush=True); import time; time.sleep(30)"], timeout=0.5)
+        self.assertLess(time.perf_counter() - start, 10)
+        self.assertTrue(result.timed_out)
+        self.assertFalse(result.ok)
+        self.assertEqual(result.stdout, "started\n")
+
+    def test_detached_timeout_kills_children_holding_the_pipes(self):
+        start = time.perf_counter()
+        result = run(["sh", "-c", "sleep 30 & wait"], timeout=0.5, detach=True)
+        self.assertLess(time.perf_counter() - start, 10)
+        self.assertTrue(result.timed_out)
+
+    def test_missing_executable_is_a_result(self):
+        result = run(["/nonexistent/tool", "--version"])
+        self.assertFalse(result.ok)
+        self.assertIsNone(result.returncode)
+
+    def test_streams_lines_as_they_arrive(self):
+        lines = []
+        script = "import sys\nfor i in range(3): print(i, flush=True)\nprint('done', file=sys.stderr)"
+        run([PY, "-c", script], stream=lambda line, is_stderr: lines.append((line, is_stderr)))
+        self.assertEqual([l for l in lines if not l[1]], [("0", False), ("1", False), ("2", False)])
+        self.assertIn(("done", True), lines)
+
+    def test_input(self):
+        result = run([PY, "-c", "import sys; print(sys.stdin.read().upper())"], input="abc")
+        self.assertEqual(result.stdout, "ABC\n")
+
+
+class TestRunAll(unittest.TestCase):
+    def test_runs_concurrently_in_input_order(self):
+        commands = [[PY, "-c", f"import time; time.sleep(0.4); print({i})"] for i in range(4)]
+        start = time.perf_counter()
+        results = run_all(commands)
+        elapsed = time.perf_counter() - start
+        self.assertEqual([r.stdout for r in results], ["0\n", "1\n", "2\n", "3\n"])
+        self.assertLess(elapsed, 1.4)
+
+    def test_limit(self):
+        commands = [[PY, "-c", "import time; time.sleep(0.3)"] for _ in range(3)]
+        start = time.perf_counter()
+        run_all(commands, limit=1)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import snapshot_store
+from snapshot_store import SnapshotStore, hash_file
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.home = os.path.join(self.tmp.name, "home")
+        self.store = SnapshotStore(os.path.join(self.tmp.name, "backup"))
+        os.makedirs(os.path.join(self.home, ".config", "fish", "conf.d"))
+        self._write(".bashrc", "export FOO=1\n")
+        self._write(".config/fish/config.fish", "set -gx EDITOR nvim\n")
+        self._write(".config/fish/conf.d/00-env.fish", "set -gx LANG en_US.UTF-8\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, rel, content):
+        with open(os.path.join(self.home, rel), "w") as f:
+            f.write(content)
+
+    def _read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_collect_file(self):
+        entries, written = self.store.collect("bash", self.home, ".bashrc")
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]["path"], ".bashrc")
+        self.assertEqual(entries[0]["digest"], hash_file(os.path.join(self.home, ".bashrc")))
+        self.assertEqual(written, len("export FOO=1\n"))
+        self.assertTrue(self.store.has_object(entries[0]["digest"]))
+
+    def test_collect_directory(self):
+        entries, _ = self.store.collect("fish", self.home, ".config/fish")
+        paths = sorted(e["path"] for e in entries)
+        self.assertEqual(paths, [".config/fish/conf.d/00-env.fish", ".config/fish/config.fish"])
+
+    def test_unchanged_content_is_not_rewritten(self):
+        _, first = self.store.collect("fish", self.home, ".config/fish")
+        _, second = self.store.collect("fish", self.home, ".config/fish")
+        self.assertGreater(first, 0)
+        self.assertEqual(second, 0)
+
+    def test_object_matches_digest_when_file_changes_during_backup(self):
+        source = os.path.join(self.home, ".bashrc")
+        real_copy = snapshot_store.copy_file
+
+        def edited_meanwhile(src, dst):
+            with open(src, "a") as f:
+                f.write("export BAR=2\n")
+            return real_copy(src, dst)
+
+        with mock.patch.object(snapshot_store, "copy_file", edited_meanwhile):
+            digest, _ = self.store.put_file(source)
+        self.assertEqual(hash_file(self.store.object_path(digest)), digest)
+        self.assertEqual(digest, hash_file(source))
+        self.assertEqual([n for n in os.listdir(self.store.objects_dir) if n.startswith(".tmp-")], [])
+
+    def test_identical_files_share_one_object(self):
+        self._write(".zshrc", "export FOO=1\n")
+        a, _ = self.store.collect("bash", self.home, ".bashrc")
+        b, written = self.store.collect("zsh", self.home, ".zshrc")
+        self.assertEqual(a[0]["digest"], b[0]["digest"])
+        self.assertEqual(written, 0)
+
+    def test_symlinks_are_recorded_not_followed(self):
+        os.symlink("/nonexistent/target", os.path.join(self.home, ".config/fish/linked.fish"))
+        entries, _ = self.store.collect("fish", self.home, ".config/fish")
+        links = [e for e in entries if e["type"] == "symlink"]
+        self.assertEqual(len(links), 1)
+        self.assertEqual(links[0]["link"], "/nonexistent/target")
+
+    def test_list_snapshots(self):
+        entries, _ = self.store.collect("bash", self.home, ".bashrc")
+        self.store.write_snapshot("backup_20250101_000000_arch", entries, {"distro": "arch"})
+        snapshots = self.store.list_snapshots()
+        self.assertEqual(len(snapshots), 1)
+        self.assertEqual(snapshots[0]["name"], "backup_20250101_000000_arch")
+        self.assertEqual(snapshots[0]["distro"], "arch")
+        self.assertEqual(snapshots[0]["packages"], ["bash"])
+
+    def test_restore_to_directory(self):
+        entries, _ = self.store.collect("fish", self.home, ".config/fish")
+        self.store.write_snapshot("snap", entries)
+        dest = os.path.join(self.tmp.name, "restored")
+        count = self.store.restore("snap", dest=dest)
+        self.assertEqual(count, 2)
+        restored = os.path.join(dest, "fish", ".config/fish/config.fish")
+        self.assertEqual(self._read(restored), "set -gx EDITOR nvim\n")
+
+    def test_restore_in_place(self):
+        entries, _ = self.store.collect("bash", self.home, ".bashrc")
+        self.store.write_snapshot("snap", entries)
+        self._write(".bashrc", "clobbered\n")
+        self.store.restore("snap")
+        self.assertEqual(self._read(os.path.join(self.home, ".bashrc")), "export FOO=1\n")
+
+    def test_restore_filters_packages(self):
+        entries, _ = self.store.collect("bash", self.home, ".bashrc")
+        fish_entries, _ = self.store.collect("fish", self.home, ".config/fish")
+        self.store.write_snapshot("snap", entries + fish_entries)
+        dest = os.path.join(self.tmp.name, "restored")
+        self.assertEqual(self.store.restore("snap", dest=dest, packages=["bash"]), 1)
+        self.assertFalse(os.path.exists(os.path.join(dest, "fish")))
+
+
+if __name__ == "__main__":
+    unittest.main()
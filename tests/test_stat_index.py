@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import snapshot_store
+from snapshot_store import SnapshotStore
+from stat_index import StatIndex
+
+
+class TestStatIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.tmp.name, "index.json")
+        self.file_path = os.path.join(self.tmp.name, "file")
+        with open(self.file_path, "w") as f:
+            f.write("data\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lookup_matches_unchanged_stat(self):
+        index = StatIndex(self.index_path)
+        st = os.stat(self.file_path)
+        index.update(self.file_path, st, "abc")
+        self.assertEqual(index.lookup(self.file_path, st), "abc")
+
+    def test_lookup_misses_after_modification(self):
+        index = StatIndex(self.index_path)
+        index.update(self.file_path, os.stat(self.file_path), "abc")
+        with open(self.file_path, "a") as f:
+            f.write("more\n")
+        self.assertIsNone(index.lookup(self.file_path, os.stat(self.file_path)))
+
+    def test_persists_across_instances(self):
+        index = StatIndex(self.index_path)
+        st = os.stat(self.file_path)
+        index.update(self.file_path, st, "abc")
+        index.save()
+        self.assertEqual(StatIndex(self.index_path).lookup(self.file_path, st), "abc")
+
+    def test_corrupt_index_is_ignored(self):
+        with open(self.index_path, "w") as f:
+            f.write("{not json")
+        self.assertEqual(len(StatIndex(self.index_path)), 0)
+
+    def test_prune_drops_unseen_paths_under_roots(self):
+        index = StatIndex(self.index_path)
+        st = os.stat(self.file_path)
+        index.update("/home/u/.config/fish/a.fish", st, "a")
+        index.update("/home/u/.config/fish/b.fish", st, "b")
+        index.update("/home/u/.bashrc", st, "c")
+        index.prune(["/home/u/.config/fish"], {"/home/u/.config/fish/a.fish"})
+        self.assertEqual(len(index), 2)
+        self.assertIsNone(index.lookup("/home/u/.config/fish/b.fish", st))
+        self.assertEqual(index.lookup("/home/u/.bashrc", st), "c")
+
+
+class TestSnapshotStoreWithIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.home = os.path.join(self.tmp.name, "home")
+        self.root = os.path.join(self.tmp.name, "backup")
+        os.makedirs(os.path.join(self.home, ".config", "nvim"))
+        for i in range(5):
+            with open(os.path.join(self.home, ".config", "nvim", f"f{i}.lua"), "w") as f:
+                f.write(f"-- {i}\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_unchanged_files_are_not_hashed(self):
+        store = SnapshotStore(self.root)
+        store.collect("neovim", self.home, ".config/nvim")
+        store.save_index()
+
+        store = SnapshotStore(self.root)
+        with patch.object(snapshot_store, "hash_file", side_effect=AssertionError("hashed")):
+            entries, written = store.collect("neovim", self.home, ".config/nvim")
+        self.assertEqual(len(entries), 5)
+        self.assertEqual(written, 0)
+
+    def test_modified_file_is_rehashed(self):
+        store = SnapshotStore(self.root)
+        store.collect("neovim", self.home, ".config/nvim")
+        with open(os.path.join(self.home, ".config", "nvim", "f0.lua"), "w") as f:
+            f.write("-- changed, longer\n")
+        with patch.object(snapshot_store, "hash_file", wraps=snapshot_store.hash_file) as hashed:
+            store.collect("neovim", self.home, ".config/nvim")
+        self.assertEqual(hashed.call_count, 1)
+
+    def test_same_as_latest(self):
+        store = SnapshotStore(self.root)
+        entries, _ = store.collect("neovim", self.home, ".config/nvim")
+        self.assertIsNone(store.same_as_latest(entries))
+        store.write_snapshot("snap1", entries)
+        again, _ = store.collect("neovim", self.home, ".config/nvim")
+        self.assertEqual(store.same_as_latest(again), "snap1")
+
+    def test_is_unchanged(self):
+        store = SnapshotStore(self.root)
+        entries, _ = store.collect("neovim", self.home, ".config/nvim")
+        previous = {e["path"]: e for e in entries}
+        self.assertTrue(store.is_unchanged(self.home, ".config/nvim", previous))
+
+        with open(os.path.join(self.home, ".config", "nvim", "new.lua"), "w") as f:
+            f.write("-- new\n")
+        self.assertFalse(store.is_unchanged(self.home, ".config/nvim", previous))
+
+    def test_is_unchanged_detects_removed_file(self):
+        store = SnapshotStore(self.root)
+        entries, _ = store.collect("neovim", self.home, ".config/nvim")
+        os.unlink(os.path.join(self.home, ".config", "nvim", "f0.lua"))
+        previous = {e["path"]: e for e in entries}
+        self.assertFalse(store.is_unchanged(self.home, ".config/nvim", previous))
+
+    def test_gc_forgets_index_entries_for_deleted_objects(self):
+        store = SnapshotStore(self.root)
+        store.collect("neovim", self.home, ".config/nvim")
+        store.gc()
+        self.assertEqual(len(store.index), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import template_render
+from template_render import (
+    compile_template, kebab_case, load_template, main, pack_path, placeholder_values, read_pack, render,
+    render_tokens, tokenize,
+)
+
+FISH_DIR = os.path.join(os.path.dirname(__file__), "..", "fish", ".config", "fish")
+TEMPLATES = os.path.join(FISH_DIR, "templates")
+LICENSES = os.path.join(FISH_DIR, "licenses")
+DAY = date(2025, 3, 7)
+
+
+class TestTokens(unittest.TestCase):
+    def test_single_pass(self):
+        tokens = tokenize("{PROJECT_NAME} ({PROJECT_NAME_KEBAB}) {}, {UNKNOWN} {YEAR}")
+        self.assertEqual(tokens[1::2], ["PROJECT_NAME", "PROJECT_NAME_KEBAB", "YEAR"])
+        values = placeholder_values("My_Cool App!", "{YEAR}", "MIT", DAY)
+        self.assertEqual(render_tokens(tokens, values), "My_Cool App! (my-cool-app) {}, {UNKNOWN} 2025")
+        # A value containing a placeholder is inserted as-is.
+        self.assertEqual(render_tokens(tokenize("by {AUTHOR}"), values), "by {YEAR}")
+
+    def test_kebab_case(self):
+        self.assertEqual(kebab_case("  Foo_Bar baz--"), "foo-bar-baz")
+        self.assertEqual(placeholder_values("x", "a", "MIT", DAY)["TODAY"], "2025-03-07")
+
+
+class TestRender(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "proj")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_python_template(self):
+        values = placeholder_values("Demo App", "Ada", "MIT", DAY)
+        written = render(compile_template(os.path.join(TEMPLATES, "python")), values, self.dest,
+                         os.path.join(LICENSES, "MIT"))
+        rel = {os.path.relpath(p, self.dest) for p in written}
+        self.assertIn(os.path.join("src", "demo-app", "main.py"), rel)
+        self.assertIn("LICENSE", rel)
+        self.assertFalse(any("__pycache__" in p or "{" in p for p in rel))
+        for path in written:
+            with open(path) as f:
+                text = f.read()
+            for name in ("PROJECT_NAME", "PROJECT_NAME_KEBAB", "AUTHOR", "YEAR", "TODAY"):
+                self.assertNotIn("{" + name + "}", text, path)
+        with open(os.path.join(self.dest, "LICENSE")) as f:
+            self.assertIn("2025 Ada", f.read())
+        with open(os.path.join(self.dest, "README.md")) as f:
+            self.assertGreater(len(f.read().splitlines()), 3)
+
+    def test_modes_and_binary_files(self):
+        src = os.path.join(self.tmp.name, "tpl")
+        os.makedirs(src)
+        with open(os.path.join(src, "run-{PROJECT_NAME_KEBAB}.sh"), "w") as f:
+            f.write("#!/bin/sh\necho {PROJECT_NAME}\n")
+        os.chmod(os.path.join(src, "run-{PROJECT_NAME_KEBAB}.sh"), 0o755)
+        blob = b"\xff\xfe{AUTHOR}\x00"
+        with open(os.path.join(src, "logo.bin"), "wb") as f:
+            f.write(blob)
+
+        render(compile_template(src), placeholder_values("Tool", "Ada", "MIT", DAY), self.dest, jobs=2)
+        script = os.path.join(self.dest, "run-tool.sh")
+        self.assertEqual(os.stat(script).st_mode & 0o777, 0o755)
+        with open(script) as f:
+            self.assertEqual(f.read(), "#!/bin/sh\necho Tool\n")
+        with open(os.path.join(self.dest, "logo.bin"), "rb") as f:
+            self.assertEqual(f.read(), blob)
+
+    def test_list(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            code = main(["--name", "Foo Bar", "--license-file", os.path.join(LICENSES, "MIT"), "--list",
+                         "--cache-dir", os.path.join(self.tmp.name, "cache"),
+                         os.path.join(TEMPLATES, "python"), self.dest])
+        self.assertEqual(code, 0)
+        self.assertIn("src/foo-bar/__init__.py", out.getvalue().splitlines())
+        self.assertFalse(os.path.exists(self.dest))
+
+
+class TestPack(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = os.path.join(self.tmp.name, "cache")
+        self.src = os.path.join(self.tmp.name, "python")
+        os.makedirs(os.path.join(self.src, "src", "{PROJECT_NAME_KEBAB}"))
+        self.write("README.md", "# {PROJECT_NAME}\n\n{AUTHOR}, {YEAR}\n")
+        self.write(os.path.join("src", "{PROJECT_NAME_KEBAB}", "__init__.py"), "")
+        self.values = placeholder_values("Demo", "Ada", "MIT", DAY)
+        template_render._compiled.clear()
+
+    def tearDown(self):
+        template_render._compiled.clear()
+        self.tmp.cleanup()
+
+    def write(self, rel, text):
+        with open(os.path.join(self.src, rel), "w") as f:
+            f.write(text)
+
+    def render_to(self, name, template):
+        dest = os.path.join(self.tmp.name, name)
+        render(template, self.values, dest)
+        with open(os.path.join(dest, "README.md")) as f:
+            return f.read()
+
+    def test_pack_round_trip(self):
+        for root in (os.path.join(TEMPLATES, "python"), os.path.join(TEMPLATES, "typescript-node")):
+            compiled = compile_template(root)
+            load_template(root, self.cache)
+            packed = read_pack(pack_path(root, self.cache))
+            self.assertEqual([f.path for f in packed.files], [f.path for f in compiled.files])
+            for a, b in zip(compiled.files, packed.files):
+                self.assertEqual(render_tokens(a.tokens, self.values), render_tokens(b.tokens, self.values))
+                self.assertEqual(a.mode, b.mode)
+
+    def test_fresh_pack_skips_the_tree(self):
+        first = self.render_to("a", load_template(self.src, self.cache))
+        template_render._compiled.clear()
+        with mock.patch.object(template_render, "compile_template", side_effect=AssertionError("recompiled")):
+            self.assertEqual(self.render_to("b", load_template(self.src, self.cache)), first)
+        self.assertEqual(first, "# Demo\n\nAda, 2025\n")
+
+    def test_edits_rebuild_the_pack(self):
+        load_template(self.src, self.cache)
+        self.write("README.md", "# {PROJECT_NAME} v2 with a longer line\n")
+        self.assertEqual(self.render_to("a", load_template(self.src, self.cache)), "# Demo v2 with a longer line\n")
+        self.write("NEW.md", "new\n")
+        self.assertIn(["NEW.md"], [f.path for f in load_template(self.src, self.cache).files])
+
+    def test_corrupt_pack_is_rebuilt(self):
+        load_template(self.src, self.cache)
+        with open(pack_path(self.src, self.cache), "r+b") as f:
+            f.write(b"garbage!")
+        self.assertIsNone(read_pack(pack_path(self.src, self.cache)))
+        template_render._compiled.clear()
+        load_template(self.src, self.cache)
+        self.assertIsNotNone(read_pack(pack_path(self.src, self.cache)))
+
+
+if __name__ == "__main__":
+    unittest.main()
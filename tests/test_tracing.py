@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import tracing
+from parallel import run_packages
+from planner import Plan
+from runner import command_name, run
+
+
+class TestSpans(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        tracing.stop()
+        self.tmp.cleanup()
+
+    def test_disabled_is_a_shared_no_op(self):
+        self.assertIsNone(tracing.active())
+        self.assertIs(tracing.span("a"), tracing.span("b", "package", x=1))
+        with tracing.span("a"):
+            pass
+
+    def test_totals_sorted_and_errors_recorded(self):
+        tracer = tracing.start()
+        for _ in range(3):
+            with tracing.span("link", "phase"):
+                pass
+        with self.assertRaises(KeyError):
+            with tracing.span("backup", "phase"):
+                sum(range(100000))
+                raise KeyError("x")
+        totals = tracer.totals()
+        self.assertEqual({(t.name, t.count) for t in totals}, {("link", 3), ("backup", 1)})
+        self.assertEqual(totals, sorted(totals, key=lambda t: -t.total))
+        self.assertEqual(tracer.events[-1].args, {"error": "KeyError"})
+        self.assertIn("backup", tracer.format_summary())
+
+    def test_session_writes_both_formats(self):
+        for name in ("trace.json", "trace.jsonl"):
+            path = os.path.join(self.tmp.name, name)
+            with tracing.session(path):
+                with tracing.span("detect"):
+                    pass
+                worker = threading.Thread(target=self.git_status)
+                worker.start()
+                worker.join()
+            self.assertIsNone(tracing.active())
+            with open(path) as f:
+                if name.endswith(".jsonl"):
+                    events = [json.loads(line) for line in f]
+                    self.assertEqual([e["name"] for e in events], ["detect", "git status", "total"])
+                else:
+                    events = json.load(f)["traceEvents"]
+                    spans = [e for e in events if e["ph"] == "X"]
+                    self.assertEqual({e["name"] for e in spans}, {"detect", "git status", "total"})
+                    self.assertEqual(len({e["tid"] for e in spans}), 2)
+                    self.assertTrue(all(e["dur"] >= 0 for e in spans))
+
+    def git_status(self):
+        with tracing.span("git status", "git"):
+            pass
+
+    def test_no_path_means_no_session(self):
+        with tracing.session(None) as tracer:
+            self.assertIsNone(tracer)
+            self.assertIsNone(tracing.active())
+
+
+class TestInstrumentation(unittest.TestCase):
+    def tearDown(self):
+        tracing.stop()
+
+    def test_phases_packages_and_commands(self):
+        tracer = tracing.start()
+        plan = Plan()
+        plan.add("backup", "snapshot", "/x", "bash")
+        plan.on_apply("backup", lambda steps: run_packages(["bash", "fish"], lambda p: p, jobs=2, label="backup"))
+        plan.add("brew", "dump", "/y")
+        plan.on_apply("brew", lambda steps: run([sys.executable, "-c", "pass"]))
+        plan.apply(concurrent=True)
+
+        names = {(e.category, e.name) for e in tracer.events}
+        self.assertTrue({("phase", "backup"), ("phase", "brew"), ("backup", "bash"), ("backup", "fish")} <= names)
+        self.assertIn(("command", os.path.basename(sys.executable)), names)
+        phase = next(e for e in tracer.events if e.name == "backup" and e.category == "phase")
+        self.assertEqual(phase.args, {"steps": 1})
+
+    def test_command_name(self):
+        self.assertEqual(command_name(["brew", "bundle", "dump", "--force"]), "brew bundle")
+        self.assertEqual(command_name(["/usr/bin/git", "-C", "/repo", "status"]), "git")
+        self.assertEqual(command_name(["git", "--no-optional-locks", "--literal-pathspecs", "status"]), "git status")
+        self.assertEqual(command_name([sys.executable, "-c", "pass"]), os.path.basename(sys.executable))
+
+
+if __name__ == "__main__":
+    unittest.main()
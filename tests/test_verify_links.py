@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from linker import Linker
+from verify_links import format_report, to_json, verify
+
+
+def write(path, text="x\n"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class TestVerify(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.repo = os.path.join(self.tmp.name, "repo")
+        self.home = os.path.join(self.tmp.name, "home")
+        os.makedirs(self.home)
+        write(os.path.join(self.repo, "bash", ".bashrc"), "bashrc\n")
+        write(os.path.join(self.repo, "bash", ".inputrc"), "inputrc\n")
+        write(os.path.join(self.repo, "nvim", ".config", "nvim", "init.lua"), "init\n")
+        write(os.path.join(self.repo, "nvim", ".config", "nvim", "lua", "plugins.lua"), "plugins\n")
+        write(os.path.join(self.repo, "fish", ".config", "fish", "config.fish"), "fish\n")
+        self.packages = [
+            ("bash", self.home, [".bashrc", ".inputrc"]),
+            ("nvim", self.home, [".config/nvim"]),
+            ("fish", self.home, [".config/fish"]),
+        ]
+        linker = Linker(self.repo)
+        linker.plan((p, target) for p, target, _ in self.packages)
+        linker.apply()
+        self.assertEqual(linker.errors, [])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def home_path(self, *parts):
+        return os.path.join(self.home, *parts)
+
+    def statuses(self):
+        report = verify(self.repo, self.packages)
+        return {(f.status, os.path.relpath(f.path, self.home)) for f in report.findings}, report
+
+    def test_fresh_link_set_is_clean(self):
+        findings, report = self.statuses()
+        self.assertEqual(findings, set())
+        self.assertEqual(report.counts, {"ok": 4})
+        self.assertEqual(report.packages, ["bash", "nvim", "fish"])
+        self.assertIn("no drift", format_report(report))
+
+    def test_each_kind_of_drift(self):
+        os.unlink(self.home_path(".bashrc"))
+        write(self.home_path(".bashrc"), "edited locally\n")
+        os.unlink(self.home_path(".inputrc"))
+        write(self.home_path(".inputrc"), "inputrc\n")
+        os.unlink(self.home_path(".config", "fish"))
+        os.symlink(os.path.join(self.tmp.name, "elsewhere"), self.home_path(".config", "fish"))
+        os.makedirs(os.path.join(self.tmp.name, "elsewhere"))
+
+        # Unfold nvim by hand: a real directory with one link missing and a stray file.
+        os.unlink(self.home_path(".config", "nvim"))
+        os.makedirs(self.home_path(".config", "nvim"))
+        os.symlink(os.path.join(self.repo, "nvim", ".config", "nvim", "init.lua"), self.home_path(".config", "nvim", "init.lua"))
+        write(self.home_path(".config", "nvim", "stray.lua"))
+
+        findings, report = self.statuses()
+        self.assertEqual(findings, {
+            ("modified", ".bashrc"),
+            ("unlinked", ".inputrc"),
+            ("foreign", ".config/fish"),
+            ("missing", ".config/nvim/lua"),
+            ("unmanaged", ".config/nvim/stray.lua"),
+        })
+        self.assertEqual(report.counts["ok"], 1)
+
+    def test_broken_links(self):
+        # Still listed in the manifest, gone from the repo.
+        os.remove(os.path.join(self.repo, "bash", ".inputrc"))
+        # Pointing at a file the repo renamed.
+        os.unlink(self.home_path(".bashrc"))
+        os.symlink(os.path.join(self.repo, "bash", ".bashrc.old"), self.home_path(".bashrc"))
+        # Left behind in a package-owned directory.
+        os.unlink(self.home_path(".config", "nvim"))
+        os.makedirs(self.home_path(".config", "nvim"))
+        for name in ("init.lua", "lua", "old.lua"):
+            os.symlink(os.path.join(self.repo, "nvim", ".config", "nvim", name), self.home_path(".config", "nvim", name))
+
+        findings, _ = self.statuses()
+        self.assertEqual(findings, {
+            ("broken", ".inputrc"),
+            ("broken", ".bashrc"),
+            ("broken", ".config/nvim/old.lua"),
+        })
+
+    def test_json_report(self):
+        os.unlink(self.home_path(".bashrc"))
+        data = json.loads(to_json(verify(self.repo, self.packages)))
+        self.assertFalse(data["ok"])
+        self.assertEqual(data["counts"]["missing"], 1)
+        self.assertEqual(data["findings"][0]["package"], "bash")
+
+
+if __name__ == "__main__":
+    unittest.main()
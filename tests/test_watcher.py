@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+import importlib.util
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from manifest import Manifest, Package
+from watcher import InotifyWatcher, PollingWatcher, make_watcher, run_debounced
+
+
+def load_backup_script():
+    path = os.path.join(os.path.dirname(__file__), "..", "backup-dotfiles.py")
+    spec = importlib.util.spec_from_file_location("backup_dotfiles", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write(path, text="x\n"):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class WatcherCases:
+    """Shared cases; subclasses provide new_watcher()."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.watcher = self.new_watcher()
+
+    def tearDown(self):
+        self.watcher.close()
+        self.tmp.cleanup()
+
+    def wait_for(self, path, timeout=5):
+        seen = set()
+        deadline = time.monotonic() + timeout
+        while path not in seen and time.monotonic() < deadline:
+            seen |= self.watcher.wait(0.5)
+        return seen
+
+    def test_edit_and_atomic_replace(self):
+        target = os.path.join(self.root, ".bashrc")
+        write(target)
+        self.watcher.watch(self.root)
+        write(target, "edited and longer\n")
+        self.assertIn(target, self.wait_for(target))
+
+        write(target + ".tmp", "replaced by rename\n")
+        os.replace(target + ".tmp", target)
+        self.assertIn(target, self.wait_for(target))
+
+    def test_recursive_follows_new_directories(self):
+        os.makedirs(os.path.join(self.root, "nvim"))
+        self.watcher.watch(os.path.join(self.root, "nvim"), recursive=True)
+        os.makedirs(os.path.join(self.root, "nvim", "lua"))
+        self.wait_for(os.path.join(self.root, "nvim", "lua"))
+        nested = os.path.join(self.root, "nvim", "lua", "init.lua")
+        write(nested)
+        self.assertIn(nested, self.wait_for(nested))
+
+    def test_stop_wakes_a_blocked_wait(self):
+        self.watcher.watch(self.root)
+        threading.Timer(0.1, self.watcher.stop).start()
+        start = time.monotonic()
+        self.assertEqual(self.watcher.wait(None), set())
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertTrue(self.watcher.stopped)
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux-only")
+class TestInotify(WatcherCases, unittest.TestCase):
+    def new_watcher(self):
+        return InotifyWatcher()
+
+    def test_make_watcher_prefers_inotify(self):
+        watcher = make_watcher()
+        self.addCleanup(watcher.close)
+        self.assertIsInstance(watcher, InotifyWatcher)
+
+
+class TestPolling(WatcherCases, unittest.TestCase):
+    def new_watcher(self):
+        return PollingWatcher(interval=0.05)
+
+
+class TestDebounce(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.watcher = make_watcher()
+        if isinstance(self.watcher, PollingWatcher):
+            self.watcher.interval = 0.05
+        self.watcher.watch(self.tmp.name)
+
+    def tearDown(self):
+        self.watcher.close()
+        self.tmp.cleanup()
+
+    def test_burst_is_one_batch_then_quiet(self):
+        batches = []
+        quiet = []
+
+        def burst():
+            for i in range(5):
+                write(os.path.join(self.tmp.name, f"f{i}"))
+                time.sleep(0.02)
+
+        def on_quiet():
+            quiet.append(time.monotonic())
+            self.watcher.stop()
+
+        threading.Thread(target=burst).start()
+        run_debounced(self.watcher, batches.append, debounce=0.3, quiet=0.2, on_quiet=on_quiet)
+        self.assertEqual(len(batches), 1)
+        self.assertEqual({os.path.basename(p) for p in batches[0]}, {f"f{i}" for i in range(5)})
+        self.assertEqual(len(quiet), 1)
+
+    def test_pending_batch_flushed_on_stop(self):
+        batches = []
+        threading.Timer(0.05, write, [os.path.join(self.tmp.name, "late")]).start()
+        threading.Timer(0.5, self.watcher.stop).start()
+        run_debounced(self.watcher, batches.append, debounce=30)
+        self.assertEqual([{os.path.basename(p) for p in b} for b in batches], [{"late"}])
+
+    def test_rejected_paths_never_form_a_batch(self):
+        batches = []
+
+        def writes():
+            write(os.path.join(self.tmp.name, ".bash_history"))
+            time.sleep(0.1)
+            write(os.path.join(self.tmp.name, ".bashrc"))
+            write(os.path.join(self.tmp.name, ".bash_history"), "more\n")
+
+        threading.Thread(target=writes).start()
+        threading.Timer(1.0, self.watcher.stop).start()
+        run_debounced(self.watcher, batches.append, debounce=0.3,
+                      accept=lambda path: not path.endswith("_history"))
+        self.assertEqual([{os.path.basename(p) for p in b} for b in batches], [{".bashrc"}])
+
+
+class TestWatchTargets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.home = os.path.join(self.tmp.name, "home")
+        self.repo = os.path.join(self.tmp.name, "repo")
+        os.makedirs(os.path.join(self.home, ".config"))
+        os.makedirs(os.path.join(self.repo, "bash"))
+        write(os.path.join(self.home, ".bashrc"))
+        self.backup = load_backup_script()
+        manifest = Manifest({
+            "bash": Package("bash", self.home, [".bashrc"], [], [], []),
+            "app": Package("app", self.home, [".config/app/settings"], [], [], []),
+        })
+        for name, value in {
+            "DOTFILES_DIR": self.repo,
+            "load_manifest": lambda: manifest,
+            "get_platform_specific_packages": lambda env: ["bash", "app"],
+        }.items():
+            patcher = mock.patch.object(self.backup, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_paths_created_later_are_tracked_and_picked_up(self):
+        tracked, repo_dirs, watches = self.backup.watch_targets(None)
+        settings = os.path.join(self.home, ".config", "app", "settings")
+        self.assertEqual(tracked[settings], "app")
+        self.assertIn((os.path.join(self.home, ".config"), False), watches)
+        self.assertIn((os.path.join(self.repo, "bash"), True), watches)
+
+        os.makedirs(settings)
+        _, _, watches = self.backup.watch_targets(None)
+        self.assertIn((settings, True), watches)
+
+    def test_only_tracked_paths_are_relevant(self):
+        tracked, repo_dirs, _ = self.backup.watch_targets(None)
+        relevant = lambda *parts: self.backup.relevant(os.path.join(*parts), tracked, repo_dirs)
+        self.assertTrue(relevant(self.home, ".bashrc"))
+        self.assertFalse(relevant(self.home, ".bash_history"))
+        self.assertTrue(relevant(self.home, ".config", "app"))
+        self.assertFalse(relevant(self.home, ".config", "other"))
+        self.assertTrue(relevant(self.repo, "bash", ".bashrc"))
+        self.assertEqual(self.backup.changed_packages([os.path.join(self.home, ".config")], tracked), {"app"})
+
+
+if __name__ == "__main__":
+    unittest.main()